@@ -1,4 +1,7 @@
 from .port_data_utils import data_1d_at_frequency, \
                              data_from_ports, \
                              power_from_ports, \
-                             find_missing_data
\ No newline at end of file
+                             batch_power_from_ports, \
+                             find_missing_data
+from .port_data_store import PortDataStore, \
+                             port_data_store
@@ -11,33 +11,77 @@ import matplotlib.pyplot as plt
 from cstmod.cstutil import find_cst_files, sort_cst_results_export
 from cstmod.cosimulation import *
 import cstmod.field_reader as field_reader
+from cstmod.field_reader.field_reader_h5 import extract_field_type, cst_3d_field_map
+from cstmod.field_reader.parallel_channels import parallel_channel_sum
+from cstmod.field_reader.prefetch import prefetch_channels, default_prefetch_depth
+from cstmod.field_reader.compound_fields import read_complex_fields_into
+from cstmod.field_writer.mat_writer import MatWriter
 
-def ac_combine_fields(field_files, weights):
+# default size of the (channels x voxels) block of a z-slab in bytes
+default_slab_bytes = 2**28
+
+def read_h5_fields(field_file, dtype=np.complex128):
+    """Read the complex fields of a single CST hdf5 field export.
+    Args:
+        field_file: full file path
+        dtype: complex data type of fields
+    Returns:
+        ndarray of complex fields
+    """
+    return field_reader.FieldReaderH5(field_file, dtype=dtype).fields
+
+def read_h5_field_planes(field_file, dtype=np.complex128, planes=slice(None)):
+    """Read z-planes of the complex fields of a single CST hdf5 field export.
+    Args:
+        field_file: full file path
+        dtype: complex data type of fields
+        planes: slice of z-planes
+    Returns:
+        ndarray (nz_planes, ny, nx, 3) of complex fields
+    """
+    with h5py.File(field_file, 'r') as dataf:
+        dataset = dataf[cst_3d_field_map[extract_field_type(field_file)]]
+        (nz, ny, nx) = dataset.shape
+        fields = np.empty((len(range(*planes.indices(nz))), ny, nx, 3), dtype=dtype)
+        return read_complex_fields_into(dataset, fields, (planes,))
+
+def ac_combine_fields(field_files, weights, nworkers=None, dtype=np.complex128,
+                      prefetch=default_prefetch_depth):
     """Combine fields 
     Args: 
         field_files: list of full file paths 
+        weights: complex weight of each field file
+        nworkers: if given, field files are decoded and accumulated 
+                  concurrently by nworkers processes.
+        dtype: complex data type of fields read from file and of the combined 
+               fields. Channel sums are always accumulated in complex128.
+        prefetch: number of field files read ahead by a background thread while
+                  the current file is accumulated (0: no read ahead).
         
     Returns: 
         exports field file in an hdf5 format
     Raises: 
     """
-    # Initialize Numpy storage space by reading first field result
-    # Initialized ndarrays are more efficient than appended
-    print('[ac_combine_fields] file: ', field_files[0])
-    fr0 = field_reader.FieldReaderH5(field_files[0])
-    xdim = fr0.xdim
-    ydim = fr0.ydim
-    zdim = fr0.zdim
-    combined_fields = weights[0]*fr0.fields
-    field_type = fr0.field_type
-    
-    # combine the remaining fields
-    for i, ff in enumerate(field_files[1:]):
-        print('[ac_combine_fields] file: ', ff)
-        fr = field_reader.FieldReaderH5(ff)
-        combined_fields = np.add(combined_fields, np.multiply(weights[i+1],fr.fields))
+    if nworkers is not None:
+        return _ac_combine_fields_parallel(field_files, weights, nworkers, dtype)
+
+    # field files are read ahead while the current file is accumulated
+    combined_fields = None
+    for i, fr in prefetch_channels(field_reader.FieldReaderH5, [(ff, dtype) for ff in field_files],
+                                   prefetch):
+        print('[ac_combine_fields] file: ', field_files[i])
+        if combined_fields is None:
+            # Initialize Numpy storage space by reading first field result
+            xdim = fr.xdim
+            ydim = fr.ydim
+            zdim = fr.zdim
+            combined_fields = np.multiply(weights[0], fr.fields, dtype=np.complex128)
+            field_type = fr.field_type
+        else:
+            combined_fields += weights[i] * fr.fields
         print('[ac_combine_fields] freeing field reader')
         del fr
+    combined_fields = combined_fields.astype(dtype, copy=False)
 
     combined_fields_dict = dict()
     combined_fields_dict['xdim'] = xdim
@@ -46,7 +90,141 @@ def ac_combine_fields(field_files, weights):
     combined_fields_dict[field_type] = combined_fields
 
     return combined_fields_dict
-    
+
+def _ac_combine_fields_parallel(field_files, weights, nworkers, dtype=np.complex128):
+    """Combine fields with a pool of worker processes.
+    """
+    field_type = extract_field_type(field_files[0])
+    with h5py.File(field_files[0], 'r') as dataf:
+        xdim = dataf['Mesh line x'][()]
+        ydim = dataf['Mesh line y'][()]
+        zdim = dataf['Mesh line z'][()]
+        field_shape = dataf[cst_3d_field_map[field_type]].shape + (3,)
+    combined_fields = parallel_channel_sum(read_h5_field_planes, [(ff, dtype) for ff in field_files],
+                                           weights, field_shape, np.complex128, nworkers)
+    combined_fields = combined_fields.astype(dtype, copy=False)
+    combined_fields_dict = dict()
+    combined_fields_dict['xdim'] = xdim
+    combined_fields_dict['ydim'] = ydim
+    combined_fields_dict['zdim'] = zdim
+    combined_fields_dict[field_type] = combined_fields
+
+    return combined_fields_dict
+
+def ac_combine_weights(ac_dirs, frequency):
+    """Weight matrix of a set of AC combine results.
+    Args:
+        ac_dirs: list of AC combine result directories
+        frequency: frequency of port data
+    Returns:
+        ndarray (nchannels, ncombinations) with the port powers of ac_dirs[j]
+        in column j
+    """
+    return np.stack([power_from_ports(ac_dir, frequency) for ac_dir in ac_dirs], axis=-1)
+
+def _zslab_planes(nchannels, ncombinations, plane_size, slab_bytes):
+    """Number of z-planes per slab so that the channel block and the
+    combined block of a slab fit in slab_bytes.
+    """
+    plane_bytes = (nchannels + ncombinations) * plane_size * np.dtype(np.complex128).itemsize
+    return int(max(1, slab_bytes // plane_bytes))
+
+def ac_combine_fields_multi(field_files, weights, output_files=None, dtype=np.complex128,
+                            slab_bytes=default_slab_bytes, compression=None):
+    """Combine fields for many AC combines in a single pass over the field files.
+    The fields are processed in z-slabs: the slab of every channel is read
+    once, all combinations of the slab are computed as the matrix product
+        (ncombinations x nchannels) @ (nchannels x voxels)
+    and each combination is written to its output file before the next slab
+    is read.
+    Args:
+        field_files: list of full file paths, one per channel
+        weights: ndarray (nchannels, ncombinations) of complex channel weights,
+                 e.g. from ac_combine_weights
+        output_files: list of MAT (v7.3) output files, one per combination.
+                      If None, the combined fields are returned in memory.
+        dtype: complex data type of the combined fields.  Products are
+               accumulated in complex128.
+        slab_bytes: memory budget of a slab
+        compression: hdf5 compression of output files (None, 'gzip', 'lzf')
+    Returns:
+        list of combined fields dictionaries (see ac_combine_fields), or
+        output_files if output files are given
+    Raises:
+        ValueError if the shape of weights does not match the field files
+    """
+    weights = np.asarray(weights, dtype=np.complex128)
+    if 1 == weights.ndim:
+        weights = weights[:, np.newaxis]
+    (nchannels, ncombinations) = np.shape(weights)
+    if nchannels != len(field_files):
+        raise ValueError("Number of weights (" + str(nchannels) + ") does not match "
+                         + "number of field files (" + str(len(field_files)) + ")")
+    if output_files is not None and len(output_files) != ncombinations:
+        raise ValueError("Number of output files does not match number of combinations.")
+
+    field_type = extract_field_type(field_files[0])
+    field_key = cst_3d_field_map[field_type]
+    h5files = []
+    matfiles = []
+    try:
+        for ff in field_files:
+            h5files.append(h5py.File(ff, 'r'))
+        xdim = h5files[0]['Mesh line x'][()]
+        ydim = h5files[0]['Mesh line y'][()]
+        zdim = h5files[0]['Mesh line z'][()]
+        (nz, ny, nx) = h5files[0][field_key].shape
+        for ff, h5file in zip(field_files, h5files):
+            if h5file[field_key].shape != (nz, ny, nx):
+                raise ValueError("Mesh of field file does not match: " + ff)
+
+        if output_files is None:
+            combined_fields = np.empty((ncombinations, nz, ny, nx, 3), dtype=dtype)
+        else:
+            variables = []
+            for output_file in output_files:
+                matf = MatWriter(output_file, compression=compression)
+                matfiles.append(matf)
+                matf.write_variable('xdim', xdim)
+                matf.write_variable('ydim', ydim)
+                matf.write_variable('zdim', zdim)
+                variables.append(matf.create_variable(field_type, (nz, ny, nx, 3), dtype,
+                                                      chunks=(1, ny, nx, 1)))
+
+        nz_slab = _zslab_planes(nchannels, ncombinations, ny*nx*3, slab_bytes)
+        channel_block = np.empty((nchannels, nz_slab, ny, nx, 3), dtype=np.complex128)
+        weights_t = np.ascontiguousarray(weights.T)
+        for z0 in range(0, nz, nz_slab):
+            z1 = min(nz, z0 + nz_slab)
+            block = channel_block[:, 0:z1-z0]
+            for channel, h5file in enumerate(h5files):
+                read_complex_fields_into(h5file[field_key], block[channel], (slice(z0, z1),))
+            # (ncombinations, nchannels) @ (nchannels, voxels)
+            combined = np.matmul(weights_t, block.reshape((nchannels, -1)))
+            combined = combined.reshape((ncombinations, z1-z0, ny, nx, 3))
+            if output_files is None:
+                combined_fields[:, z0:z1] = combined
+            else:
+                for variable, combination in zip(variables, combined):
+                    variable[z0:z1] = combination
+    finally:
+        for h5file in h5files:
+            h5file.close()
+        for matf in matfiles:
+            matf.close()
+
+    if output_files is not None:
+        return output_files
+    combined_fields_list = []
+    for combination in combined_fields:
+        combined_fields_dict = dict()
+        combined_fields_dict['xdim'] = xdim
+        combined_fields_dict['ydim'] = ydim
+        combined_fields_dict['zdim'] = zdim
+        combined_fields_dict[field_type] = combination
+        combined_fields_list.append(combined_fields_dict)
+    return combined_fields_list
+
 def magnitude_3d(fields):
     """magnitude_3d
     Args:
@@ -102,23 +280,18 @@ def main(combine_dir, combine_name, frequency_0):
     Returns:
     Raises:
     """
-    h_field_files = sort_cst_results_export(find_cst_files(os.path.join(results_dir,'3d',r'h-field*.h5')))
+    h_field_files = sort_cst_results_export(find_cst_files(os.path.join(combine_dir,'3d',r'h-field*.h5')), 'AC')
     print("Using following h-fields for field combine steps: ")
     print(h_field_files)
-    ac_combine_dirs = find_cst_files(os.path.join(results_dir, r'AC*'))
+    # port powers of all AC combine directories, skipping incomplete results
+    (ac_combine_dirs, powers, report) = batch_power_from_ports(combine_dir, frequency_0, combine_name)
     print('combine_dirs: ', ac_combine_dirs)
-    for ac_dir in ac_combine_dirs:
-        print("Processing AC combine directory: ", ac_dir)
-        combined_fields = ac_combine_fields(h_field_files, power_from_ports(ac_dir, frequency_0))
+    # all AC combines are computed in one pass over the field files
+    weights = powers.T
+    output_files = [r'combined_fields_' + os.path.basename(ac_dir) + r'.mat' for ac_dir in ac_combine_dirs]
+    print('[main] saving ', output_files)
+    ac_combine_fields_multi(h_field_files, weights, output_files)
 
-        # save combined fields
-        print('[main] saving combined_fields_' + os.path.basename(ac_dir) )
-        hdf5storage.savemat(r'combined_fields_' + os.path.basename(ac_dir) +  r'.mat', combined_fields)
-        
-        # free memory
-        print('[main] freeing combined_fields dictionary from RAM')
-        del combined_fields
-        
 
 if __name__ == "__main__":
     if sys.platform == r'win32':
@@ -0,0 +1,157 @@
+"""port_data_store.py
+Parsed port data (e.g. 'FD Voltages/P*.txt') of a CST cosimulation result.
+
+The port files of a result directory are parsed once into a
+(nports x nfreq) complex array.  The store is shared per directory and
+re-parsed only when the port files change (path, size or modification time),
+so repeated frequency queries of the same result do not read the files again.
+"""
+import os
+import re
+import threading
+import numpy as np
+from cstmod.cstutil import directory_catalog, source_key
+
+class PortDataStore(object):
+    """Complex port data of all ports of a result directory.
+    """
+    def __init__(self, result_path):
+        """
+        Args:
+            result_path: directory containing the port files P1.txt, P2.txt, ...
+        """
+        self._result_path = os.path.normpath(os.path.abspath(result_path))
+        self._port_files = []
+        self._key = None
+        self._frequencies = None
+        self._data = None
+
+    def _find_port_files(self):
+        """Port files of the result directory sorted by port number.
+        Raises:
+            FileNotFoundError if there are no port files
+            Exception if the port numbering is inconsistent
+        """
+        probe_re = re.compile('P[0-9]+.txt')
+        # port files of the shared directory catalog, sorted by port number
+        port_records = directory_catalog(self._result_path).find('P')
+        port_files = [os.path.join(self._result_path, record.name) for record in port_records
+                      if probe_re.match(record.name)]
+        if 0 == len(port_files):
+            raise FileNotFoundError("No port data found in: " + self._result_path)
+
+        # quick check for correct port numbers
+        last_port_number = int(re.search(r'([\d]+).*$', os.path.basename(port_files[-1])).group(1))
+        if len(port_files) != last_port_number:
+            port_names = set(os.path.basename(port_file) for port_file in port_files)
+            missing_ports = ['P' + str(port) + '.txt' for port in range(1, last_port_number + 1)
+                             if 'P' + str(port) + '.txt' not in port_names]
+            raise Exception("Port numbering is inconsistent and/or port values are missing."
+                            + str(missing_ports))
+        return port_files
+
+    def refresh(self):
+        """Parse the port files if they changed since the last parse.
+        Returns:
+            True if the port files were parsed
+        Raises:
+            FileNotFoundError, Exception (see _find_port_files)
+            ValueError if the ports have different frequencies
+        """
+        port_files = self._find_port_files()
+        key = source_key(port_files)
+        if key == self._key:
+            return False
+        frequencies = None
+        data = None
+        for port, port_file in enumerate(port_files):
+            values = np.loadtxt(port_file, delimiter='\t', ndmin=2)
+            if frequencies is None:
+                frequencies = values[:, 0]
+                data = np.empty((len(port_files), len(frequencies)), dtype=np.complex128)
+            elif not np.array_equal(values[:, 0], frequencies):
+                raise ValueError("Frequencies of " + port_file + " differ from " + port_files[0])
+            data[port].real = values[:, 1]
+            data[port].imag = values[:, 2]
+        self._port_files = port_files
+        self._frequencies = frequencies
+        self._data = data
+        self._key = key
+        return True
+
+    def frequency_indices(self, frequency):
+        """Indices of the nearest frequency samples (binary search).
+        Args:
+            frequency: frequency or array of frequencies
+        Returns:
+            index or array of indices into frequencies
+        """
+        frequency = np.asarray(frequency, dtype=np.float64)
+        if np.any(np.diff(self._frequencies) < 0):
+            return np.argmin(np.abs(self._frequencies - frequency[..., np.newaxis]), axis=-1)
+        if 1 == len(self._frequencies):
+            return np.zeros(np.shape(frequency), dtype=np.int_)
+        upper = np.clip(np.searchsorted(self._frequencies, frequency), 1, len(self._frequencies) - 1)
+        lower = upper - 1
+        return np.where(np.abs(self._frequencies[upper] - frequency) < np.abs(frequency - self._frequencies[lower]),
+                        upper, lower)
+
+    def data_at_frequency(self, frequency):
+        """Port data at the nearest frequency sample.
+        Args:
+            frequency: frequency or array of nfreq frequencies
+        Returns:
+            ndarray of nports complex values, or (nports x nfreq) for arrays
+            of frequencies
+        """
+        return self._data[:, self.frequency_indices(frequency)]
+
+    @property
+    def result_path(self):
+        """Directory of the port files.
+        """
+        return self._result_path
+
+    @property
+    def port_files(self):
+        """Port files sorted by port number.
+        """
+        return self._port_files
+
+    @property
+    def nports(self):
+        """Number of ports.
+        """
+        return len(self._port_files)
+
+    @property
+    def frequencies(self):
+        """Frequency samples of the port data.
+        """
+        return self._frequencies
+
+    @property
+    def data(self):
+        """(nports x nfreq) complex port data.
+        """
+        return self._data
+
+_port_data_stores = dict()
+_port_data_stores_lock = threading.Lock()
+
+def port_data_store(result_path):
+    """Shared port data store of a result directory, re-parsed if the port
+    files changed.  Safe to call from several threads.
+    Args:
+        result_path: directory containing the port files
+    Returns:
+        PortDataStore
+    """
+    result_path = os.path.normpath(os.path.abspath(result_path))
+    with _port_data_stores_lock:
+        store = _port_data_stores.get(result_path)
+        if store is None:
+            store = PortDataStore(result_path)
+            _port_data_stores[result_path] = store
+        store.refresh()
+    return store
@@ -6,7 +6,9 @@ import os
 import re
 import numpy as np
 import fnmatch
+from multiprocessing import Pool
 from cstmod.cstutil import find_cst_files, sort_by_trailing_number
+from cstmod.cosimulation.port_data_store import port_data_store
 
 def data_1d_at_frequency(file_name: str, frequency: float):
     """Get the data at frequency.
@@ -51,39 +53,26 @@ def data_from_ports(result_path, frequency):
     """
     Args:
         result_path: String representing the path conaining probe values.  
+        frequency: frequency or array of frequencies
     Returns:
         ndarray: port data at frequency dimension complex values of length nports, sorted by port number.
+                 (nports x nfreq) for arrays of frequencies.
     Raises:
         Exception if the last port number does not equal the number of ports.
             This is an indication that the ports are not number correctly, 
             port data is missing, or ports were not sorted correctly.
     """
-    probe_re = re.compile('P[0-9]+.txt')
-    unfiltered_files = os.listdir(result_path)
-    
-    filtered_files = list(filter(None, map(lambda x: os.path.join(result_path, probe_re.match(x).group()) if(probe_re.match(x)) else None, unfiltered_files)))
-        
-    result_ports = sort_by_trailing_number(filtered_files)
-
-    # quick check for correct port numbers
-    last_port_number = int(re.search(r'([\d]+).*$',os.path.basename(result_ports[-1])).group(1))
-    
-    if len(result_ports) != last_port_number:
-        raise Exception("Port numbering is inconsistent and/or port values are missing."+str(find_missing_data(result_ports, len(result_ports), 'P*.txt')))
-
-    results = np.empty((len(result_ports),2))
-    for i, port in enumerate(result_ports):
-        results[i] = data_1d_at_frequency(port, frequency)[1:]
-
-    return results[:,0]+1.0j*results[:,1]
+    # port files are parsed once per directory and re-parsed if they change
+    return port_data_store(result_path).data_at_frequency(frequency)
 
 def power_from_ports(result_path, frequency, normalization=(1.0/np.sqrt(2.0))):
     """
     Args:
         result_path: String representing the path of the AC combine result to be
                      evaluated.  
+        frequency: frequency or array of frequencies
     Returns:
-        ndarray: real power in port with
+        ndarray: real power in port with, (nports x nfreq) for arrays of frequencies
     Raises:
     """
     fd_voltages_path = os.path.join(result_path, r'FD Voltages')
@@ -99,3 +88,69 @@ def power_from_ports(result_path, frequency, normalization=(1.0/np.sqrt(2.0))):
     normalized_power = normalization*np.multiply(fd_voltages, np.conj(fd_currents))
 
     return normalized_power
+
+def _ac_dir_power(ac_dir, frequency, normalization):
+    """Port powers of one AC combine directory for the batch evaluation.
+    Returns:
+        (power, None) or (None, reason) if the port data is missing or
+        inconsistent
+    """
+    try:
+        return power_from_ports(ac_dir, frequency, normalization), None
+    except Exception as ex:
+        return None, type(ex).__name__ + ': ' + str(ex)
+
+def batch_power_from_ports(export_dir, frequency, ac_pattern='AC*', normalization=(1.0/np.sqrt(2.0)),
+                           nworkers=None):
+    """Port powers of all AC combine directories of an export directory.
+    Directories are scanned and parsed concurrently by a pool of worker
+    processes (parsing port files holds the GIL) and the powers are merged
+    in this process.  Directories with missing or inconsistently numbered port data
+    are reported instead of raising.
+    Args:
+        export_dir: directory containing the AC combine result directories
+        frequency: frequency of port data
+        ac_pattern: file pattern of the AC combine result directories
+        normalization: power normalization (see power_from_ports)
+        nworkers: number of worker processes (default: number of cpus)
+    Returns:
+        (ac_dirs, powers, report) with
+            ac_dirs: list of valid AC combine directories sorted by number
+            powers: ndarray (n_ac, nports), row i holds the port powers of ac_dirs[i]
+            report: dict of skipped directories and the reason
+    """
+    candidates = [ac_dir for ac_dir in find_cst_files(os.path.join(export_dir, ac_pattern))
+                  if os.path.isdir(ac_dir)]
+    numbered = [ac_dir for ac_dir in candidates if re.search(r'[\d]+$', os.path.basename(ac_dir))]
+    report = dict((ac_dir, 'no trailing AC number') for ac_dir in candidates if ac_dir not in numbered)
+    numbered = sort_by_trailing_number(numbered)
+    # gaps in the AC numbering
+    if numbered:
+        numbers = set(int(re.search(r'([\d]+)$', os.path.basename(ac_dir)).group(1)) for ac_dir in numbered)
+        prefix = re.sub(r'[\d]+$', '', os.path.basename(numbered[0]))
+        for number in range(1, max(numbers) + 1):
+            if number not in numbers:
+                report[os.path.join(export_dir, prefix + str(number))] = 'missing directory'
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    nworkers = max(1, min(nworkers, len(numbered)))
+    with Pool(nworkers) as pool:
+        results = pool.starmap(_ac_dir_power, [(ac_dir, frequency, normalization) for ac_dir in numbered])
+
+    # number of ports of the majority of directories
+    nports_found = [len(power) for power, reason in results if power is not None]
+    nports = max(set(nports_found), key=nports_found.count) if nports_found else 0
+    ac_dirs = []
+    powers = []
+    for ac_dir, (power, reason) in zip(numbered, results):
+        if power is None:
+            report[ac_dir] = reason
+        elif len(power) != nports:
+            report[ac_dir] = 'number of ports ' + str(len(power)) + ' differs from ' + str(nports)
+        else:
+            ac_dirs.append(ac_dir)
+            powers.append(power)
+    for ac_dir, reason in report.items():
+        print("[batch_power_from_ports] skipped ", ac_dir, ": ", reason)
+    powers = np.array(powers, dtype=np.complex128).reshape((len(ac_dirs), nports))
+    return ac_dirs, powers, report
@@ -13,5 +13,18 @@ from .cst_file_utils import pad_square_bracket_string, \
                             sort_cst_results_export, \
                             sort_cst_internal_results, \
                             sort_by_trailing_number
+from .export_catalog import ExportCatalog, \
+                            ExportRecord, \
+                            parse_export_name, \
+                            directory_catalog
 
 
+from .binary_cache import cached_arrays, \
+                          load_cached_arrays, \
+                          save_cached_arrays, \
+                          source_key, \
+                          cache_file_name
+from .touchstone import read_touchstone, \
+                        iter_touchstone_records, \
+                        touchstone_s_parameters, \
+                        touchstone_ports
@@ -0,0 +1,131 @@
+"""
+Binary sidecar cache of arrays parsed from CST ascii exports.
+
+Parsing long ascii exports (e.g. 1d results of frequency sweeps) is slow
+compared to reading the same numbers in binary form.  The parsed arrays are
+saved to a sidecar hdf5 file in a hidden '.cstmod_cache' directory next to
+the exports.  The cache file name is derived from the export file paths and
+its content is keyed by path, size and modification time of each export, so
+an export that is re-written invalidates the cache.  Cached arrays are stored
+contiguously and returned as read-only memory maps.
+"""
+import os
+import hashlib
+import json
+try:
+    import h5py
+except:
+    print("Binary cache requires HDF5 support.  Ensure h5py is installed.")
+try:
+    import numpy as np
+except:
+    print("Binary cache requires Numpy.  Ensure package numpy is installed.")
+
+cache_dir_name = '.cstmod_cache'
+
+def source_key(file_list):
+    """Key of the current state of the source files.
+    Args:
+        file_list: list of source files
+    Returns:
+        str key of path, size and modification time of the files
+    Raises:
+        OSError if a source file does not exist
+    """
+    state = []
+    for file_name in file_list:
+        stat = os.stat(file_name)
+        state.append((os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(json.dumps(state).encode('utf-8')).hexdigest()
+
+def cache_file_name(file_list, tag='arrays', cache_dir=None):
+    """Sidecar cache file of a list of source files.
+    Args:
+        file_list: list of source files
+        tag: prefix of the cache file name, e.g. the name of the parser
+        cache_dir: cache directory, default: '.cstmod_cache' in the
+                   directory of the first source file
+    Returns:
+        cache file name
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_list[0])), cache_dir_name)
+    paths = json.dumps([os.path.abspath(file_name) for file_name in file_list])
+    return os.path.join(cache_dir, tag + '_' + hashlib.sha1(paths.encode('utf-8')).hexdigest() + '.h5')
+
+def load_cached_arrays(cache_file, key):
+    """Load arrays from a cache file if the cache is valid.
+    Args:
+        cache_file: cache file name
+        key: expected source key (see source_key)
+    Returns:
+        dict of read-only arrays (memory maps), or None if the cache is
+        missing or stale
+    """
+    if not os.path.exists(cache_file):
+        return None
+    arrays = dict()
+    try:
+        with h5py.File(cache_file, 'r') as cachef:
+            if cachef.attrs.get('key') != key:
+                return None
+            layout = [(name, dataset.dtype, dataset.shape, dataset.id.get_offset())
+                      for name, dataset in cachef.items()]
+            for name, dataset in cachef.items():
+                if dataset.id.get_offset() is None:
+                    # empty arrays have no storage
+                    arrays[name] = dataset[()]
+    except OSError as err:
+        print("[binary_cache] could not read cache: ", cache_file, err)
+        return None
+    for name, dtype, shape, offset in layout:
+        if offset is not None:
+            arrays[name] = np.memmap(cache_file, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return arrays
+
+def save_cached_arrays(cache_file, key, arrays):
+    """Save arrays to a cache file.  Failures to write the cache (e.g. read
+    only export directories) are reported but not raised.
+    Args:
+        cache_file: cache file name
+        key: source key (see source_key)
+        arrays: dict of arrays
+    Returns:
+        True if the cache was written
+    """
+    temp_file = cache_file + '.tmp' + str(os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with h5py.File(temp_file, 'w') as cachef:
+            cachef.attrs['key'] = key
+            for name, value in arrays.items():
+                cachef.create_dataset(name, data=np.ascontiguousarray(value))
+        os.replace(temp_file, cache_file)
+    except OSError as err:
+        print("[binary_cache] could not write cache: ", cache_file, err)
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        return False
+    return True
+
+def cached_arrays(file_list, parse_fn, tag='arrays', cache_dir=None, use_cache=True):
+    """Arrays parsed from source files, loaded from the sidecar cache if the
+    source files are unchanged.
+    Args:
+        file_list: list of source files
+        parse_fn: function of file_list returning a dict of arrays
+        tag: prefix of the cache file name
+        cache_dir: cache directory (see cache_file_name)
+        use_cache: if False, parse_fn is always called and no cache is written
+    Returns:
+        dict of arrays
+    """
+    if not use_cache:
+        return parse_fn(file_list)
+    key = source_key(file_list)
+    cache_file = cache_file_name(file_list, tag, cache_dir)
+    arrays = load_cached_arrays(cache_file, key)
+    if arrays is None:
+        arrays = parse_fn(file_list)
+        save_cached_arrays(cache_file, key, arrays)
+    return arrays
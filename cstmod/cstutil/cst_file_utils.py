@@ -4,12 +4,11 @@
 import os
 import sys
 import re
-if sys.platform == 'win32':
-    import fnmatch
-elif sys.platform == 'linux':
-    import glob
-else:
-    import glob  # assuming a unix-like system.
+import glob
+from .export_catalog import directory_catalog, parse_export_name
+
+# channel wildcard of an export pattern, e.g. 'e-field (f=447) [AC*].h5'
+_channel_pattern_re = re.compile(r'^(?P<head>[^*?\[\]]*\[[A-Za-z]*)\*(?P<tail>\][^*?\[\]]*|[^*?\[\]]+\][^*?\[\]]*)$')
 
 def pad_square_bracket_string(string_with_brackets):
     """ Pad the square brackets in a string for pattern matching with square brackets.
@@ -22,29 +21,62 @@ def pad_square_bracket_string(string_with_brackets):
 
     return "[[]".join(f_padded_right_bracket)
 
+def _parse_channel_pattern(file_base_pattern):
+    """Export fields of a file name pattern with a wildcard in the excitation
+    brackets, e.g. 'e-field (f=447) [AC*].h5' or 'SAR (f=447) [AC*_2Q] (10g).txt'.
+    Returns:
+        (fields, bracket_prefix) with the fields of parse_export_name and the
+        pattern up to its '[', or None if the pattern has other wildcards
+    """
+    pattern_match = _channel_pattern_re.match(file_base_pattern)
+    if pattern_match is None:
+        return None
+    head = pattern_match.group('head')
+    fields = parse_export_name(head + '1' + pattern_match.group('tail'))
+    if fields['frequency'] is None or 1 != fields['channel']:
+        return None
+    return fields, head[:head.index('[') + 1]
+
 def find_cst_files(file_name_pattern):
-    """Generate a sorted list of files that matches a provided regular expression.
+    """Generate a list of files that matches a provided file name pattern.
+    Square brackets in the pattern are matched literally.  Directory listings
+    are served from the shared directory catalog, so repeated lookups in an
+    unchanged directory do not list it again.  Patterns with a wildcard in
+    the excitation brackets (e.g. 'e-field (f=447) [AC*].h5') only match the
+    entries that share the name up to the '[', looked up in an index of the
+    catalog; if these are the channel files of the export, they are returned
+    sorted by channel.  The files are the same as those of glob.
     Args:
         file_name_pattern: file pattern path to list of files.
     Returns:
         list: list of files matching field pattern
-    Raises: 
-        Exception: if system is not 'linux' or 'win32', an exception is raised.
     """ 
-    if sys.platform == 'win32':
-        source_dir = os.path.dirname(file_name_pattern)
-        file_base_pattern_pad = os.path.basename(pad_square_bracket_string(file_name_pattern))
-        file_list = [os.path.join(source_dir, file) for file in fnmatch.filter(os.listdir(os.path.dirname(file_name_pattern)), file_base_pattern_pad)]
-
-    elif sys.platform == 'linux':
-        glob_string = pad_square_bracket_string(file_name_pattern)
-        file_list = glob.glob(glob_string)
-
+    source_dir = os.path.dirname(file_name_pattern)
+    if glob.has_magic(source_dir):
+        # wildcards in directory names
+        return glob.glob(pad_square_bracket_string(file_name_pattern))
+    file_base_pattern = os.path.basename(file_name_pattern)
+    file_base_pattern_pad = pad_square_bracket_string(file_base_pattern)
+    catalog_dir = source_dir if source_dir else os.curdir
+    catalog = directory_catalog(catalog_dir)
+    channel_pattern = _parse_channel_pattern(file_base_pattern)
+    if channel_pattern is None:
+        matches = [os.path.basename(file) for file in catalog.match(catalog_dir, file_base_pattern_pad)]
     else:
-        raise Exception("Unable to process files due to unsupported system: ", 
-            sys.platform)
-
-    return file_list
+        (fields, bracket_prefix) = channel_pattern
+        matches = [os.path.basename(file) for file in catalog.match(catalog_dir, file_base_pattern_pad,
+                                                                    bracket_prefix=bracket_prefix)]
+        # channel files of the export in channel order, unless the pattern
+        # matches other excitations (e.g. '[AC1_2Q]') as well
+        match_set = set(matches)
+        channel_names = [record.name for record in catalog.find(fields['quantity'], fields['frequency'],
+                                                                fields['excitation_type'], fields['postfix'],
+                                                                fields['averaging_mass'])
+                         if record.name in match_set]
+        if len(channel_names) == len(matches):
+            matches = channel_names
+    # paths are joined as given, as with glob
+    return [os.path.join(source_dir, name) for name in matches]
 
 def sort_cst_results_export(unsorted_files, sorting_prefix = ""):
     """Sort the exported cst results accorting to the bracketed result type (i.e [1], [AC1])
@@ -0,0 +1,381 @@
+"""Indexed catalog of CST export trees (e.g. Export/3d and Export/1d).
+
+A catalog scans its directories once with os.scandir and parses every export
+file name into an ExportRecord:
+
+    'e-field (f=447) [AC1].h5'          -> quantity 'e-field', frequency 447.0,
+                                           excitation_type 'AC', channel 1
+    'SAR (f=447) [AC1_2Q] (10g).txt'    -> quantity 'SAR', channel 1,
+                                           postfix '_2Q', averaging_mass '10g'
+    'Power_Excitation (AC3)_Power Accepted (DS).txt'
+                                        -> quantity 'Power_Excitation (AC*)_Power Accepted (DS)',
+                                           excitation_type 'AC', channel 3
+    'P12.txt'                           -> quantity 'P', channel 12
+
+Records are grouped by (quantity, frequency, excitation_type, postfix,
+averaging_mass), so the channel files of an export are found with a single
+dictionary lookup.  A directory is only listed again if its modification time
+changed, and records of files whose size and modification time are unchanged
+are reused.  The catalog can be persisted as a json sidecar index, so a new
+process does not need to parse the tree again.
+"""
+import os
+import re
+import json
+import threading
+import fnmatch
+from collections import namedtuple
+
+ExportRecord = namedtuple('ExportRecord', ['path', 'name', 'quantity', 'frequency',
+                                           'excitation_type', 'channel', 'postfix',
+                                           'averaging_mass', 'size', 'mtime'])
+
+# name of the sidecar index file
+catalog_index_name = '.cstmod_export_catalog.json'
+catalog_index_version = 1
+
+# 'quantity (f=freq) [excitation] rest.ext'
+_export_name_re = re.compile(r'^(?P<quantity>[^\[]*?)\s*\(f=(?P<frequency>[^)]*)\)\s*'
+                             r'(?:\[(?P<excitation>[^\]]*)\])?(?P<rest>.*?)(?:\.(?P<ext>[^.]*))?$')
+# excitation in brackets, e.g. 'AC1', 'AC1_2Q', '1', 'pw'
+_excitation_re = re.compile(r'^(?P<excitation_type>[A-Za-z]*)(?P<channel>[0-9]*)(?P<tail>.*)$')
+# averaging mass of SAR exports, e.g. ' (10g)'
+_mass_re = re.compile(r'\s*\((?P<mass>[0-9.]+\s*g)\)')
+# excitation in parentheses of 1d exports, e.g. 'Power_Excitation (AC1)_...'
+_excitation_1d_re = re.compile(r'\((?P<excitation_type>[A-Za-z]+)(?P<channel>[0-9]+)\)')
+# trailing channel number, e.g. 'P12'
+_trailing_number_re = re.compile(r'^(?P<quantity>.*?)(?P<channel>[0-9]+)$')
+
+def _frequency_key(frequency):
+    """Frequency as float if possible, so 447, 447.0 and '447' match.
+    """
+    if frequency is None:
+        return None
+    try:
+        return float(frequency)
+    except (TypeError, ValueError):
+        return str(frequency)
+
+def parse_export_name(name):
+    """Parse a CST export file name.
+    Args:
+        name: file name (without directory)
+    Returns:
+        dict with keys quantity, frequency, excitation_type, channel, postfix
+        and averaging_mass.  Fields not present in the name are None (or ''
+        for excitation_type and postfix).
+    """
+    stem, ext = os.path.splitext(name)
+    fields = {'quantity': stem, 'frequency': None, 'excitation_type': '', 'channel': None,
+              'postfix': '', 'averaging_mass': None}
+    export_match = _export_name_re.match(name)
+    if export_match and '(f=' in name:
+        fields['quantity'] = export_match.group('quantity')
+        fields['frequency'] = _frequency_key(export_match.group('frequency'))
+        excitation = export_match.group('excitation')
+        postfix = ''
+        if excitation is not None:
+            excitation_match = _excitation_re.match(excitation)
+            fields['excitation_type'] = excitation_match.group('excitation_type')
+            if excitation_match.group('channel'):
+                fields['channel'] = int(excitation_match.group('channel'))
+            postfix = excitation_match.group('tail')
+        rest = export_match.group('rest')
+        mass_match = _mass_re.search(rest)
+        if mass_match:
+            fields['averaging_mass'] = mass_match.group('mass').replace(' ', '')
+            rest = rest[:mass_match.start()] + rest[mass_match.end():]
+        fields['postfix'] = postfix + rest.strip()
+        return fields
+
+    excitation_match = _excitation_1d_re.search(stem)
+    if excitation_match:
+        fields['excitation_type'] = excitation_match.group('excitation_type')
+        fields['channel'] = int(excitation_match.group('channel'))
+        fields['quantity'] = stem[:excitation_match.start()] \
+                             + '(' + fields['excitation_type'] + '*)' \
+                             + stem[excitation_match.end():]
+        return fields
+
+    number_match = _trailing_number_re.match(stem)
+    if number_match:
+        fields['quantity'] = number_match.group('quantity')
+        fields['channel'] = int(number_match.group('channel'))
+    return fields
+
+def _query_key(quantity, frequency, excitation_type, postfix, averaging_mass):
+    """Key of the query index.
+    """
+    return (quantity.lower(), _frequency_key(frequency), excitation_type, postfix,
+            averaging_mass)
+
+def _channel_order(record):
+    """Sort key of records by channel number.
+    """
+    return (record.channel is None, record.channel if record.channel is not None else 0,
+            record.name)
+
+def _bracket_key(name):
+    """Name up to and including its first '[' (None if it has none).
+    """
+    index = name.find('[')
+    return None if index < 0 else os.path.normcase(name[:index + 1])
+
+class ExportCatalog(object):
+    """Catalog of the export files of one or more directories.
+    """
+    def __init__(self, root_dir, subdirs=('',), recursive=False, index_file=None):
+        """
+        Args:
+            root_dir: root directory of the catalog (e.g. project 'Export' directory)
+            subdirs: directories relative to root_dir to scan (e.g. ('3d', '1d'))
+            recursive: if True, sub-directories are scanned as well
+            index_file: json sidecar index.  The catalog is loaded from the index
+                        if it exists.  Default (None) does not use an index.
+        """
+        self._root_dir = os.path.abspath(root_dir)
+        self._subdirs = tuple(subdirs)
+        self._recursive = recursive
+        self._index_file = index_file
+        # directory -> {'mtime': ns, 'entries': {name: [is_dir, size, mtime]}}
+        self._directories = dict()
+        # path -> ExportRecord
+        self._records = dict()
+        self._query_index = None
+        # directory -> {name prefix up to the first '[': names}
+        self._bracket_index = dict()
+        if index_file is not None and os.path.exists(index_file):
+            self.load_index()
+
+    @classmethod
+    def for_project(cls, project_dir, index=True):
+        """Catalog of the Export/3d and Export/1d trees of a CST project.
+        Args:
+            project_dir: CST project directory
+            index: if True, the catalog is persisted in Export/.cstmod_export_catalog.json
+        Returns:
+            refreshed ExportCatalog
+        """
+        export_dir = os.path.join(project_dir, 'Export')
+        index_file = os.path.join(export_dir, catalog_index_name) if index else None
+        catalog = cls(export_dir, subdirs=('3d', '1d'), recursive=True, index_file=index_file)
+        catalog.refresh()
+        return catalog
+
+    def refresh(self):
+        """Scan the catalog directories.  Directories with unchanged modification
+        time are not listed again, records of unchanged files are reused.
+        Returns:
+            True if the catalog changed
+        """
+        changed = False
+        visited = set()
+        pending = [os.path.normpath(os.path.join(self._root_dir, subdir)) for subdir in self._subdirs]
+        while pending:
+            directory = pending.pop()
+            if directory in visited:
+                continue
+            visited.add(directory)
+            changed = self._refresh_directory(directory) or changed
+            if self._recursive and directory in self._directories:
+                pending.extend(os.path.join(directory, name)
+                               for name, entry in self._directories[directory]['entries'].items()
+                               if entry[0])
+        # directories that no longer exist or are no longer reachable
+        for directory in set(self._directories) - visited:
+            self._remove_directory(directory)
+            changed = True
+        if changed:
+            self._query_index = None
+            self._bracket_index = dict()
+            if self._index_file is not None:
+                self.save_index()
+        return changed
+
+    def _refresh_directory(self, directory):
+        """Update the entries and records of a single directory.
+        Returns:
+            True if the directory changed
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            if directory in self._directories:
+                self._remove_directory(directory)
+                return True
+            return False
+        cached = self._directories.get(directory)
+        if cached is not None and cached['mtime'] == mtime:
+            return False
+
+        old_entries = cached['entries'] if cached is not None else dict()
+        entries = dict()
+        with os.scandir(directory) as it:
+            for dir_entry in it:
+                try:
+                    if dir_entry.is_dir():
+                        entries[dir_entry.name] = [True, 0, 0]
+                    else:
+                        stat = dir_entry.stat()
+                        entries[dir_entry.name] = [False, stat.st_size, stat.st_mtime_ns]
+                except OSError:
+                    # entry removed during scan
+                    continue
+        for name, entry in entries.items():
+            path = os.path.join(directory, name)
+            if entry[0] or (old_entries.get(name) == entry and path in self._records):
+                continue
+            self._records[path] = ExportRecord(path=path, name=name, size=entry[1],
+                                               mtime=entry[2], **parse_export_name(name))
+        for name in set(old_entries) - set(entries):
+            self._records.pop(os.path.join(directory, name), None)
+            if old_entries[name][0]:
+                self._remove_directory(os.path.join(directory, name))
+        self._directories[directory] = {'mtime': mtime, 'entries': entries}
+        return True
+
+    def _remove_directory(self, directory):
+        """Drop a directory and its records from the catalog.
+        """
+        cached = self._directories.pop(directory, None)
+        if cached is not None:
+            for name in cached['entries']:
+                self._records.pop(os.path.join(directory, name), None)
+
+    def _build_query_index(self):
+        """Group records by (quantity, frequency, excitation_type, postfix,
+        averaging_mass), each group sorted by channel.
+        """
+        query_index = dict()
+        for record in self._records.values():
+            key = _query_key(record.quantity, record.frequency, record.excitation_type,
+                             record.postfix, record.averaging_mass)
+            query_index.setdefault(key, []).append(record)
+        for records in query_index.values():
+            records.sort(key=_channel_order)
+        self._query_index = query_index
+
+    def find(self, quantity, frequency=None, excitation_type='', postfix='', averaging_mass=None):
+        """Records of an export, sorted by channel number.
+        Args:
+            quantity: exported quantity, e.g. 'e-field', 'SAR' (case insensitive)
+            frequency: monitor frequency in simulation units (e.g. 447)
+            excitation_type: 'AC', 'pw', 'Trans', ...
+            postfix: text following the excitation (e.g. '_2Q')
+            averaging_mass: SAR averaging mass, e.g. '10g'
+        Returns:
+            list of ExportRecord
+        """
+        if self._query_index is None:
+            self._build_query_index()
+        return list(self._query_index.get(_query_key(quantity, frequency, excitation_type,
+                                                     postfix, averaging_mass), []))
+
+    def files(self, quantity, frequency=None, excitation_type='', postfix='', averaging_mass=None):
+        """Paths of export files sorted by channel number.  See find.
+        """
+        return [record.path for record in self.find(quantity, frequency, excitation_type,
+                                                    postfix, averaging_mass)]
+
+    def match(self, directory, pattern, include_dirs=True, bracket_prefix=None):
+        """Entries of a catalog directory matching a shell-style pattern.
+        Args:
+            directory: directory within the catalog
+            pattern: fnmatch pattern of entry names (square brackets padded)
+            include_dirs: if True, sub-directory names are matched as well
+            bracket_prefix: literal start of the pattern up to and including
+                            its first literal '[' (e.g. 'e-field (f=447) [').
+                            If given, only the entries with this prefix are
+                            matched, looked up in an index of the directory.
+        Returns:
+            list of matching paths
+        """
+        directory = os.path.normpath(os.path.abspath(directory))
+        if directory not in self._directories:
+            self._refresh_directory(directory)
+            self._query_index = None
+            self._bracket_index = dict()
+        if directory not in self._directories:
+            return []
+        entries = self._directories[directory]['entries']
+        if bracket_prefix is None:
+            names = list(entries)
+        else:
+            if directory not in self._bracket_index:
+                bracket_index = dict()
+                for name in entries:
+                    bracket_index.setdefault(_bracket_key(name), []).append(name)
+                self._bracket_index[directory] = bracket_index
+            names = self._bracket_index[directory].get(_bracket_key(bracket_prefix), [])
+        names = [name for name in names if include_dirs or not entries[name][0]]
+        if not pattern.startswith('.'):
+            # hidden files are not matched by wildcards, as with glob
+            names = [name for name in names if not name.startswith('.')]
+        return [os.path.join(directory, name) for name in fnmatch.filter(names, pattern)]
+
+    def save_index(self):
+        """Write the catalog to the sidecar index.  Failure to write (e.g. a
+        read-only export directory) is reported, not raised.
+        """
+        index = {'version': catalog_index_version,
+                 'root_dir': self._root_dir,
+                 'directories': self._directories,
+                 'records': [list(record) for record in self._records.values()]}
+        try:
+            temp_file = self._index_file + '.tmp'
+            with open(temp_file, 'w') as indexf:
+                json.dump(index, indexf)
+            os.replace(temp_file, self._index_file)
+        except OSError as ex:
+            print("[export_catalog] unable to write index file: ", self._index_file, ex)
+
+    def load_index(self):
+        """Load the catalog from the sidecar index.  An unreadable or stale
+        index is ignored and the catalog is rebuilt by the next refresh.
+        """
+        try:
+            with open(self._index_file, 'r') as indexf:
+                index = json.load(indexf)
+            if index['version'] != catalog_index_version or index['root_dir'] != self._root_dir:
+                return
+            self._directories = index['directories']
+            self._records = {record[0]: ExportRecord(*record) for record in index['records']}
+            self._query_index = None
+            self._bracket_index = dict()
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            print("[export_catalog] ignoring index file: ", self._index_file, ex)
+            self._directories = dict()
+            self._records = dict()
+
+    @property
+    def records(self):
+        """All records of the catalog.
+        """
+        return list(self._records.values())
+
+    @property
+    def root_dir(self):
+        """Root directory of the catalog.
+        """
+        return self._root_dir
+
+# process wide catalogs of single directories used by the file utilities
+_directory_catalogs = dict()
+_directory_catalogs_lock = threading.Lock()
+
+def directory_catalog(directory):
+    """Shared catalog of a single directory, refreshed if the directory changed.
+    Safe to call from several threads.
+    Args:
+        directory: directory path
+    Returns:
+        ExportCatalog
+    """
+    directory = os.path.normpath(os.path.abspath(directory))
+    with _directory_catalogs_lock:
+        catalog = _directory_catalogs.get(directory)
+        if catalog is None:
+            catalog = ExportCatalog(directory)
+            _directory_catalogs[directory] = catalog
+        catalog.refresh()
+    return catalog
@@ -0,0 +1,232 @@
+"""
+Streaming reader of Touchstone (.sNp) S-parameter files.
+
+Touchstone files of wide sweeps of arrays with many ports are hundreds of MB
+of text.  The file is read in large blocks; comments are stripped and each
+block is converted to numbers with one numpy call, and the numbers are
+grouped into frequency records of 1 + 2 N^2 values.  Only the records of the
+requested frequencies are kept, so many frequencies are extracted in one
+pass without building a full network.
+
+Data formats RI (real, imaginary), MA (magnitude, angle in degrees) and DB
+(dB magnitude, angle in degrees) and frequency units Hz/kHz/MHz/GHz of the
+option line '# <unit> S <format> R <z0>' are supported.  Records list the
+S-parameters row by row (S11 S12 ... S1N S21 ...), except for 2-port files
+which list S11 S21 S12 S22 (unless a Touchstone 2 file specifies
+'[Two-Port Data Order] 12_21').
+
+Parsed files can be cached as binary (nfreq x N x N) complex arrays (see
+cstutil.cached_arrays); frequencies are then selected from the memory
+mapped cache.
+"""
+import re
+try:
+    import numpy as np
+except:
+    print("Touchstone reader requires Numpy.  Ensure package numpy is installed.")
+from .binary_cache import cached_arrays
+
+# bytes read per parser block
+touchstone_block_bytes = 2**24
+
+frequency_units = {'hz': 1.0, 'khz': 1.0e3, 'mhz': 1.0e6, 'ghz': 1.0e9}
+
+_ports_re = re.compile(r'\.s([0-9]+)p$', re.IGNORECASE)
+
+def touchstone_ports(file_name):
+    """Number of ports from a Touchstone file extension, e.g. 16 of '.s16p'.
+    Returns:
+        number of ports, or None if the extension is not .sNp
+    """
+    match = _ports_re.search(file_name)
+    return int(match.group(1)) if match else None
+
+def _parse_options(line, options):
+    """Update options from the option line '# <unit> <parameter> <format> R <z0>'.
+    Raises:
+        ValueError if the file holds parameters other than S-parameters
+    """
+    tokens = line[1:].split()
+    index = 0
+    while index < len(tokens):
+        token = tokens[index].lower()
+        if token in frequency_units:
+            options['frequency_scale'] = frequency_units[token]
+        elif token in ('ri', 'ma', 'db'):
+            options['format'] = token
+        elif token == 'r' and index + 1 < len(tokens):
+            options['z0'] = float(tokens[index + 1])
+            index += 1
+        elif token in ('y', 'z', 'h', 'g'):
+            raise ValueError("Only S-parameter files are supported, found parameter: " + tokens[index])
+        index += 1
+
+def _read_header(fh, options):
+    """Read comments, option line and keywords up to the first data line.
+    Returns:
+        first data line (bytes), comments stripped
+    """
+    while True:
+        line = fh.readline()
+        if not line:
+            return b''
+        line = line.split(b'!', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith(b'#'):
+            _parse_options(line.decode('ascii', 'replace'), options)
+        elif line.startswith(b'['):
+            keyword = line.decode('ascii', 'replace').lower()
+            if keyword.startswith('[number of ports]'):
+                options['nports'] = int(keyword.split(']', 1)[1])
+            elif keyword.startswith('[two-port data order]'):
+                options['two_port_order'] = keyword.split(']', 1)[1].strip()
+        else:
+            return line + b'\n'
+
+def _strip_block(block):
+    """Data of a block of whole lines without comments.  Returns (data,
+    end) with end True if a keyword line (e.g. '[End]') ends the data.
+    Comments are stripped first, so brackets in comments are not keywords.
+    """
+    if b'!' in block:
+        block = b'\n'.join(line.split(b'!', 1)[0] for line in block.split(b'\n'))
+    if b'[' in block:
+        lines = block.split(b'\n')
+        for index, line in enumerate(lines):
+            if line.lstrip().startswith(b'['):
+                return b'\n'.join(lines[:index]), True
+    return block, False
+
+def iter_touchstone_records(file_name, nports=None, block_bytes=touchstone_block_bytes):
+    """Iterate over blocks of raw frequency records.
+    Args:
+        file_name: Touchstone file
+        nports: number of ports (default: from [Number of Ports] or the file extension)
+        block_bytes: bytes parsed per block
+    Yields:
+        (options, records) with records (nrecords, 1 + 2 nports^2) raw values
+    Raises:
+        ValueError if the number of ports is unknown or the file is truncated
+    """
+    options = {'frequency_scale': 1.0e9, 'format': 'ma', 'z0': 50.0, 'nports': None,
+               'two_port_order': '21_12'}
+    with open(file_name, 'rb') as fh:
+        remainder = _read_header(fh, options)
+        nports = nports or options['nports'] or touchstone_ports(file_name)
+        if nports is None:
+            raise ValueError("Unknown number of ports of Touchstone file: " + file_name)
+        options['nports'] = nports
+        record_size = 1 + 2*nports*nports
+        values = np.zeros(0)
+        end = False
+        while not end:
+            block = fh.read(block_bytes)
+            if block:
+                block = remainder + block
+                split = block.rfind(b'\n') + 1
+                (block, remainder) = (block[:split], block[split:])
+            else:
+                (block, remainder) = (remainder, b'')
+                end = True
+            (block, keyword_end) = _strip_block(block)
+            end = end or keyword_end
+            if block.strip():
+                # (numpy parses whitespace only strings as [-1])
+                values = np.concatenate((values, np.fromstring(block, dtype=np.float64, sep=' ')))
+            nrecords = len(values)//record_size
+            if nrecords:
+                yield options, np.reshape(values[:nrecords*record_size], (nrecords, record_size))
+                values = values[nrecords*record_size:]
+        if len(values):
+            raise ValueError("Incomplete frequency record in Touchstone file: " + file_name)
+
+def touchstone_s_parameters(records, options):
+    """Complex S-parameters of raw frequency records.
+    Args:
+        records: (nrecords, 1 + 2 nports^2) raw values
+        options: options of the file (see iter_touchstone_records)
+    Returns:
+        (frequencies in Hz, (nrecords, nports, nports) complex S-parameters)
+    """
+    nports = options['nports']
+    pairs = np.reshape(records[:, 1:], (len(records), nports, nports, 2))
+    if 'ri' == options['format']:
+        s = pairs[..., 0] + 1.0j*pairs[..., 1]
+    else:
+        magnitude = pairs[..., 0] if 'ma' == options['format'] else 10.0**(pairs[..., 0]/20.0)
+        s = magnitude*np.exp(1.0j*np.deg2rad(pairs[..., 1]))
+    if 2 == nports and '21_12' == options['two_port_order']:
+        # S11 S21 S12 S22
+        s = np.swapaxes(s, 1, 2)
+    return records[:, 0]*options['frequency_scale'], s
+
+def _parse_touchstone(file_list, block_bytes=touchstone_block_bytes):
+    """Full network of a Touchstone file (parse function of the cache).
+    """
+    frequencies = []
+    s_parameters = []
+    options = None
+    for options, records in iter_touchstone_records(file_list[0], block_bytes=block_bytes):
+        (freqs, s) = touchstone_s_parameters(records, options)
+        frequencies.append(freqs)
+        s_parameters.append(s)
+    if options is None:
+        raise ValueError("No frequency records in Touchstone file: " + file_list[0])
+    return {'f': np.concatenate(frequencies), 's': np.concatenate(s_parameters),
+            'z0': np.asarray([options['z0']])}
+
+def _select_frequencies(freqs, frequencies, frequency_range):
+    """Indices of the records nearest to frequencies or inside a range.
+    """
+    if frequencies is not None:
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=np.float64))
+        return np.argmin(np.abs(freqs[:, np.newaxis] - frequencies[np.newaxis, :]), axis=0)
+    if frequency_range is not None:
+        return np.flatnonzero((freqs >= frequency_range[0]) & (freqs <= frequency_range[1]))
+    return np.arange(len(freqs))
+
+def read_touchstone(file_name, frequencies=None, frequency_range=None, use_cache=True, cache_dir=None,
+                    block_bytes=touchstone_block_bytes):
+    """S-parameters of a Touchstone file at selected frequencies.
+    Args:
+        file_name: Touchstone file (.sNp)
+        frequencies: frequencies in Hz; the nearest record of each is returned
+        frequency_range: (fmin, fmax) in Hz; all records inside are returned
+                         (used if frequencies is None; default: all records)
+        use_cache: parse the whole file once and select from the binary
+                   cache; if False, only selected records are kept while streaming
+        cache_dir: cache directory (see cstutil.cache_file_name)
+        block_bytes: bytes parsed per block
+    Returns:
+        (frequencies, s, z0) with (nfreq,) frequencies in Hz, (nfreq, N, N)
+        complex S-parameters and reference impedance
+    """
+    if use_cache:
+        network = cached_arrays([file_name], lambda file_list: _parse_touchstone(file_list, block_bytes),
+                                'touchstone', cache_dir)
+        index = _select_frequencies(np.asarray(network['f']), frequencies, frequency_range)
+        return np.asarray(network['f'][index]), np.asarray(network['s'][index]), float(network['z0'][0])
+
+    if frequencies is not None:
+        frequencies = np.atleast_1d(np.asarray(frequencies, dtype=np.float64))
+        best_distance = np.full(len(frequencies), np.inf)
+        best_records = [None]*len(frequencies)
+    selected = []
+    options = None
+    for options, records in iter_touchstone_records(file_name, block_bytes=block_bytes):
+        freqs = records[:, 0]*options['frequency_scale']
+        if frequencies is not None:
+            # nearest record so far of each requested frequency
+            distance = np.abs(freqs[:, np.newaxis] - frequencies[np.newaxis, :])
+            nearest = np.argmin(distance, axis=0)
+            for k in np.flatnonzero(distance[nearest, np.arange(len(frequencies))] < best_distance):
+                best_distance[k] = distance[nearest[k], k]
+                best_records[k] = records[nearest[k]].copy()
+        else:
+            selected.append(records[_select_frequencies(freqs, None, frequency_range)].copy())
+    if options is None:
+        raise ValueError("No frequency records in Touchstone file: " + file_name)
+    records = np.asarray(best_records) if frequencies is not None else np.concatenate(selected)
+    (freqs, s) = touchstone_s_parameters(np.reshape(records, (-1, 1 + 2*options['nports']**2)), options)
+    return freqs, s, options['z0']
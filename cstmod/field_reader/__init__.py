@@ -1,9 +1,13 @@
 # Load cstmod field reader modules
 from .field_reader_abc import FieldReaderABC
+from .compound_fields import read_complex_fields, complex_view
+from .axis_order import field_axes, xyz_view, matlab_view
+from .region_of_interest import roi_slices
 from .field_reader_cst2019 import FieldReaderCST2019
 from .data_narray_abc import DataNArrayABC
 from .data_narray import GenericDataNArray
 from .field_reader3d import ResultReader3D
 from .padbrackets import padbrackets
 from .field_reader_h5 import FieldReaderH5
+from .field_reader_sweep import FrequencySweepReaderCST2019
 
@@ -0,0 +1,65 @@
+"""
+Axis order metadata of field arrays.
+
+Readers either return fields in (x, y, z, ...) order, which requires a
+strided transpose of every voxel, or keep CST's native C-order layout
+(z, y, x, component).  The axes of a field array are recorded as a tuple of
+axis names so consumers can get an (x, y, z, ...) oriented view without a
+physical transpose.
+"""
+try:
+    import numpy as np
+except:
+    print("Field reader requires Numpy.  Ensure package numpy is installed.")
+
+axis_orders = ('xyz', 'zyx')
+
+# axis names of fields in (x, y, z) order
+xyz_axes = ('x', 'y', 'z', 'component', 'channel')
+
+def field_axes(axis_order, multichannel=False, vector=True):
+    """Axis names of a field array.
+    Args:
+        axis_order: 'xyz' for (x, y, z, component, channel) arrays or 'zyx' for
+                    native CST order (channel, z, y, x, component) arrays
+        multichannel: array has a channel axis
+        vector: array has a component axis
+    Returns:
+        tuple of axis names
+    Raises:
+        ValueError for unknown axis order
+    """
+    if 'xyz' == axis_order:
+        axes = ('x', 'y', 'z', 'component', 'channel')
+    elif 'zyx' == axis_order:
+        axes = ('channel', 'z', 'y', 'x', 'component')
+    else:
+        raise ValueError("Unknown axis order: " + str(axis_order) +
+                         ". Valid axis orders are " + str(axis_orders))
+    if not multichannel:
+        axes = tuple(axis for axis in axes if axis != 'channel')
+    if not vector:
+        axes = tuple(axis for axis in axes if axis != 'component')
+    return axes
+
+def xyz_view(fields, axes):
+    """View of a field array in (x, y, z, component, channel) order.
+    Args:
+        fields: field array
+        axes: axis names of fields
+    Returns:
+        transposed view of fields (no copy)
+    """
+    return np.transpose(fields, [axes.index(axis) for axis in xyz_axes if axis in axes])
+
+def matlab_view(fields, axes):
+    """View of a field array in the C-order layout of a MAT (v7.3) variable.
+    MATLAB reverses hdf5 dimensions, so a (channel, component, z, y, x) dataset
+    is loaded as (x, y, z, component, channel).
+    Args:
+        fields: field array
+        axes: axis names of fields
+    Returns:
+        transposed view of fields (no copy)
+    """
+    return np.transpose(fields, [axes.index(axis) for axis in reversed(xyz_axes) if axis in axes])
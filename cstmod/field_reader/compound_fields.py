@@ -0,0 +1,92 @@
+"""
+Single-pass decode of CST compound field datasets.
+
+CST stores complex vector fields as an hdf5 compound type
+    {x: {re, im}, y: {re, im}, z: {re, im}}
+with all members of the same floating point type.  The compound dataset is
+read once into a structured buffer, which has the memory layout of three
+interleaved complex values.  The x-, y-, z- components are then exposed as a
+complex view of the buffer without copying.
+"""
+try:
+    import numpy as np
+except:
+    print("Field reader requires Numpy.  Ensure package numpy is installed.")
+
+from cstmod.field_reader.region_of_interest import selection_shape
+
+cst_vector_components = ('x', 'y', 'z')
+
+def _packed_complex_type(compound_type):
+    """Return the complex data type with the same memory layout as the CST
+    compound type, or None if the layout differs (e.g. padded or reordered
+    members).
+    """
+    for float_type, complex_type in ((np.float32, np.complex64), (np.float64, np.complex128)):
+        packed_type = np.dtype([(comp, [('re', float_type), ('im', float_type)])
+                                for comp in cst_vector_components])
+        if compound_type == packed_type:
+            return np.dtype(complex_type)
+    return None
+
+def complex_view(buffer):
+    """Complex (..., 3) view of a structured buffer of CST vector fields.
+    Args:
+        buffer: structured ndarray with CST compound type
+    Returns:
+        complex ndarray with dimensions buffer.shape + (3,).  A view of buffer
+        if the compound type is packed, otherwise a complex copy.
+    """
+    complex_type = _packed_complex_type(buffer.dtype)
+    if complex_type is not None and buffer.flags['C_CONTIGUOUS']:
+        if 0 == buffer.ndim:
+            buffer = buffer.reshape(1)
+        return buffer.view(complex_type).reshape(np.shape(buffer) + (3,))
+
+    # fall back to assembling components
+    float_type = np.result_type(*[buffer.dtype[comp][part]
+                                  for comp in cst_vector_components
+                                  for part in ('re', 'im')])
+    fields = np.empty(np.shape(buffer) + (3,), dtype=np.result_type(float_type, np.complex64))
+    for i, comp in enumerate(cst_vector_components):
+        fields[..., i].real = buffer[comp]['re']
+        fields[..., i].imag = buffer[comp]['im']
+    return fields
+
+def read_complex_fields(dataset, selection=None):
+    """Read a CST compound field dataset in a single pass.
+    Args:
+        dataset: h5py dataset of CST vector fields (e.g. dataf['E-Field'])
+        selection: optional (z, y, x) tuple of slices; only this hyperslab
+                   of the dataset is read
+    Returns:
+        complex ndarray with dimensions (nz, ny, nx, 3) in CST native order.
+        The data type is complex64 for single precision exports.
+    """
+    buffer = np.empty(selection_shape(dataset.shape, selection), dtype=dataset.dtype)
+    if buffer.size > 0:
+        dataset.read_direct(buffer, source_sel=selection)
+    return complex_view(buffer)
+
+def read_complex_fields_into(dataset, out, selection=None):
+    """Read a CST compound field dataset directly into a complex array.  If
+    out is C-contiguous and has the complex type matching the compound type,
+    the dataset is read straight into the memory of out without temporaries.
+    Args:
+        dataset: h5py dataset of CST vector fields (e.g. dataf['E-Field'])
+        out: complex ndarray with dimensions (nz, ny, nx, 3)
+        selection: optional (z, y, x) tuple of slices; only this hyperslab
+                   of the dataset is read
+    Returns:
+        out
+    """
+    complex_type = _packed_complex_type(dataset.dtype)
+    shape = selection_shape(dataset.shape, selection)
+    if complex_type == out.dtype and out.flags['C_CONTIGUOUS'] \
+       and np.shape(out) == shape + (3,):
+        if out.size > 0:
+            dataset.read_direct(np.ndarray(shape, dtype=dataset.dtype, buffer=out),
+                                source_sel=selection)
+    else:
+        out[...] = read_complex_fields(dataset, selection)
+    return out
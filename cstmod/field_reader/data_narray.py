@@ -2,19 +2,51 @@
 """
 import os
 import sys
-import csv
 import re
-if 'win32' == sys.platform:
-    import fnmatch
-else:
-    import glob
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import numpy as np
-
+    from scipy.interpolate import CubicSpline
 except:
     print("Field reader requires Numpy and Scipy.  Ensure package numpy,scipy is installed.")
 from cstmod.field_reader import DataNArrayABC
+from cstmod.cstutil import find_cst_files, pad_square_bracket_string, cached_arrays
+
+def read_one_d_export(file_name):
+    """Read a CST 1d ascii export in one bulk parse.
+    Args:
+        file_name: export file with columns x, real part and (optional)
+                   imaginary part.  Lines starting with '#' are skipped.
+    Returns:
+        (xdim, data) with complex data
+    """
+    values = np.loadtxt(file_name, comments='#', ndmin=2, dtype=np.float64)
+    data = values[:, 1].astype(np.complex128)
+    if values.shape[1] > 2:
+        data.imag = values[:, 2]
+    return values[:, 0], data
+
+def parse_one_d_exports(file_list, nworkers=None):
+    """Read the 1d exports of all channels concurrently.
+    Args:
+        file_list: list of channel export files sorted by channel
+        nworkers: number of reader threads
+    Returns:
+        dict with xdim (data_length) and data (data_length x nchannels)
+    Raises:
+        ValueError if the channel files have different x-dimensions
+    """
+    if nworkers is None:
+        nworkers = max(1, min(len(file_list), os.cpu_count() or 1))
+    with ThreadPoolExecutor(nworkers) as executor:
+        channels = list(executor.map(read_one_d_export, file_list))
+    xdim = channels[0][0]
+    for file_name, (channel_xdim, channel_data) in zip(file_list, channels):
+        if not np.array_equal(channel_xdim, xdim):
+            raise ValueError("x-dimension of " + file_name + " differs from " + file_list[0])
+    data = np.stack([channel_data for (channel_xdim, channel_data) in channels], axis=-1)
+    return {'xdim': xdim, 'data': data}
 
 class GenericDataNArray(DataNArrayABC):
     """Class to manage n-channels of generic 1-D ascii data exported from CST.
@@ -27,6 +59,7 @@ class GenericDataNArray(DataNArrayABC):
         self._data_valid = False
         self._source_dir = ""
         self._xdim = None
+        self._spline = None
 
     def _process_file_list(self, file_name_pattern):
         """Generate a list of export files based on provided file name pattern.
@@ -37,15 +70,9 @@ class GenericDataNArray(DataNArrayABC):
             sorted list of filenames matching file_name_pattern
         """
         if 'win32' == sys.platform:
-            file_list = []
             self._source_dir = os.path.dirname(file_name_pattern)
-            file_base_pattern = self._pad_bracket_string(os.path.basename(file_name_pattern))
-            file_list = [os.path.join(self._source_dir, file) for file in fnmatch.filter(os.listdir(os.path.dirname(file_name_pattern)),file_base_pattern)]
-        else: 
-            
-            file_list = glob.glob(self._pad_bracket_string(file_name_pattern))
-            print("[DEBUG]: glob_pattern: ", self._pad_bracket_string(file_name_pattern))
-            print("[DEBUG]: file_list: ", file_list)
+        file_list = find_cst_files(file_name_pattern)
+        print("[DEBUG]: file_list: ", file_list)
         
         if 0 == len(file_list):
             raise KeyError("File pattern not found: " + file_name_pattern)
@@ -57,57 +84,86 @@ class GenericDataNArray(DataNArrayABC):
     def _pad_bracket_string(self, string_with_brackets):
         """Pad square bracket characters for pattern matching with square brackets.
         """
-        f_right_bracket = string_with_brackets.split('[')  
-        f_padded_right_bracket = [] # storage of padded string fragments 
-        for fsub in f_right_bracket:
-            temp = fsub.split(']')
-            f_padded_right_bracket.append("[]]".join(temp))
+        return pad_square_bracket_string(string_with_brackets)
 
-        return "[[]".join(f_padded_right_bracket)            
-
-    def load_data_one_d(self, filename_pattern):
+    def load_data_one_d(self, filename_pattern, nworkers=None, use_cache=True):
         """Load data corresponding to filename pattern.
+        Args:
+            filename_pattern: pattern of the channel export files
+            nworkers: number of threads loading channel files (default: one
+                      per channel up to the number of cpus)
+            use_cache: load the parsed data from (and save it to) the binary
+                       sidecar cache next to the export files
+        Raises:
+            KeyError if no files match filename_pattern
+            ValueError if the channel files have different x-dimensions
         """
         file_list = self._process_file_list(filename_pattern)
         print('[DEBUG load_data_one_d] ', file_list)
-        if len(file_list) == 0:
-            raise KeyError("File list is empty. File pattern: ", file_pattern)
-        else:
-            self._nchannels = len(file_list)
-            # load first file in file_list to get dimensions
-            with open(file_list[0], 'r', newline='') as csvfile:
-                datareader = csv.reader(csvfile, delimiter='\t', quotechar='|')
-                self._data_length = sum(1 for row in datareader)
-                self._data_shape = (self._data_length, self._nchannels)
-                self._xdim = np.zeros(self._data_length, dtype = np.float)
-                # go back to reader beginning and read xdim 
-                csvfile.seek(0)
-                ind = 0
-                for row in datareader:
-                    self._xdim[ind] = np.float(row[0])
-                    ind += 1
-
-            self._data = np.zeros(self._data_shape, dtype=np.complex)
-            xdim = np.zeros(self._data_length, dtype=np.float)
-            for channel in range(self._nchannels):
-                with open(file_list[channel], 'r', newline='') as csvfile:
-                    datareader = csv.reader(csvfile, delimiter='\t', quotechar='|')
-                    irow = 0
-                    for row in datareader:
-                        xdim[irow] = np.float(row[0])
-                        self._data[irow,channel] = np.float(row[1]) + 1.0j*np.float(row[2])
-                        irow += 1
-
-
-    def nchannel_data_at_value(self, val0):
-        """Returns the n-channel data at given value.
+        arrays = cached_arrays(file_list, lambda files: parse_one_d_exports(files, nworkers),
+                               tag='data_narray', use_cache=use_cache)
+        self._xdim = arrays['xdim']
+        self._data = arrays['data']
+        if np.any(np.diff(self._xdim) < 0):
+            order = np.argsort(self._xdim, kind='stable')
+            self._xdim = self._xdim[order]
+            self._data = self._data[order]
+        self._spline = None
+        (self._data_length, self._nchannels) = np.shape(self._data)
+        self._data_shape = (self._data_length, self._nchannels)
+
+    def _value_indices(self, values):
+        """Binary search of values in the (ascending) x-dimension.
+        Returns:
+            indices of the interval lower bounds, clipped to [0, data_length - 2]
+        """
+        ind = np.searchsorted(self._xdim, values, side='right') - 1
+        return np.clip(ind, 0, max(0, self._data_length - 2))
+
+    def nchannel_data_at_value(self, val0, eval_type='nearest_neighbor'):
+        """Returns the n-channel data at given value(s).
+        Args:
+            val0: value (e.g. frequency) or array of values of interest
+            eval_type: 'nearest_neighbor', 'linear' or 'cubic'
+        Returns:
+            (x, data_at_val).  For scalar val0, x is the nearest x-dimension
+            value (or val0 if interpolated) and data_at_val has nchannels
+            elements; for arrays of nvalues values, x has nvalues elements and
+            data_at_val is (nvalues x nchannels).
+        Raises:
+            ValueError for unknown eval_type or values outside of the
+            x-dimension when interpolating
         """
-        # find index of element nearest to 
-        ind = np.argmin(np.abs(self._xdim - val0))
-        x_nearest = self._xdim[ind]
-        print(self._xdim)
-        data_at_val  = [self._data[ind, channel] for channel in range(self._nchannels)]
-        return x_nearest, data_at_val
+        values = np.asarray(val0, dtype=np.float64)
+        scalar = (0 == values.ndim)
+        values = np.atleast_1d(values)
+        if 'nearest_neighbor' == eval_type:
+            ind = self._value_indices(values)
+            upper = np.minimum(ind + 1, self._data_length - 1)
+            ind = np.where(np.abs(self._xdim[upper] - values) < np.abs(values - self._xdim[ind]), upper, ind)
+            x = self._xdim[ind]
+            data_at_val = self._data[ind, :]
+        elif eval_type in ('linear', 'cubic'):
+            if np.any(values < self._xdim[0]) or np.any(values > self._xdim[-1]):
+                raise ValueError("Values outside of x-dimension [" + str(self._xdim[0]) + ", "
+                                 + str(self._xdim[-1]) + "]: " + str(val0))
+            x = values
+            if 'linear' == eval_type:
+                ind = self._value_indices(values)
+                upper = np.minimum(ind + 1, self._data_length - 1)
+                width = self._xdim[upper] - self._xdim[ind]
+                weight = np.divide(values - self._xdim[ind], width,
+                                   out=np.zeros_like(values), where=width > 0)[:, np.newaxis]
+                data_at_val = (1.0 - weight)*self._data[ind, :] + weight*self._data[upper, :]
+            else:
+                if self._spline is None:
+                    self._spline = CubicSpline(self._xdim, self._data, axis=0)
+                data_at_val = self._spline(values)
+        else:
+            raise ValueError("Unknown eval_type: " + str(eval_type))
+        if scalar:
+            return x[0], data_at_val[0]
+        return x, data_at_val
 
     @property
     def nchannels(self):
@@ -126,10 +182,16 @@ class GenericDataNArray(DataNArrayABC):
     def data_shape(self):
         return self._data_shape
 
-    @property 
+    @property
     def data_length(self):
         return self._data_length
 
+    @property
+    def data(self):
+        """Returns the (data_length x nchannels) complex data.
+        """
+        return self._data
+
 
     @property
     def xdim(self):
@@ -17,11 +17,12 @@ class DataNArrayABC(ABC):
     def nchannel_data_at_value(self, val0, eval_type):
         """Returns the nchannels of data at the value of interest.
         Args:
-            val0      (float): value of interest that is exported.
-            eval_type (str)  : evaluation type ('nearest_neighbor', 'linear', etc.)
+            val0      (float or array): value(s) of interest that are exported.
+            eval_type (str)  : evaluation type ('nearest_neighbor', 'linear', 'cubic')
 
         Returns:
-            data_at_val (array): Returns n-channels of data at val0. 
+            data_at_val (array): Returns n-channels of data at val0 (nvalues x
+                                 nchannels for arrays of values).
         """
 
     @abstractproperty
@@ -21,6 +21,10 @@ try:
 except:
     print("Field reader requires Numpy and Scipy.  Ensure package numpy,scipy is installed.")
 
+from cstmod.field_reader.compound_fields import read_complex_fields
+from cstmod.field_reader.axis_order import field_axes
+from cstmod.field_reader.region_of_interest import read_mesh_lines, read_hyperslab
+
 class ResultReader3D(object):
     """ Read CST fields exported in HDF5 export format.
     """
@@ -28,7 +32,8 @@ class ResultReader3D(object):
     cst_3d_field_types = {'e-field':'E-Field', 'h-field':'H-Field','current':'Conduction Current Density','sar':'SAR'}
     #cst_merge_types = ['AC', 'pw', 'Trans', 'TxCh']
 
-    def __init__(self, file_name, field_type, rotating_frame = False):
+    def __init__(self, file_name, field_type, rotating_frame = False, dtype = np.complex128,
+                 axis_order = 'xyz', roi = None):
         self._file_name = file_name
         self._field_type = field_type
         self._rotating_frame = rotating_frame
@@ -38,6 +43,10 @@ class ResultReader3D(object):
         self._ydim = None
         self._zdim = None
         self._dim_scale = 0.001
+        self._dtype = np.dtype(dtype)
+        self._axes = field_axes(axis_order, vector=self._is_complex())
+        self._axis_order = axis_order
+        self._roi = roi
         self._read_fields()
 
     def _is_complex(self):
@@ -77,10 +86,15 @@ class ResultReader3D(object):
             raise FileNotFoundError
         with h5py.File(self._file_name,'r') as dataf:
             try:
-                self._xdim = self._dim_scale * dataf['Mesh line x'][()]
-                self._ydim = self._dim_scale * dataf['Mesh line y'][()]
-                self._zdim = self._dim_scale * dataf['Mesh line z'][()]
-                self._fields3d = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]],(2,1,0))
+                (xdim, ydim, zdim, selection) = read_mesh_lines(dataf, self._roi)
+                self._xdim = self._dim_scale * xdim
+                self._ydim = self._dim_scale * ydim
+                self._zdim = self._dim_scale * zdim
+                # real valued data is stored with the precision of the complex data type
+                self._fields3d = read_hyperslab(dataf[self.cst_3d_field_types[self._field_type.lower()]],
+                                                selection, dtype=np.finfo(self._dtype).dtype)
+                if 'xyz' == self._axis_order:
+                    self._fields3d = np.transpose(self._fields3d, (2,1,0))
             except(KeyError) as ex:
                 print("A KeyError exception was caught.  It is likely that " 
                       + "the hdf5 file is not a 3d field export or has "
@@ -101,46 +115,35 @@ class ResultReader3D(object):
             raise FileNotFoundError
         with h5py.File(self._file_name,'r') as dataf:
             try:
-                xdim = self._dim_scale * dataf['Mesh line x'][()]
-                ydim = self._dim_scale * dataf['Mesh line y'][()]
-                zdim = self._dim_scale * dataf['Mesh line z'][()]
-                fxre = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['x']['re'],(2,1,0))
-                fxim = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['x']['im'],(2,1,0))
-                fyre = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['y']['re'],(2,1,0))
-                fyim = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['y']['im'],(2,1,0))
-                fzre = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['z']['re'],(2,1,0))
-                fzim = np.transpose(dataf[self.cst_3d_field_types[self._field_type.lower()]]['z']['im'],(2,1,0))
+                (xdim, ydim, zdim, selection) = read_mesh_lines(dataf, self._roi)
+                xdim = self._dim_scale * xdim
+                ydim = self._dim_scale * ydim
+                zdim = self._dim_scale * zdim
+                fields = read_complex_fields(dataf[self.cst_3d_field_types[self._field_type.lower()]],
+                                             selection)
             except(KeyError) as ex:
                 print("A KeyError exception was caught.  It is likely that " 
                       + "the hdf5 file is not a 3d field export or has "
                       + "become corrupted.")
                 raise(ex)
-            # set dimensions of complex fields
-        if self._fields3d is None:
-            if self._rotating_frame:
-                field_dim = (len(xdim), len(ydim), len(zdim),2)
-            else:
-                field_dim = (len(xdim), len(ydim), len(zdim), 3)
-            self._fields3d = np.empty(field_dim, dtype=np.complex128)
 
+        if 'xyz' == self._axis_order:
+            # (z, y, x, component) -> (x, y, z, component)
+            fields = np.transpose(fields, (2, 1, 0, 3))
         # construct field array
 
         if self._rotating_frame:
+            self._fields3d = np.empty(np.shape(fields)[0:3] + (2,), dtype=self._dtype)
             # positive rotating frame (e.g. B1+)
-            fx = fxre + 1.0j*fxim
-            fy = fyre + 1.0j*fyim
+            fx = fields[:,:,:,0]
+            fy = fields[:,:,:,1]
             rotating_field_plus = 0.5*(fx + 1.0j*fy)
             self._fields3d[:,:,:,0] = rotating_field_plus
             # negative rotating frame (e.g. B1-)
             rotating_field_minus = 0.5*(np.conj(fx) + 1.0j*np.conj(fy))
             self._fields3d[:,:,:,1] = rotating_field_minus
         else:
-            # X-fields
-            self._fields3d[:,:,:,0] = fxre + 1.0j*fxim
-            # Y-fields
-            self._fields3d[:,:,:,1] = fyre + 1.0j*fyim
-            # Z-fields
-            self._fields3d[:,:,:,2] = fzre + 1.0j*fzim
+            self._fields3d = np.ascontiguousarray(fields, dtype=self._dtype)
          # set x-, listy-, z- dimensions
         self._xdim = xdim
         self._ydim = ydim
@@ -164,6 +167,24 @@ class ResultReader3D(object):
         """
         return self._zdim
     
+    @property
+    def dtype(self):
+        """ Return complex data type of fields
+        """
+        return self._dtype
+
+    @property
+    def roi(self):
+        """ Return region of interest (xmin, xmax, ymin, ymax, zmin, zmax) in metres
+        """
+        return self._roi
+
+    @property
+    def axes(self):
+        """ Return axis names of the 3d fields, e.g. ('x', 'y', 'z', 'component')
+        """
+        return self._axes
+
     @property
     def fields3d(self):
         """ Return the complex 3d fields
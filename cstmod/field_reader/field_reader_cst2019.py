@@ -5,15 +5,10 @@ Implement concrete field reader class for CST 2019.
 import os
 import sys
 import re
-if 'win32' == sys.platform:
-    import fnmatch
-else:
-    import glob
 try:
     import h5py
-    import hdf5storage
 except: 
-    print("Field reader requires HDF5 support.  Ensure h5py, hdf5storage is installed.")
+    print("Field reader requires HDF5 support.  Ensure h5py is installed.")
 try:
     import numpy as np
     from scipy.constants import mu_0
@@ -21,6 +16,13 @@ except:
     print("Field reader requires Numpy and Scipy.  Ensure package numpy,scipy is installed.")
 
 from cstmod.field_reader import FieldReaderABC
+from cstmod.cstutil import find_cst_files, pad_square_bracket_string
+from cstmod.field_reader.parallel_channels import parallel_channel_store, imap_channels
+from cstmod.field_reader.prefetch import prefetch_channels, default_prefetch_depth
+from cstmod.field_reader.compound_fields import read_complex_fields, read_complex_fields_into
+from cstmod.field_reader.axis_order import field_axes
+from cstmod.field_reader.region_of_interest import read_mesh_lines
+from cstmod.field_writer.mat_writer import MatWriter, mat_storage_type, slab_chunks
 
 class FieldReaderCST2019(FieldReaderABC):
     """Concrete implementation of FieldReader for CST2019 and later that uses
@@ -30,7 +32,7 @@ class FieldReaderCST2019(FieldReaderABC):
     cst_3d_field_types = {'e-field':'E-Field', 'h-field':'H-Field'}
     cst_merge_types = ['AC', 'pw', 'Trans', 'TxCh','']
 
-    def __init__(self):
+    def __init__(self, dtype=np.complex128, axis_order='xyz', roi=None):
         self._field_file_list = []
         self._freq = 0.0
         self._excitation_type = ''
@@ -43,8 +45,13 @@ class FieldReaderCST2019(FieldReaderABC):
         self._normalization = [1.0]
         self._source_dir = ""
         self._dim_scale = 0.001
+        self._dtype = np.dtype(dtype)
+        self._axes = field_axes(axis_order, multichannel=True)
+        self._axis_order = axis_order
+        self._roi = roi
 
-    def _read_fields(self, field_dir, field_type, freq, excitation_type='', rotating_frame=False, field_direction=+1, postfix="", version='2020'):
+    def _read_fields(self, field_dir, field_type, freq, excitation_type='', rotating_frame=False, field_direction=+1, postfix="", version='2020', nworkers=None,
+                     prefetch=default_prefetch_depth):
         """Read fields from multiple files.  A field patter will be constructed
         from input values.  A FileNotFoundError will be raised if a set of files
         cannot be constructed.
@@ -54,6 +61,11 @@ class FieldReaderCST2019(FieldReaderABC):
             freq: field monitor frequency value (e.g. 297.3) in MHz
             excitation_type: one of standard CST 3d excitation types 'pw', 'AC', 'Trans',
             rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            nworkers: if given, channels are decoded concurrently by nworkers
+                      processes into a shared output buffer.
+            prefetch: number of channel files read ahead by a background thread
+                      while the current channel is arranged and normalized
+                      (serial decoding only, 0: no read ahead).
         Returns:
             None
         Raises:
@@ -61,6 +73,66 @@ class FieldReaderCST2019(FieldReaderABC):
         """
         # Reset field storage prior to reading.
         self._complex_fields = None
+        self._find_field_files(field_dir, field_type, freq, excitation_type, postfix, version)
+        for file_name in self._field_file_list:
+            if not os.path.exists(file_name):
+                print("Could not find file: ", file_name)
+                raise FileNotFoundError
+        (xdim, ydim, zdim) = self._read_mesh(self._field_file_list[0])
+        ncomp = 2 if rotating_frame else 3
+        if 'zyx' == self._axis_order:
+            field_dim = (self._nchannels, len(zdim), len(ydim), len(xdim), ncomp)
+            channel_axis = 0
+        else:
+            field_dim = (len(xdim), len(ydim), len(zdim), ncomp, self._nchannels)
+            channel_axis = -1
+        args_list = [(file_name, field_type, channel, rotating_frame, field_direction)
+                     for channel, file_name in enumerate(self._field_file_list)]
+        if nworkers is not None:
+            self._complex_fields = parallel_channel_store(self._decode_channel_fields, args_list,
+                                                          field_dim, self._dtype, nworkers,
+                                                          channel_axis=channel_axis)
+        else:
+            self._complex_fields = np.empty(field_dim, dtype=self._dtype)
+            if 0 == channel_axis:
+                channel_outs = [self._complex_fields[channel] for channel in range(self._nchannels)]
+            else:
+                channel_outs = [self._complex_fields[..., channel] for channel in range(self._nchannels)]
+            # native fields are read straight into the output
+            native = 'zyx' == self._axis_order and not rotating_frame
+            read_args = [(file_name, field_type, channel_outs[channel] if native else None)
+                         for channel, file_name in enumerate(self._field_file_list)]
+            for channel, decoded in prefetch_channels(self._read_channel, read_args, prefetch):
+                self._format_channel(decoded[3], channel, rotating_frame, field_direction,
+                                     out=channel_outs[channel])
+        # set x-, listy-, z- dimensions
+        self._xdim = xdim
+        self._ydim = ydim
+        self._zdim = zdim
+
+    def _read_mesh(self, file_name):
+        """Read the (scaled) mesh lines of a field file, cropped to the region
+        of interest.
+        Returns:
+            (xdim, ydim, zdim)
+        """
+        with h5py.File(file_name,'r') as dataf:
+            (xdim, ydim, zdim, selection) = read_mesh_lines(dataf, self._roi)
+        return self._dim_scale * xdim, self._dim_scale * ydim, self._dim_scale * zdim
+
+    def _find_field_files(self, field_dir, field_type, freq, excitation_type='', postfix="", version='2020'):
+        """Construct the field file pattern from input values and generate the 
+        sorted list of channel files.
+        Args:
+            field_dir: Directory where hdf5 field data is located
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            freq: field monitor frequency value (e.g. 297.3) in MHz
+            excitation_type: one of standard CST 3d excitation types 'pw', 'AC', 'Trans',
+        Returns:
+            list of field files sorted by channel number
+        Raises:
+            KeyError if the file pattern is not found
+        """
         if version == '2020':
             #try lower case field file naming convention (cst2020)
             file_name_pattern = os.path.abspath(field_dir) + os.path.sep \
@@ -86,83 +158,277 @@ class FieldReaderCST2019(FieldReaderABC):
         print("[field_reader_cst2019] nchannels: ", self._nchannels)
         print("[field_reader_cst2019] self.field_file_list: ", self._field_file_list)
         if len(self._normalization) != self._nchannels:
-            self._normalization = np.ones((self._nchannels), dtype = np.float)
-        for channel, file_name in enumerate(self._field_file_list):
-            if not os.path.exists(file_name):
-                print("Could not find file: ", file_name)
-                raise FileNotFoundError
-            with h5py.File(file_name,'r') as dataf:
-                try:
-                    
-                    xdim = self._dim_scale * dataf['Mesh line x'][()]
-                    ydim = self._dim_scale * dataf['Mesh line y'][()]
-                    zdim = self._dim_scale * dataf['Mesh line z'][()]
-                    fxre = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['x']['re'],(2,1,0))
-                    fxim = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['x']['im'],(2,1,0))
-                    fyre = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['y']['re'],(2,1,0))
-                    fyim = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['y']['im'],(2,1,0))
-                    fzre = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['z']['re'],(2,1,0))
-                    fzim = np.transpose(dataf[self.cst_3d_field_types[field_type.lower()]]['z']['im'],(2,1,0))
-                except(KeyError) as ex:
-                    print("A KeyError exception was caught.  It is likely that " 
-                          + "the hdf5 file is not a 3d field export or has "
-                          + "become corrupted.")
-                    raise(ex)
-                # set dimensions of complex fields
-                if self._complex_fields is None:
-                    if rotating_frame:
-                        field_dim = (len(xdim), len(ydim), len(zdim),2 , self._nchannels)
-
-                    else:
-                        field_dim = (len(xdim), len(ydim), len(zdim), 3, self._nchannels)
-                    self._complex_fields = np.empty(field_dim, dtype=np.complex)
-
-                # construct field array
-
-                if rotating_frame:
-                    # positive rotating frame (e.g. B1+)
-                    fx = fxre + 1.0j*fxim
-                    fy = fyre + 1.0j*fyim
-                    if field_direction < 0:
-                        rotating_field_plus = 0.5*(fx + 1.0j*fy)
-                    else:
-                        rotating_field_plus = 0.5*(fx + 1.0j*fy)
-                    self._complex_fields[:,:,:,0,channel] = self._normalization[channel] * rotating_field_plus
-                    # negative rotating frame (e.g. B1-)
-                    if field_direction < 0:
-                        rotating_field_minus = 0.5*np.conj(fx - 1.0j*fy)
-                    else:
-                        rotating_field_minus = 0.5*np.conj(fx - 1.0j*fy)
-                    self._complex_fields[:,:,:,1,channel] = self._normalization[channel] * rotating_field_minus
+            self._normalization = np.ones((self._nchannels), dtype = np.float64)
+        return self._field_file_list
+
+    def _read_channel(self, file_name, field_type, out=None):
+        """Read the native fields of a single channel export file.  This is
+        the I/O stage of decoding a channel, see _format_channel.
+        Args:
+            file_name: hdf5 field file of the channel
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            out: optional (nz, ny, nx, 3) array the fields are read into
+        Returns:
+            (xdim, ydim, zdim, fields) with fields of dimensions (nz, ny, nx, 3)
+        Raises:
+            FileNotFoundError
+        """
+        if not os.path.exists(file_name):
+            print("Could not find file: ", file_name)
+            raise FileNotFoundError
+        with h5py.File(file_name,'r') as dataf:
+            try:
+                (xdim, ydim, zdim, selection) = read_mesh_lines(dataf, self._roi)
+                xdim = self._dim_scale * xdim
+                ydim = self._dim_scale * ydim
+                zdim = self._dim_scale * zdim
+                dataset = dataf[self.cst_3d_field_types[field_type.lower()]]
+                if out is not None:
+                    # native order: read straight into output
+                    fields = read_complex_fields_into(dataset, out, selection)
+                else:
+                    fields = read_complex_fields(dataset, selection)
+            except(KeyError) as ex:
+                print("A KeyError exception was caught.  It is likely that " 
+                      + "the hdf5 file is not a 3d field export or has "
+                      + "become corrupted.")
+                raise(ex)
+        return xdim, ydim, zdim, fields
+
+    def _format_channel(self, fields, channel, rotating_frame=False, field_direction=+1,
+                        axis_order=None, out=None):
+        """Arrange and normalize the native fields of a channel.
+        Args:
+            fields: (nz, ny, nx, 3) native channel fields
+            channel: channel index used to look up the normalization
+            rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            axis_order: 'xyz' or native 'zyx' order of channel fields.  Default 
+                        (None) uses the axis order of the reader.
+            out: optional output array of the channel fields
+        Returns:
+            channel_fields of dimensions (nx, ny, nz, ncomp) for 'xyz' or 
+            (nz, ny, nx, ncomp) for 'zyx' axis order.
+        """
+        if axis_order is None:
+            axis_order = self._axis_order
+        if 'xyz' == axis_order:
+            # (z, y, x, component) -> (x, y, z, component)
+            fields = np.transpose(fields, (2, 1, 0, 3))
+        # construct field array
+        if rotating_frame:
+            if out is None:
+                channel_fields = np.empty(np.shape(fields)[0:3] + (2,), dtype=self._dtype)
+            else:
+                channel_fields = out
+            # positive rotating frame (e.g. B1+)
+            fx = fields[:,:,:,0]
+            fy = fields[:,:,:,1]
+            if field_direction < 0:
+                rotating_field_plus = 0.5*(fx + 1.0j*fy)
+            else:
+                rotating_field_plus = 0.5*(fx + 1.0j*fy)
+            channel_fields[:,:,:,0] = rotating_field_plus
+            # negative rotating frame (e.g. B1-)
+            if field_direction < 0:
+                rotating_field_minus = 0.5*np.conj(fx - 1.0j*fy)
+            else:
+                rotating_field_minus = 0.5*np.conj(fx - 1.0j*fy)
+            channel_fields[:,:,:,1] = rotating_field_minus
+        elif out is None:
+            channel_fields = np.ascontiguousarray(fields, dtype=self._dtype)
+        else:
+            channel_fields = out
+            if fields is not out:
+                channel_fields[...] = fields
+        channel_fields *= self._normalization[channel]
+        return channel_fields
+
+    def _decode_channel(self, file_name, field_type, channel, rotating_frame=False, field_direction=+1,
+                        axis_order=None, out=None):
+        """Read and normalize the fields of a single channel export file.
+        Args:
+            file_name: hdf5 field file of the channel
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            channel: channel index used to look up the normalization
+            rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            axis_order: 'xyz' or native 'zyx' order of channel fields.  Default 
+                        (None) uses the axis order of the reader.
+            out: optional output array of the channel fields
+        Returns:
+            (xdim, ydim, zdim, channel_fields) with channel_fields of dimensions 
+            (nx, ny, nz, ncomp) for 'xyz' or (nz, ny, nx, ncomp) for 'zyx' axis order.
+        Raises:
+            FileNotFoundError
+        """
+        if axis_order is None:
+            axis_order = self._axis_order
+        native_out = out if 'zyx' == axis_order and not rotating_frame else None
+        (xdim, ydim, zdim, fields) = self._read_channel(file_name, field_type, native_out)
+        channel_fields = self._format_channel(fields, channel, rotating_frame, field_direction,
+                                              axis_order, out)
+        return xdim, ydim, zdim, channel_fields
+
+    def iter_channels(self, field_dir, field_type, freq, excitation_type='', rotating_frame=False,
+                      field_direction=+1, postfix="", version='2020', prefetch=default_prefetch_depth):
+        """Iterate over the normalized fields of each channel.  Channel files
+        are read ahead by a background thread while the current channel is
+        processed.
+        Args:
+            field_dir: Directory where hdf5 field data is located
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            freq: field monitor frequency value (e.g. 297.3) in MHz
+            excitation_type: one of standard CST 3d excitation types 'pw', 'AC', 'Trans',
+            rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            prefetch: number of channels read ahead (0: no read ahead)
+        Yields:
+            (channel_index, channel_fields) with channel fields in the axis 
+            order of the reader
+        """
+        self._complex_fields = None
+        self._find_field_files(field_dir, field_type, freq, excitation_type, postfix, version)
+        (self._xdim, self._ydim, self._zdim) = self._read_mesh(self._field_file_list[0])
+        args_list = [(file_name, field_type) for file_name in self._field_file_list]
+        for channel, decoded in prefetch_channels(self._read_channel, args_list, prefetch):
+            yield channel, self._format_channel(decoded[3], channel, rotating_frame, field_direction)
+
+    def _decode_channel_fields(self, file_name, field_type, channel, rotating_frame=False, field_direction=+1):
+        """Read and normalize the fields of a single channel export file.
+        Returns:
+            ndarray of channel fields in the axis order of the reader
+        """
+        return self._decode_channel(file_name, field_type, channel, rotating_frame, field_direction)[3]
+
+    def _decode_native_channel(self, file_name, field_type, channel, rotating_frame=False, field_direction=+1):
+        """Read and normalize the fields of a single channel export file in
+        native (z, y, x, component) order.
+        """
+        return self._decode_channel(file_name, field_type, channel, rotating_frame, field_direction,
+                                    axis_order='zyx')
+
+    def _create_mat_fields(self, output_file, variable_name, field_dim, compression=None, dtype=None):
+        """Create MAT (v7.3) output file with mesh lines and a preallocated,
+        chunked variable for the multi-channel fields.
+        Args:
+            output_file: MAT (v7.3) output file
+            variable_name: name of MATLAB variable (e.g. 'efMapArrayN')
+            field_dim: (nchannels, nz, ny, nx, ncomp) dimensions of fields
+            compression: hdf5 compression of the fields (None, 'gzip', 'lzf')
+            dtype: complex data type of the stored fields (default: data type
+                   of the reader)
+        Returns:
+            (matf, variable) open MatWriter and MatVariable
+        """
+        dtype = self._dtype if dtype is None else np.dtype(dtype)
+        matf = MatWriter(output_file, compression=compression)
+        try:
+            matf.write_variable(u'XDim', self._xdim)
+            matf.write_variable(u'YDim', self._ydim)
+            matf.write_variable(u'ZDim', self._zdim)
+            (nchannels, nz, ny, nx, ncomp) = field_dim
+            # chunk along z-planes of a single component and channel
+            (complex_type, matlab_class) = mat_storage_type(dtype)
+            chunks = slab_chunks((nx, ny, nz), complex_type.itemsize) + (1, 1)
+            variable = matf.create_variable(variable_name, (nx, ny, nz, ncomp, nchannels),
+                                            dtype, chunks=chunks)
+        except:
+            matf.close()
+            raise
+        return matf, variable
+
+    def _write_mat_channel(self, variable, channel, channel_fields, field_scale=1.0, axis_order='zyx'):
+        """Write the fields of a channel to the MAT (v7.3) variable.
+        Args:
+            variable: MatVariable of multi-channel fields
+            channel: channel index
+            channel_fields: (nz, ny, nx, ncomp) fields for 'zyx' or 
+                            (nx, ny, nz, ncomp) fields for 'xyz' axis order
+            field_scale: scale factor applied to fields (e.g. mu_0 for b-fields)
+        """
+        if 1.0 != field_scale:
+            channel_fields = field_scale * channel_fields
+        if 'zyx' == axis_order:
+            channel_fields = np.transpose(channel_fields, (2, 1, 0, 3))
+        variable[..., channel] = channel_fields
+
+    def _write_mat_fields(self, output_file, variable_name, field_scale=1.0, compression=None, dtype=None):
+        """Write the multi-channel fields to a MAT (v7.3) file one channel at 
+        a time, stored as dtype (default: data type of the reader).
+        """
+        field_dim = (self._nchannels, len(self._zdim), len(self._ydim), len(self._xdim),
+                     np.shape(self._complex_fields)[self._axes.index('component')])
+        matf, variable = self._create_mat_fields(output_file, variable_name, field_dim, compression, dtype)
+        try:
+            for channel in range(self._nchannels):
+                if 'zyx' == self._axis_order:
+                    channel_fields = self._complex_fields[channel]
                 else:
-                    # X-fields
-                    self._complex_fields[:,:,:,0,channel] = self._normalization[channel] * (fxre + 1.0j*fxim)
-                    # Y-fields
-                    self._complex_fields[:,:,:,1,channel] = self._normalization[channel] * (fyre + 1.0j*fyim)
-                    # Z-fields
-                    self._complex_fields[:,:,:,2,channel] = self._normalization[channel] * (fzre + 1.0j*fzim)
-            # set x-, listy-, z- dimensions
-            self._xdim = xdim
-            self._ydim = ydim
-            self._zdim = zdim
+                    channel_fields = self._complex_fields[..., channel]
+                self._write_mat_channel(variable, channel, channel_fields, field_scale,
+                                        self._axis_order)
+        finally:
+            matf.close()
+
+    def _stream_fields(self, output_file, variable_name, field_scale, field_dir, field_type, freq,
+                       excitation_type='', rotating_frame=False, field_direction=+1, postfix="",
+                       version='2020', nworkers=None, compression=None, dtype=None):
+        """Decode the fields one channel at a time and write each channel 
+        directly into a preallocated, chunked dataset of a MAT v7.3 file.  Peak
+        memory is about one channel instead of the full multi-channel array.
+        Args:
+            output_file: MAT (v7.3) output file
+            variable_name: name of MATLAB variable (e.g. 'efMapArrayN')
+            field_scale: scale factor applied to fields (e.g. mu_0 for b-fields)
+            field_dir: Directory where hdf5 field data is located
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            freq: field monitor frequency value (e.g. 297.3) in MHz
+            excitation_type: one of standard CST 3d excitation types 'pw', 'AC', 'Trans',
+            rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            nworkers: if given, channels are decoded ahead by nworkers processes
+            compression: hdf5 compression of the fields (None, 'gzip', 'lzf')
+            dtype: complex data type of the stored fields (default: data type
+                   of the reader)
+        Returns:
+            None
+        """
+        self._complex_fields = None
+        self._find_field_files(field_dir, field_type, freq, excitation_type, postfix, version)
+        args_list = [(file_name, field_type, channel, rotating_frame, field_direction)
+                     for channel, file_name in enumerate(self._field_file_list)]
+        matf = None
+        try:
+            if nworkers is None:
+                # read ahead in a background thread while the channel is written
+                channels = prefetch_channels(self._decode_native_channel, args_list)
+            else:
+                channels = enumerate(imap_channels(self._decode_native_channel, args_list, nworkers))
+            for channel, decoded in channels:
+                xdim, ydim, zdim, channel_fields = decoded
+                if matf is None:
+                    self._xdim = xdim
+                    self._ydim = ydim
+                    self._zdim = zdim
+                    field_dim = (self._nchannels,) + np.shape(channel_fields)
+                    matf, variable = self._create_mat_fields(output_file, variable_name, field_dim,
+                                                             compression, dtype)
+                elif np.shape(channel_fields) != field_dim[1:]:
+                    raise ValueError("Mesh of channel file does not match: "
+                                     + self._field_file_list[channel])
+                self._write_mat_channel(variable, channel, channel_fields, field_scale)
+                del channel_fields
+        finally:
+            if matf is not None:
+                matf.close()
 
     def _process_file_list(self, file_name_pattern):
         """Generate a list of files that matches a provided regular expression.
+        The directory listing is served by the shared export catalog.
         file_name_pattern: file pattern path to list of files.
         """
         if 'win32' == sys.platform:
-            file_list = []
             self._source_dir = os.path.dirname(file_name_pattern)
-            file_base_pattern = self._pad_bracket_string(os.path.basename(file_name_pattern))
-            print("file_base pattern: ", file_base_pattern)
-            print(fnmatch.filter(os.listdir(os.path.dirname(file_name_pattern)),self._pad_bracket_string(file_base_pattern)))
-            file_list = [os.path.join(self._source_dir, file) for file in fnmatch.filter(os.listdir(os.path.dirname(file_name_pattern)),file_base_pattern)]
-        else:
-            print('[DEBUG] field_reader_cst2019 process_file_list ', file_name_pattern)
-            glob_string = self._pad_bracket_string(file_name_pattern)
-            print('glob_string: ', glob_string)
-            file_list = glob.glob(glob_string)
-            print("file_list: ", file_list)
+        print('[DEBUG] field_reader_cst2019 process_file_list ', file_name_pattern)
+        file_list = find_cst_files(file_name_pattern)
+        print("file_list: ", file_list)
 
         if 0 == len(file_list):
             raise KeyError("File pattern not found: " + file_name_pattern )
@@ -184,21 +450,27 @@ class FieldReaderCST2019(FieldReaderABC):
     def _pad_bracket_string(self, string_with_brackets):
         """Pad square bracket characters for pattern matching with square brackets.
         """
-        f_right_bracket = string_with_brackets.split('[')  
-        f_padded_right_bracket = [] # storage of padded string fragments 
-        for fsub in f_right_bracket:
-            temp = fsub.split(']')
-            f_padded_right_bracket.append("[]]".join(temp))
-
-        return "[[]".join(f_padded_right_bracket)
+        return pad_square_bracket_string(string_with_brackets)
 
     def write_vopgen(self, frequency, source_dir, output_file, export_type='e-field', 
-                     merge_type = 'AC', rotating_frame = False, field_direction=+1, postfix=""):
+                     merge_type = 'AC', rotating_frame = False, field_direction=+1, postfix="",
+                     out_of_core = False, nworkers = None, dtype = None, compression = None):
         """Create vopgen output files for e-field and b-field, masks, etc.
         Args:
             output_dir: Output directory.  Default is export directory within
                         the source directory.
             export_type: Data to export.  valid options are 'h-field', 'e-field'
+            out_of_core: if True, channels are written to the output file as they
+                         are decoded and the multi-channel array is never held 
+                         in memory.
+            nworkers: number of worker processes used to decode channels 
+                      concurrently.  Default (None) decodes channels serially.
+            dtype: complex data type of the saved fields (np.complex64 or 
+                   np.complex128).  Default (None) uses the data type of the
+                   reader, which is not changed.  complex64 fields are saved
+                   as MATLAB single precision.
+            compression: hdf5 compression of the field map: None, 'gzip' 
+                         (readable by MATLAB) or 'lzf' (h5py only).
         """
         output_dir = os.path.dirname(output_file)
         if not output_dir:
@@ -208,23 +480,48 @@ class FieldReaderCST2019(FieldReaderABC):
             os.makedirs(output_dir)
 
         #export_type = self.cst_3d_field_types[export_type]
-        self._read_fields(source_dir, export_type, frequency, merge_type, 
-                          rotating_frame, field_direction, postfix)
-        export_dict = dict()
-        export_dict[u'XDim'] = self._xdim
-        export_dict[u'YDim'] = self._ydim
-        export_dict[u'ZDim'] = self._zdim
-        print('[field_reader_cst2019] export_type', export_type)
         if 'e-field' == export_type:
-            print('[field_reader_cst2019] ', output_file)
-            export_dict[u'efMapArrayN'] = self._complex_fields
-            hdf5storage.savemat(output_file, export_dict, oned_as='column')
+            (variable_name, field_scale) = (u'efMapArrayN', 1.0)
         elif 'h-field' == export_type:
-            print('[field_reader_cst2019] ', output_file)
-            export_dict[u'bfMapArrayN'] = mu_0 * self._complex_fields
-            hdf5storage.savemat(output_file, export_dict, oned_as='column')
+            (variable_name, field_scale) = (u'bfMapArrayN', mu_0)
         else:
             raise Exception('Invalid field type: ', export_type)
+        print('[field_reader_cst2019] export_type', export_type)
+        print('[field_reader_cst2019] ', output_file)
+        if out_of_core:
+            self._stream_fields(output_file, variable_name, field_scale, source_dir, export_type,
+                                frequency, merge_type, rotating_frame, field_direction, postfix,
+                                nworkers=nworkers, compression=compression, dtype=dtype)
+        else:
+            self._read_fields(source_dir, export_type, frequency, merge_type, 
+                              rotating_frame, field_direction, postfix, nworkers=nworkers)
+            self._write_mat_fields(output_file, variable_name, field_scale, compression, dtype)
+
+    @property
+    def dtype(self):
+        """Return complex data type of fields.
+        """
+        return self._dtype
+
+    @property
+    def roi(self):
+        """Region of interest (xmin, xmax, ymin, ymax, zmin, zmax) in metres.
+        Only fields within the region of interest are read.  None reads the
+        full mesh.
+        """
+        return self._roi
+
+    @roi.setter
+    def roi(self, value):
+        self._roi = value
+
+    @property
+    def axes(self):
+        """Return axis names of complex fields, e.g. 
+        ('x', 'y', 'z', 'component', 'channel') or native 
+        ('channel', 'z', 'y', 'x', 'component').
+        """
+        return self._axes
 
     @property
     def normalization(self):
@@ -236,6 +533,12 @@ class FieldReaderCST2019(FieldReaderABC):
     def normalization(self, new_normalization):
         self._normalization = np.array(new_normalization)
 
+    @property
+    def nchannels(self):
+        """Return number of channels of the last read field files.
+        """
+        return self._nchannels
+
     @property
     def complex_fields(self):
         """ 
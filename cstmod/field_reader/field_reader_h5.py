@@ -10,6 +10,9 @@ try:
 except:
     raise ImportError("FieldReader requires HDF5 suport.  Ensure h5py is installed.")
 from cstmod.field_reader import FieldReaderABC
+from cstmod.field_reader.compound_fields import read_complex_fields
+from cstmod.field_reader.axis_order import field_axes
+from cstmod.field_reader.region_of_interest import read_mesh_lines
 
 # class variables
 cst_3d_field_types = [r'e-field', r'h-field']
@@ -41,18 +44,22 @@ class FieldReaderH5(FieldReaderABC):
     # class variables
     cst_3d_field_types = {'e-field':'E-Field', 'h-field':'H-Field'}
     
-    def __init__(self, file_name):
+    def __init__(self, file_name, dtype=np.complex128, roi=None):
         self._xdim = None
         self._ydim = None
         self._zdim = None
         self._complex_fields = None 
         self._field_type = extract_field_type(file_name)
         self._file_name = file_name
+        self._dtype = np.dtype(dtype)
+        self._roi = roi
         self._read_fields()
 
     def _read_fields(self):
         """
-        _read_fields - loads fields of given CST export file
+        _read_fields - loads fields of given CST export file.  If a region of
+        interest is set, only the fields within it are read and the mesh lines
+        are cropped to match.
         Args:
             None
         Returns:
@@ -64,29 +71,15 @@ class FieldReaderH5(FieldReaderABC):
             raise FileNotFoundError("Could not find file: ", self._file_name)
         with h5py.File(self._file_name,'r') as dataf:
             try:
-                xdim = dataf['Mesh line x'][()]
-                ydim = dataf['Mesh line y'][()]
-                zdim = dataf['Mesh line z'][()]
-                fxre = dataf[self.cst_3d_field_types[self._field_type.lower()]]['x']['re']
-                fxim = dataf[self.cst_3d_field_types[self._field_type.lower()]]['x']['im']
-                fyre = dataf[self.cst_3d_field_types[self._field_type.lower()]]['y']['re']
-                fyim = dataf[self.cst_3d_field_types[self._field_type.lower()]]['y']['im']
-                fzre = dataf[self.cst_3d_field_types[self._field_type.lower()]]['z']['re']
-                fzim = dataf[self.cst_3d_field_types[self._field_type.lower()]]['z']['im']
+                (xdim, ydim, zdim, selection) = read_mesh_lines(dataf, self._roi)
+                fields = read_complex_fields(dataf[self.cst_3d_field_types[self._field_type.lower()]],
+                                             selection)
             except(KeyError) as ex:
                 print("A KeyError exception was caught.  It is likely that " 
                       + "the hdf5 file is not a 3d field export or has "
                       + "become corrupted.")
                 raise(ex)
-            field_shape = np.shape(fxre)
-            export_fields_shape = (field_shape[0],
-                                   field_shape[1],
-                                   field_shape[2], 3)
-
-            self._complex_fields = np.empty(export_fields_shape, dtype=np.complex128)
-            self._complex_fields[:,:,:,0] = fxre + 1.0j*fxim
-            self._complex_fields[:,:,:,1] = fyre + 1.0j*fyim
-            self._complex_fields[:,:,:,2] = fzre + 1.0j*fzim
+            self._complex_fields = fields.astype(self._dtype, copy=False)
             self._xdim = xdim
             self._ydim = ydim
             self._zdim = zdim
@@ -119,6 +112,29 @@ class FieldReaderH5(FieldReaderABC):
         """
         return self._zdim
 
+    @property
+    def dtype(self):
+        """
+        Returns: complex data type of field values
+        """
+        return self._dtype
+
+    @property
+    def roi(self):
+        """
+        Returns: region of interest (xmin, xmax, ymin, ymax, zmin, zmax) in 
+                 metres, or None for the full mesh
+        """
+        return self._roi
+
+    @property
+    def axes(self):
+        """
+        Returns: axis names of field values.  Fields are kept in native CST 
+                 order ('z', 'y', 'x', 'component').
+        """
+        return field_axes('zyx')
+
     @property
     def field_type(self):
         """
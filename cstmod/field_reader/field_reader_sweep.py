@@ -0,0 +1,217 @@
+"""
+Frequency sweep reader for CST2019 (and later) hdf5 field exports.
+
+Fields of several frequency monitors of the same excitations are read into a
+single (x, y, z, component, channel, frequency) store.  The mesh is validated
+once for all monitors, channel files of all frequencies are decoded in one
+batch (optionally by a pool of worker processes) and the fields of a single
+frequency are sliced from the store on request.  The store is either held in
+memory or written to a MAT (v7.3) file, so sweeps larger than memory can be
+processed one frequency at a time.
+"""
+try:
+    import h5py
+except:
+    print("Field reader requires HDF5 support.  Ensure h5py is installed.")
+try:
+    import numpy as np
+except:
+    print("Field reader requires Numpy.  Ensure package numpy is installed.")
+
+from cstmod.field_reader.field_reader_cst2019 import FieldReaderCST2019
+from cstmod.field_reader.parallel_channels import parallel_channel_store, imap_channels
+from cstmod.field_reader.prefetch import prefetch_channels
+from cstmod.field_writer.mat_writer import MatWriter, mat_storage_type, slab_chunks
+
+class FrequencySweepReaderCST2019(object):
+    """Read multi-channel fields of several frequency monitors into one store.
+    """
+    def __init__(self, frequencies, dtype=np.complex128, roi=None, store_file=None,
+                 store_variable=u'fieldMapArrayNF'):
+        """
+        Args:
+            frequencies: list of field monitor frequencies (e.g. [297, 298, 300])
+            dtype: complex data type of fields
+            roi: region of interest (xmin, xmax, ymin, ymax, zmin, zmax) in metres
+            store_file: MAT (v7.3) file of the store.  Default (None) keeps the
+                        store in memory.
+            store_variable: name of the MATLAB variable of the store
+        """
+        self._frequencies = list(frequencies)
+        self._dtype = np.dtype(dtype)
+        self._store_file = store_file
+        self._store_variable = store_variable
+        self._store = None
+        self._field_files = None
+        self._channel_reader = FieldReaderCST2019(dtype=dtype, roi=roi)
+
+    def _find_sweep_files(self, field_dir, field_type, excitation_type, postfix, version):
+        """Find channel files of all frequencies and validate the mesh once.
+        Returns:
+            list (per frequency) of lists of channel files
+        Raises:
+            ValueError if the number of channels or mesh differs between frequencies
+        """
+        field_files = []
+        mesh = None
+        for freq in self._frequencies:
+            files = list(self._channel_reader._find_field_files(field_dir, field_type, freq,
+                                                                excitation_type, postfix, version))
+            if not files:
+                raise FileNotFoundError("No " + field_type + " files at f=" + str(freq)
+                                        + " in " + str(field_dir))
+            if field_files and len(files) != len(field_files[0]):
+                raise ValueError("Number of channels at f=" + str(freq) + " (" + str(len(files))
+                                 + ") differs from f=" + str(self._frequencies[0])
+                                 + " (" + str(len(field_files[0])) + ")")
+            freq_mesh = self._channel_reader._read_mesh(files[0])
+            if mesh is None:
+                mesh = freq_mesh
+            elif not all(np.array_equal(dim, freq_dim) for dim, freq_dim in zip(mesh, freq_mesh)):
+                raise ValueError("Mesh at f=" + str(freq) + " differs from mesh at f="
+                                 + str(self._frequencies[0]))
+            field_files.append(files)
+        (self._xdim, self._ydim, self._zdim) = mesh
+        return field_files
+
+    def read_fields(self, field_dir, field_type, excitation_type='', rotating_frame=False,
+                    field_direction=+1, postfix="", version='2020', nworkers=None):
+        """Read the fields of all frequencies into the store.
+        Args:
+            field_dir: Directory where hdf5 field data is located
+            field_type: one of standard CST 3d "field" types ('e-field', 'h-field',...)
+            excitation_type: one of standard CST 3d excitation types 'pw', 'AC', 'Trans',
+            rotating_frame: if True, field values will be stored in rotating frame (assumed along z-axis)
+            nworkers: if given, channel files are decoded concurrently by nworkers
+                      processes.  Default (None) decodes in this process with
+                      read ahead of the next file.
+        Returns:
+            None
+        Raises:
+            FileNotFoundError, ValueError
+        """
+        self._store = None
+        self._field_files = self._find_sweep_files(field_dir, field_type, excitation_type,
+                                                   postfix, version)
+        nchannels = len(self._field_files[0])
+        nfreqs = len(self._frequencies)
+        ncomp = 2 if rotating_frame else 3
+        store_shape = (len(self._xdim), len(self._ydim), len(self._zdim), ncomp, nchannels, nfreqs)
+        # one decode task per (channel, frequency), channel major
+        args_list = [(self._field_files[f][channel], field_type, channel, rotating_frame, field_direction)
+                     for channel in range(nchannels) for f in range(nfreqs)]
+        decode = self._channel_reader._decode_channel_fields
+
+        if self._store_file is None:
+            if nworkers is not None:
+                store = parallel_channel_store(decode, args_list, store_shape[0:4] + (nchannels*nfreqs,),
+                                               self._dtype, nworkers)
+            else:
+                store = np.empty(store_shape[0:4] + (nchannels*nfreqs,), dtype=self._dtype)
+                for index, channel_fields in prefetch_channels(decode, args_list):
+                    store[..., index] = channel_fields
+            self._store = np.reshape(store, store_shape)
+            return
+
+        if nworkers is not None:
+            decoded = enumerate(imap_channels(decode, args_list, nworkers))
+        else:
+            decoded = prefetch_channels(decode, args_list)
+        (storage_type, matlab_class) = mat_storage_type(self._dtype)
+        with MatWriter(self._store_file) as matf:
+            matf.write_variable(u'XDim', self._xdim)
+            matf.write_variable(u'YDim', self._ydim)
+            matf.write_variable(u'ZDim', self._zdim)
+            matf.write_variable(u'frequencies', np.asarray(self._frequencies, dtype=np.float64))
+            chunks = slab_chunks(store_shape[0:3], storage_type.itemsize) + (1, 1, 1)
+            variable = matf.create_variable(self._store_variable, store_shape, self._dtype,
+                                            chunks=chunks)
+            for index, channel_fields in decoded:
+                (channel, f) = divmod(index, nfreqs)
+                variable[..., channel, f] = channel_fields
+        self._store = self._store_file
+
+    def fields_at(self, freq):
+        """Fields of a single frequency.  For a store on disk, only the
+        fields of this frequency are read.
+        Args:
+            freq: frequency of field monitor
+        Returns:
+            ndarray (x, y, z, component, channel).  A view of the store if
+            the store is held in memory.
+        Raises:
+            KeyError if freq is not in the sweep
+        """
+        if freq not in self._frequencies:
+            raise KeyError("Frequency not in sweep: " + str(freq))
+        f = self._frequencies.index(freq)
+        if isinstance(self._store, np.ndarray):
+            return self._store[..., f]
+        (storage_type, matlab_class) = mat_storage_type(self._dtype)
+        with h5py.File(self._store, 'r') as matf:
+            dataset = matf[self._store_variable]
+            # hdf5 order: (frequency, channel, component, z, y, x)
+            fields = np.empty(dataset.shape[1:], dtype=self._dtype)
+            dataset.read_direct(fields.view(storage_type), source_sel=np.s_[f])
+        return np.transpose(fields, (4, 3, 2, 1, 0))
+
+    def iter_frequencies(self):
+        """Iterate over the fields of each frequency.
+        Yields:
+            (freq, fields) with fields of dimensions (x, y, z, component, channel)
+        """
+        for freq in self._frequencies:
+            yield freq, self.fields_at(freq)
+
+    @property
+    def frequencies(self):
+        """Frequencies of the sweep.
+        """
+        return self._frequencies
+
+    @property
+    def store(self):
+        """(x, y, z, component, channel, frequency) ndarray for stores in
+        memory, or the file name of the MAT (v7.3) store.
+        """
+        return self._store
+
+    @property
+    def field_files(self):
+        """Lists of channel files, one list per frequency.
+        """
+        return self._field_files
+
+    @property
+    def normalization(self):
+        """Channel normalization applied at all frequencies.
+        """
+        return self._channel_reader.normalization
+
+    @normalization.setter
+    def normalization(self, new_normalization):
+        self._channel_reader.normalization = new_normalization
+
+    @property
+    def nchannels(self):
+        """Number of channels.
+        """
+        return 0 if self._field_files is None else len(self._field_files[0])
+
+    @property
+    def xdim(self):
+        """x mesh lines in m
+        """
+        return self._xdim
+
+    @property
+    def ydim(self):
+        """y mesh lines in m
+        """
+        return self._ydim
+
+    @property
+    def zdim(self):
+        """z mesh lines in m
+        """
+        return self._zdim
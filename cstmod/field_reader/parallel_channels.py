@@ -0,0 +1,167 @@
+"""
+Decode multi-channel field exports concurrently with a pool of worker
+processes.  Workers write decoded channels straight into a shared memory
+output buffer, so no channel data is pickled back to the parent process.
+"""
+import os
+import collections
+from multiprocessing import Pool, shared_memory
+try:
+    import numpy as np
+except:
+    print("Field reader requires Numpy.  Ensure package numpy is installed.")
+
+# shared output buffer of the worker process
+_worker_shm = None
+_worker_out = None
+
+def default_nworkers(ntasks):
+    """Number of worker processes for ntasks channels.
+    """
+    return max(1, min(ntasks, os.cpu_count() or 1))
+
+def _init_worker(shm_name, shape, dtype):
+    """Attach worker process to the shared output buffer.
+    """
+    global _worker_shm, _worker_out
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_out = np.ndarray(shape, dtype=dtype, buffer=_worker_shm.buf)
+
+def _store_channel(task):
+    """Decode a single channel and store it in the shared buffer.
+        task: (decode_fn, args, index, channel_axis)
+    """
+    decode_fn, args, index, channel_axis = task
+    if 0 == channel_axis:
+        _worker_out[index] = decode_fn(*args)
+    else:
+        _worker_out[..., index] = decode_fn(*args)
+    return index
+
+def _sum_channels(task):
+    """Decode the planes of a slab of all channels and accumulate their
+    weighted sum in the slab of the shared buffer.
+        task: (decode_fn, [(args, weight), ...], planes)
+    """
+    decode_fn, weighted_args, planes = task
+    for args, weight in weighted_args:
+        _worker_out[planes] += weight * decode_fn(*(tuple(args) + (planes,)))
+    return planes
+
+class _SharedBlock(object):
+    """Owner of a shared memory block and base object of the arrays on it.
+    The block is closed once the last array on it is deleted.
+    """
+    def __init__(self, shm, shape, dtype):
+        self._shm = shm
+        self._array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @property
+    def __array_interface__(self):
+        return self._array.__array_interface__
+
+    def __del__(self):
+        # release the buffer of the block before closing it
+        self._array = None
+        self._shm.close()
+
+def _shared_empty(shape, dtype):
+    """Create a zero-filled array in a new shared memory block.  The block is
+    closed with the last array on it and must be unlinked by the caller.
+    Returns:
+        (shm, array)
+    """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+    array = np.asarray(_SharedBlock(shm, shape, dtype))
+    array[...] = 0
+    return shm, array
+
+def parallel_channel_store(decode_fn, args_list, out_shape, dtype=np.complex128, nworkers=None,
+                           channel_axis=-1):
+    """Decode channels concurrently into an array with the channel as the
+    last (or first) axis.
+    Args:
+        decode_fn: picklable function returning the decoded block of one channel
+        args_list: list of argument tuples of decode_fn, one per channel
+        out_shape: shape of output array, out_shape[channel_axis] == len(args_list)
+        dtype: data type of output array
+        nworkers: number of worker processes (default: number of cores)
+        channel_axis: -1 (last) or 0 (first) axis of output is the channel axis
+    Returns:
+        ndarray of out_shape with out[..., i] = decode_fn(*args_list[i])
+        (out[i] for channel_axis 0)
+    """
+    if nworkers is None:
+        nworkers = default_nworkers(len(args_list))
+    shm, out = _shared_empty(out_shape, dtype)
+    try:
+        with Pool(nworkers, initializer=_init_worker,
+                  initargs=(shm.name, out_shape, np.dtype(dtype))) as pool:
+            pool.map(_store_channel, [(decode_fn, args, index, channel_axis)
+                                      for index, args in enumerate(args_list)])
+    finally:
+        # the block stays mapped as the output array until it is deleted
+        shm.unlink()
+    return out
+
+def parallel_channel_sum(decode_fn, args_list, weights, block_shape, dtype=np.complex128, nworkers=None):
+    """Decode channels concurrently and return the weighted sum of all
+    channels.  The sum is split into slabs along the first axis, one per
+    worker; each worker adds the slab of every channel into its own slab of a
+    single shared output, so memory does not grow with the number of workers.
+    Args:
+        decode_fn: picklable function decode_fn(*args, planes) returning the
+                   planes (slice of the first axis) of the decoded block of
+                   one channel
+        args_list: list of argument tuples of decode_fn, one per channel
+        weights: channel weights
+        block_shape: shape of a decoded block
+        dtype: data type of accumulation
+        nworkers: number of worker processes (default: number of cores)
+    Returns:
+        ndarray of block_shape: sum(weights[i] * decode_fn(*args_list[i], slice(None)))
+    """
+    if nworkers is None:
+        nworkers = default_nworkers(len(args_list))
+    nslabs = max(1, min(nworkers, block_shape[0]))
+    bounds = np.linspace(0, block_shape[0], nslabs + 1).astype(int)
+    weighted_args = list(zip(args_list, weights))
+    tasks = [(decode_fn, weighted_args, slice(start, stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+    shm, out = _shared_empty(tuple(block_shape), dtype)
+    try:
+        with Pool(nslabs, initializer=_init_worker,
+                  initargs=(shm.name, out.shape, np.dtype(dtype))) as pool:
+            pool.map(_sum_channels, tasks)
+    finally:
+        # the block stays mapped as the output array until it is deleted
+        shm.unlink()
+    return out
+
+def imap_channels(decode_fn, args_list, nworkers=None, prefetch=None):
+    """Iterate over decoded channels in channel order.  If nworkers is given,
+    channels are decoded ahead by a pool of worker processes.  At most
+    prefetch channels are decoded or waiting in the parent at a time, so
+    decoded channels do not pile up if the consumer is slower than the pool.
+    Args:
+        decode_fn: picklable function returning the decoded block of one channel
+        args_list: list of argument tuples of decode_fn, one per channel
+        nworkers: number of worker processes (None: decode in this process)
+        prefetch: number of channels in flight (default: nworkers)
+    Yields:
+        decoded block of each channel
+    """
+    if nworkers is None:
+        for args in args_list:
+            yield decode_fn(*args)
+    else:
+        if prefetch is None:
+            prefetch = nworkers
+        with Pool(nworkers) as pool:
+            pending = collections.deque()
+            for args in args_list:
+                pending.append(pool.apply_async(decode_fn, args))
+                if len(pending) >= max(1, prefetch):
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
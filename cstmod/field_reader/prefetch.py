@@ -0,0 +1,85 @@
+"""
+Bounded prefetch of channel data.
+
+A background thread reads (and decodes) channel k+1 while the caller
+processes channel k, so disk reads overlap with decoding and accumulation.
+The number of channels read ahead is limited by the queue depth, which caps
+the memory held by the pipeline at about (depth + 2) channel blocks.
+"""
+import threading
+import queue
+
+# default number of channels read ahead
+default_prefetch_depth = 2
+
+# end of channels marker
+_done = object()
+
+class _Failure(object):
+    """Exception raised by the reader thread, re-raised by the consumer.
+    """
+    def __init__(self, exception):
+        self.exception = exception
+
+def _put(block_queue, item, stop):
+    """Put item in the queue unless the consumer stopped.
+    Returns:
+        False if the consumer stopped
+    """
+    while not stop.is_set():
+        try:
+            block_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _read_ahead(read_fn, args_list, block_queue, stop):
+    """Reader thread: read channels in order and queue the blocks.
+    """
+    try:
+        for channel, args in enumerate(args_list):
+            if stop.is_set():
+                return
+            if not _put(block_queue, (channel, read_fn(*args)), stop):
+                return
+    except BaseException as ex:
+        _put(block_queue, _Failure(ex), stop)
+        return
+    _put(block_queue, _done, stop)
+
+def prefetch_channels(read_fn, args_list, depth=default_prefetch_depth):
+    """Iterate over channels read ahead by a background thread.
+    Args:
+        read_fn: function returning the block of one channel
+        args_list: list of argument tuples of read_fn, one per channel
+        depth: number of channels read ahead (queue depth).  0 reads each
+               channel in the calling thread when it is requested.
+    Yields:
+        (channel_index, block) in channel order
+    Raises:
+        any exception raised by read_fn
+    """
+    if depth is None or depth < 1:
+        for channel, args in enumerate(args_list):
+            yield channel, read_fn(*args)
+        return
+
+    block_queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_ahead, args=(read_fn, args_list, block_queue, stop),
+                              daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = block_queue.get()
+            if item is _done:
+                break
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+            del item
+    finally:
+        # consumer finished or abandoned the iterator: release the reader
+        stop.set()
+        reader.join()
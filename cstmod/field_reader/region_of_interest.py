@@ -0,0 +1,95 @@
+"""
+Region of interest reads of CST field exports.
+
+A region of interest roi = (xmin, xmax, ymin, ymax, zmin, zmax) in metres is
+mapped to the range of mesh lines inside the bounds.  Only the matching
+hyperslab of the hdf5 field dataset is read, so air and coil regions outside
+the region of interest never reach memory.
+"""
+try:
+    import numpy as np
+except:
+    print("Field reader requires Numpy.  Ensure package numpy is installed.")
+
+# CST exports mesh lines in mm
+cst_mesh_scale = 0.001
+
+def mesh_line_slice(mesh_lines, lower, upper, mesh_scale=cst_mesh_scale):
+    """Range of mesh lines within [lower, upper].
+    Args:
+        mesh_lines: ascending mesh lines in units of the export
+        lower: lower bound in metres
+        upper: upper bound in metres
+        mesh_scale: scale of mesh line units to metres (default: mm)
+    Returns:
+        slice of mesh line indices
+    Raises:
+        ValueError if no mesh line is within the bounds
+    """
+    coords = mesh_scale * np.asarray(mesh_lines)
+    start = int(np.searchsorted(coords, lower, side='left'))
+    stop = int(np.searchsorted(coords, upper, side='right'))
+    if stop <= start:
+        raise ValueError("No mesh lines within region of interest bounds: ["
+                         + str(lower) + ", " + str(upper) + "]")
+    return slice(start, stop)
+
+def roi_slices(xdim, ydim, zdim, roi, mesh_scale=cst_mesh_scale):
+    """Mesh line ranges of a region of interest.
+    Args:
+        xdim, ydim, zdim: mesh lines in units of the export
+        roi: (xmin, xmax, ymin, ymax, zmin, zmax) in metres
+        mesh_scale: scale of mesh line units to metres (default: mm)
+    Returns:
+        (xslice, yslice, zslice)
+    Raises:
+        ValueError for an invalid or empty region of interest
+    """
+    if 6 != len(roi):
+        raise ValueError("Region of interest must be (xmin, xmax, ymin, ymax, zmin, zmax): "
+                         + str(roi))
+    return tuple(mesh_line_slice(dim, roi[2*axis], roi[2*axis + 1], mesh_scale)
+                 for axis, dim in enumerate((xdim, ydim, zdim)))
+
+def read_mesh_lines(dataf, roi=None, mesh_scale=cst_mesh_scale):
+    """Read the mesh lines of a CST hdf5 export, cropped to a region of interest.
+    Args:
+        dataf: open h5py file of a CST 3d export
+        roi: (xmin, xmax, ymin, ymax, zmin, zmax) in metres, or None for the
+             full mesh
+        mesh_scale: scale of mesh line units to metres (default: mm)
+    Returns:
+        (xdim, ydim, zdim, selection) with mesh lines in units of the export
+        and selection the (z, y, x) hyperslab of the field dataset (None for
+        the full mesh)
+    Raises:
+        KeyError if the file has no mesh lines
+    """
+    xdim = dataf['Mesh line x'][()]
+    ydim = dataf['Mesh line y'][()]
+    zdim = dataf['Mesh line z'][()]
+    if roi is None:
+        return xdim, ydim, zdim, None
+    (xslice, yslice, zslice) = roi_slices(xdim, ydim, zdim, roi, mesh_scale)
+    return xdim[xslice], ydim[yslice], zdim[zslice], (zslice, yslice, xslice)
+
+def selection_shape(shape, selection):
+    """Shape of a hyperslab selection of a dataset of given shape.
+    """
+    if selection is None:
+        return tuple(shape)
+    return tuple(len(range(*sel.indices(dim))) for sel, dim in zip(selection, shape)) \
+           + tuple(shape[len(selection):])
+
+def read_hyperslab(dataset, selection=None, dtype=None):
+    """Read a (real valued) hyperslab of a dataset.
+    Args:
+        dataset: h5py dataset
+        selection: tuple of slices, or None to read the full dataset
+        dtype: data type of the returned array (default: data type of dataset)
+    Returns:
+        ndarray of the selected hyperslab
+    """
+    if selection is None:
+        return np.asarray(dataset, dtype=dtype)
+    return np.asarray(dataset[selection], dtype=dtype)
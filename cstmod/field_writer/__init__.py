@@ -1,2 +1,8 @@
-from .write_3dfields import save_3d_fields_hdf5
-from .ascii_field_writer import ascii_field_writer
\ No newline at end of file
+import sys
+
+# conditional imports for Windows platform
+if sys.platform == 'win32':
+    from .write_3dfields import save_3d_fields_hdf5
+
+from .ascii_field_writer import ascii_field_writer
+from .mat_writer import MatWriter, MatVariable, savemat, read_mat_variable
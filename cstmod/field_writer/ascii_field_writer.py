@@ -5,31 +5,143 @@ Export 3d field results to acsii CST field format.
 import os
 import numpy as np
 import cstmod.cstutil as cstutil
-from cstmod.field_reader import FieldReaderH5
+from cstmod.field_reader.field_reader_h5 import FieldReaderH5
 from multiprocessing import Pool
 
 
 header = ['            x [mm]           y [mm]           z [mm]       HxRe [A/m]       HxIm [A/m]       HyRe [A/m]       HyIm [A/m]       HzRe [A/m]       HzIm [A/m]\n',
          '---------------------------------------------------------------------------------------------------------------------------------------------------------\n']
 
+# field quantities: (column symbol, unit)
+ascii_field_quantities = {'E-Field': ('E', 'V/m'),
+                          'H-Field': ('H', 'A/m'),
+                          'B-Field': ('B', 'Vs/m^2'),
+                          'Current Density': ('J', 'A/m^2'),
+                          'Conduction Current Density': ('J', 'A/m^2')}
 
-def write_ascii_fields(fields_dict, fileout):
-    """Write the fields in ascii format.
+# fixed width and precision of columns
+column_width = 17
+column_precision = 7
+
+
+def ascii_field_header(quantity):
+    """Header lines of a field quantity, e.g. 'H-Field'.
+    Raises:
+        KeyError if the quantity is unknown
+    """
+    (symbol, unit) = ascii_field_quantities[quantity]
+    labels = ['x [mm]', 'y [mm]', 'z [mm]'] + [symbol + comp + part + ' [' + unit + ']'
+                                              for comp in 'xyz' for part in ('Re', 'Im')]
+    line = labels[0].rjust(column_width + 1) + ''.join(label.rjust(column_width) for label in labels[1:])
+    return [line + '\n', '-'*(len(labels)*column_width) + '\n']
+
+
+def _format_coordinate(value, width=column_width):
+    """Coordinate as f"{x:17}", rounded to fewer significant digits if its
+    repr is wider than the column (e.g. -110.00000000000001).
+    """
+    text = f"{value:{width}}"
+    precision = width - 2
+    while len(text) > width and precision > 0:
+        precision -= 1
+        text = f"{value:{width}.{precision}g}"
+    return text
+
+
+def format_coordinates(values, width=column_width):
+    """Fixed width columns of mesh coordinates (see _format_coordinate).
+    Returns:
+        (n, width) uint8 array of characters
+    """
+    text = ''.join(_format_coordinate(value, width) for value in values)
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(len(values), width)
+
+
+def format_scientific(values, width=column_width, precision=column_precision):
+    """Fixed width scientific columns of values (as f"{v:17.7e}"), formatted
+    with array operations instead of one string per value.
+    Returns:
+        (n, width) uint8 array of characters
+    """
+    values = np.ravel(np.asarray(values, dtype=np.float64))
+    magnitude = np.abs(values)
+    finite = np.isfinite(magnitude)
+    nonzero = finite & (magnitude > 0)
+    exponent = np.zeros(len(values), dtype=np.int64)
+    exponent[nonzero] = np.floor(np.log10(magnitude[nonzero])).astype(np.int64)
+    mantissa = np.zeros(len(values), dtype=np.int64)
+    fallback = ~finite
+    for _ in range(3):
+        # mantissa digits; powers of ten are exact for moderate exponents
+        scale = precision - exponent[nonzero]
+        with np.errstate(over='ignore', invalid='ignore'):
+            scaled = np.where(scale >= 0, magnitude[nonzero]*10.0**np.maximum(scale, 0),
+                              magnitude[nonzero]/10.0**np.maximum(-scale, 0))
+            mantissa[nonzero] = np.rint(scaled).astype(np.int64)
+            # mantissas too close to a rounding tie to be decided by the scaled value
+            fallback[nonzero] |= np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        # correct exponents of inexact log10 and of mantissas rounded up to 10
+        correction = (mantissa[nonzero] >= 10**(precision + 1)).astype(np.int64) \
+                     - (mantissa[nonzero] < 10**precision).astype(np.int64)
+        if not np.any(correction):
+            break
+        exponent[nonzero] += correction
+    chars = np.full((len(values), width), ord(' '), dtype=np.uint8)
+    for k in range(1, precision + 1):
+        chars[:, width - 5 - precision + k] = (mantissa//10**(precision - k)) % 10 + ord('0')
+    chars[:, width - 5 - precision] = ord('.')
+    chars[:, width - 6 - precision] = (mantissa//10**precision) % 10 + ord('0')
+    chars[:, width - 4] = ord('e')
+    chars[:, width - 3] = np.where(exponent < 0, ord('-'), ord('+'))
+    chars[:, width - 2] = np.abs(exponent)//10 % 10 + ord('0')
+    chars[:, width - 1] = np.abs(exponent) % 10 + ord('0')
+    chars[:, width - 7 - precision] = np.where(np.signbit(values), ord('-'), ord(' '))
+    # non-finite values, three digit exponents and rounding ties
+    for index in np.flatnonzero(fallback | (np.abs(exponent) >= 100)):
+        chars[index] = np.frombuffer(f"{values[index]:{width}.{precision}e}".encode('ascii'), dtype=np.uint8)
+    return chars
+
+
+def write_ascii_fields(fields_dict, fileout, quantity=None, buffer_bytes=2**24):
+    """Write the fields in ascii format.  Each z-slab of the fields is
+    formatted as one block of fixed width records and written at once.
     Args:
-        fields_dict - dictionary with fields, xdim, ydim, zdim 
+        fields_dict - dictionary with fields, xdim, ydim, zdim (mm); fields
+                      are (z, y, x, component) complex
         fileout - output filenmat
+        quantity - field key of fields_dict, e.g. 'E-Field', 'H-Field',
+                   'B-Field' or 'Current Density' (default: the first key
+                   of a known quantity)
+        buffer_bytes - size of the file write buffer
+    Raises:
+        KeyError if no known field quantity is found
     """
-    print(header)
-    print(fields_dict.keys())
-    fields = fields_dict['H-Field']
-    with open(fileout, mode='wt') as fh:
-        # write the header
-        fh.writelines(header)
-        for k,z in enumerate(fields_dict['ZDim']):
-            for j,y in enumerate(fields_dict['YDim']):
-                for i,x in enumerate(fields_dict['XDim']):
-                    fh.write(f"{x:17}{y:17}{z:17}{np.real(fields[k,j,i,0]):17.7e}{np.imag(fields[k,j,i,0]):17.7e}{np.real(fields[k,j,i,1]):17.7e}{np.imag(fields[k,j,i,1]):17.7e}{np.real(fields[k,j,i,2]):17.7e}{np.imag(fields[k,j,i,2]):17.7e}\n")
-        
+    if quantity is None:
+        known = [key for key in fields_dict.keys() if key in ascii_field_quantities]
+        if not known:
+            raise KeyError("No field quantity of " + str(list(ascii_field_quantities.keys()))
+                           + " in fields.")
+        quantity = known[0]
+    fields = fields_dict[quantity]
+    x_chars = format_coordinates(fields_dict['XDim'])
+    y_chars = format_coordinates(fields_dict['YDim'])
+    z_chars = format_coordinates(fields_dict['ZDim'])
+    (nx, ny) = (len(x_chars), len(y_chars))
+    record_width = 9*column_width + 1
+    records = np.empty((ny, nx, record_width), dtype=np.uint8)
+    records[:, :, 0:column_width] = x_chars[np.newaxis, :, :]
+    records[:, :, column_width:2*column_width] = y_chars[:, np.newaxis, :]
+    records[:, :, -1] = ord('\n')
+    with open(fileout, mode='wb', buffering=buffer_bytes) as fh:
+        fh.write(''.join(ascii_field_header(quantity)).encode('ascii'))
+        for k in range(len(z_chars)):
+            records[:, :, 2*column_width:3*column_width] = z_chars[k]
+            slab = np.asarray(fields[k])
+            # (y, x, component, re/im) -> (y, x, 6 columns)
+            parts = np.stack([np.real(slab), np.imag(slab)], axis=-1).reshape(ny, nx, 6)
+            records[:, :, 3*column_width:9*column_width] = format_scientific(parts).reshape(ny, nx, 6*column_width)
+            fh.write(records.tobytes())
+
 
 def ascii_field_writer(field_name_h5):
     """Program main
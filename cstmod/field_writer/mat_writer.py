@@ -0,0 +1,312 @@
+"""mat_writer.py
+Incremental writer of MATLAB (v7.3) MAT files.
+
+A v7.3 MAT file is an hdf5 file with a 512 byte MATLAB header (userblock).
+Variables are created with a known shape and data type and filled one
+channel or slab at a time, so large arrays (e.g. efMapArrayN) never need
+to be held in memory.  Chunk shape and hdf5 filters (gzip, lzf, shuffle) of
+each variable can be chosen for the expected slice access.
+
+Shapes and indices are given in MATLAB order.  MATLAB reverses hdf5
+dimensions, so a MATLAB (nx, ny, nz, ncomp, nch) variable is stored as an
+hdf5 (nch, ncomp, nz, ny, nx) dataset and slices along the last MATLAB
+dimension are contiguous on disk.
+
+    with MatWriter('efMapArrayN.mat') as matf:
+        matf.write_variable('XDim', xdim)
+        efmap = matf.create_variable('efMapArrayN', (nx, ny, nz, 3, nch), np.complex64)
+        for channel in range(nch):
+            efmap[..., channel] = channel_fields  # (nx, ny, nz, 3)
+"""
+import time
+try:
+    import h5py
+except ImportError as err:
+    print("Please install h5py to use this module.")
+    raise(err)
+try:
+    import numpy as np
+except:
+    print("MAT writer requires Numpy.  Ensure package numpy is installed.")
+
+# MATLAB class names of numpy data types
+matlab_classes = {np.dtype(np.float64): 'double',
+                  np.dtype(np.float32): 'single',
+                  np.dtype(np.complex128): 'double',
+                  np.dtype(np.complex64): 'single',
+                  np.dtype(np.bool_): 'logical',
+                  np.dtype(np.int8): 'int8',
+                  np.dtype(np.uint8): 'uint8',
+                  np.dtype(np.int16): 'int16',
+                  np.dtype(np.uint16): 'uint16',
+                  np.dtype(np.int32): 'int32',
+                  np.dtype(np.uint32): 'uint32',
+                  np.dtype(np.int64): 'int64',
+                  np.dtype(np.uint64): 'uint64'}
+
+mat_userblock_size = 512
+# default target size of a chunk in bytes
+default_chunk_bytes = 2**20
+
+def mat_header():
+    """MAT v7.3 file header (first 128 bytes of userblock).
+    """
+    text = 'MATLAB 7.3 MAT-file, Platform: cstmod, Created on: ' \
+           + time.asctime() + ' HDF5 schema 1.00 .'
+    header = text.encode('ascii').ljust(116, b' ')
+    # subsystem data offset, version 0x0200 and endian indicator 'IM'
+    return header + b'\x00'*8 + b'\x00\x02' + b'IM'
+
+def mat_storage_type(dtype):
+    """hdf5 storage type and MATLAB class of a numpy data type.
+    Args:
+        dtype: numpy data type
+    Returns:
+        (storage_type, matlab_class).  Complex values are stored as a
+        {real, imag} compound, logicals as uint8.
+    Raises:
+        TypeError for data types without MATLAB class
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in matlab_classes:
+        raise TypeError("No MATLAB class for data type: " + str(dtype))
+    if np.issubdtype(dtype, np.complexfloating):
+        float_type = np.finfo(dtype).dtype
+        storage_type = np.dtype([('real', float_type), ('imag', float_type)])
+    elif np.bool_ == dtype:
+        storage_type = np.dtype(np.uint8)
+    else:
+        storage_type = dtype
+    return storage_type, matlab_classes[dtype]
+
+def slab_chunks(shape, itemsize, chunk_bytes=default_chunk_bytes):
+    """Chunk shape (MATLAB order) of slabs along the trailing dimensions.
+    Leading MATLAB dimensions are kept whole while the chunk is below
+    chunk_bytes, e.g. (nx, ny, nz_chunk, 1, 1) for a (nx, ny, nz, ncomp, nch)
+    array.
+    Args:
+        shape: MATLAB shape of variable
+        itemsize: bytes per element
+        chunk_bytes: target size of a chunk
+    Returns:
+        tuple chunk shape
+    """
+    chunks = []
+    nbytes = itemsize
+    for dim in shape:
+        dim = max(1, int(dim))
+        n = int(max(1, min(dim, chunk_bytes // nbytes)))
+        chunks.append(n)
+        nbytes *= n
+    return tuple(chunks)
+
+def _matlab_shape(value):
+    """MATLAB shape of a value: 1-d arrays are column vectors, scalars 1x1.
+    """
+    value = np.asarray(value)
+    if 0 == value.ndim:
+        return (1, 1)
+    elif 1 == value.ndim:
+        return (value.shape[0], 1)
+    return value.shape
+
+class MatVariable(object):
+    """A variable of a MAT (v7.3) file that is written in slabs.  Indexing
+    uses MATLAB dimension order, e.g. var[:, :, k] = xy_plane.
+    """
+    def __init__(self, dataset, dtype):
+        self._dataset = dataset
+        self._dtype = np.dtype(dtype)
+        (self._storage_type, self._matlab_class) = mat_storage_type(dtype)
+
+    def _normalize_key(self, key):
+        """Expand key to one int or slice per MATLAB dimension.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        ndim = len(self.shape)
+        if any(k is Ellipsis for k in key):
+            ind = [i for i, k in enumerate(key) if k is Ellipsis][0]
+            key = key[:ind] + (slice(None),)*(ndim - len(key) + 1) + key[ind+1:]
+        key = key + (slice(None),)*(ndim - len(key))
+        if len(key) != ndim:
+            raise IndexError("Too many indices for variable of shape " + str(self.shape))
+        return key
+
+    def __setitem__(self, key, value):
+        """Write a slab of the variable.
+        Args:
+            key: ints and slices in MATLAB dimension order
+            value: array broadcastable to the shape of the selection
+        """
+        key = self._normalize_key(key)
+        selection_shape = tuple(len(range(*k.indices(dim)))
+                                for k, dim in zip(key, self.shape) if isinstance(k, slice))
+        value = np.broadcast_to(np.asarray(value), selection_shape)
+        # reverse dimensions to hdf5 order; single copy into storage layout
+        value = np.ascontiguousarray(value.T, dtype=self._dtype)
+        if np.bool_ == self._dtype:
+            value = value.view(np.uint8)
+        else:
+            value = value.view(self._storage_type)
+        self._dataset[tuple(reversed(key))] = value
+
+    def write(self, value):
+        """Write the whole variable.
+        """
+        self[...] = np.reshape(value, self.shape) if np.ndim(value) < len(self.shape) else value
+
+    @property
+    def shape(self):
+        """MATLAB shape of the variable.
+        """
+        return tuple(reversed(self._dataset.shape))
+
+    @property
+    def chunks(self):
+        """MATLAB chunk shape of the variable.
+        """
+        if self._dataset.chunks is None:
+            return None
+        return tuple(reversed(self._dataset.chunks))
+
+    @property
+    def dtype(self):
+        """numpy data type of the variable.
+        """
+        return self._dtype
+
+class MatWriter(object):
+    """Writer of MATLAB (v7.3) MAT files.
+    """
+    def __init__(self, file_name, compression=None, compression_opts=None, shuffle=None):
+        """Create (or overwrite) a MAT file.
+        Args:
+            file_name: output MAT file
+            compression: default hdf5 compression of variables: None, 'gzip' or
+                         'lzf'.  MATLAB reads gzip (deflate) compressed
+                         variables; lzf is only readable with h5py/hdf5storage.
+            compression_opts: compression level (gzip: 0-9)
+            shuffle: enable the shuffle filter (default: with compression)
+        """
+        self._file_name = file_name
+        self._compression = compression
+        self._compression_opts = compression_opts
+        self._shuffle = shuffle
+        self._variables = dict()
+        self._h5file = h5py.File(file_name, 'w', userblock_size=mat_userblock_size, libver='earliest')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the hdf5 file and write the MAT header.
+        """
+        if self._h5file is None:
+            return
+        self._h5file.close()
+        self._h5file = None
+        with open(self._file_name, 'r+b') as f:
+            f.write(mat_header())
+
+    def create_variable(self, name, shape, dtype=np.float64, chunks=True, compression=None,
+                        compression_opts=None, shuffle=None):
+        """Create a variable of known shape and data type to be filled in slabs.
+        Args:
+            name: MATLAB variable name
+            shape: MATLAB shape of variable, e.g. (nx, ny, nz, ncomp, nch)
+            dtype: numpy data type (complex64/complex128 are stored as
+                   MATLAB single/double complex)
+            chunks: MATLAB chunk shape, True for slab chunks along the trailing
+                    dimensions (see slab_chunks) or None for contiguous storage
+            compression: hdf5 compression, default of the writer if None
+            compression_opts: compression level
+            shuffle: enable shuffle filter
+        Returns:
+            MatVariable
+        """
+        (storage_type, matlab_class) = mat_storage_type(dtype)
+        shape = tuple(int(dim) for dim in shape)
+        if compression is None:
+            compression = self._compression
+            compression_opts = self._compression_opts if compression_opts is None else compression_opts
+        if shuffle is None:
+            shuffle = self._shuffle if self._shuffle is not None else compression is not None
+        if chunks is True or ((compression is not None or shuffle) and chunks is None):
+            chunks = slab_chunks(shape, storage_type.itemsize)
+        if chunks is not None:
+            chunks = tuple(int(max(1, min(c, dim))) for c, dim in zip(chunks, shape))
+            chunks = tuple(reversed(chunks))
+        dataset = self._h5file.create_dataset(name, tuple(reversed(shape)), dtype=storage_type,
+                                              chunks=chunks, compression=compression,
+                                              compression_opts=compression_opts,
+                                              shuffle=bool(shuffle))
+        dataset.attrs['MATLAB_class'] = np.bytes_(matlab_class)
+        if 'logical' == matlab_class:
+            dataset.attrs['MATLAB_int_decode'] = np.int64(1)
+        variable = MatVariable(dataset, dtype)
+        self._variables[name] = variable
+        return variable
+
+    def write_variable(self, name, value, **kwargs):
+        """Write an in-memory array as a variable.  1-d arrays are written as
+        column vectors, scalars as 1x1 and strings as MATLAB char row vectors.
+        Args:
+            name: MATLAB variable name
+            value: array or str
+            kwargs: storage options of create_variable
+        Returns:
+            MatVariable, or None for strings
+        """
+        if isinstance(value, str):
+            self._write_char(name, value)
+            return None
+        value = np.asarray(value)
+        kwargs.setdefault('chunks', None)
+        variable = self.create_variable(name, _matlab_shape(value), value.dtype, **kwargs)
+        variable.write(value)
+        return variable
+
+    def _write_char(self, name, value):
+        """Write a string as MATLAB char (UTF-16 code units) row vector.
+        """
+        codes = np.frombuffer(value.encode('utf-16-le'), dtype=np.uint16)
+        dataset = self._h5file.create_dataset(name, data=codes.reshape((len(codes), 1)))
+        dataset.attrs['MATLAB_class'] = np.bytes_('char')
+        dataset.attrs['MATLAB_int_decode'] = np.int64(2)
+
+    def __getitem__(self, name):
+        return self._variables[name]
+
+def read_mat_variable(file_name, name):
+    """Read a numeric or logical variable of a MAT (v7.3) file.
+    Args:
+        file_name: MAT file
+        name: MATLAB variable name
+    Returns:
+        ndarray in MATLAB dimension order
+    """
+    with h5py.File(file_name, 'r') as matf:
+        dataset = matf[name]
+        matlab_class = dataset.attrs.get('MATLAB_class', b'double')
+        value = dataset[()]
+    if value.dtype.names == ('real', 'imag'):
+        complex_type = np.result_type(value.dtype['real'], np.complex64)
+        value = np.ascontiguousarray(value).view(complex_type)
+    elif b'logical' == matlab_class:
+        value = value.astype(np.bool_)
+    return value.T
+
+def savemat(file_name, mdict, **kwargs):
+    """Write a dictionary of arrays to a MAT (v7.3) file.
+    Args:
+        file_name: output MAT file
+        mdict: dictionary of variable names and arrays
+        kwargs: options of MatWriter (compression, compression_opts, shuffle)
+    """
+    with MatWriter(file_name, **kwargs) as matf:
+        for name, value in mdict.items():
+            matf.write_variable(name, value)
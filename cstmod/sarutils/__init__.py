@@ -1,2 +1,5 @@
 from .sar_ascii_rename import *
 
+
+from .sar_ascii_store import convert_sar_ascii, read_sar_ascii, SARAsciiStore
+from .sar_q_matrices import sar_q_matrices, write_sar_q_matrices, load_sar_maps
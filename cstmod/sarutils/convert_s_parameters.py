@@ -1,24 +1,27 @@
 #!/usr/bin/env python
 import os
 import numpy as np
-import skrf
-import hdf5storage
+try:
+    import skrf
+except(ModuleNotFoundError):
+    print("Networks require Scikit-RF.  Please install scikit-rf with pip or otherwise.")
+from cstmod.field_writer.mat_writer import savemat
+from cstmod.cstutil.touchstone import read_touchstone
 
 
 def convert_s_parameters(ntwk, f0=447e6):
-    """Export S-parameters from Network
+    """Export S-parameters from Network or touchstone file name.  Touchstone
+    files are streamed (see cstutil.read_touchstone) without building a Network.
     """
-    nn = np.shape(ntwk.s)[1]
-    print(nn)
-    freq = ntwk.f
-    f0_ind = np.argmin(np.abs(freq - f0))
-    s_at_freq = np.zeros((nn, nn), dtype=complex)
-    for i in range(nn):
-        for j in range(nn):
-            s_at_freq[i,j] = ntwk.s[f0_ind, i,j]
+    if isinstance(ntwk, str):
+        s_at_freq = read_touchstone(ntwk, frequencies=[f0])[1][0]
+    else:
+        f0_ind = np.argmin(np.abs(ntwk.f - f0))
+        s_at_freq = np.array(ntwk.s[f0_ind], dtype=complex)
+    print(np.shape(s_at_freq)[0])
     smatrix_dict = dict()
     smatrix_dict['Smatrix'] = s_at_freq
-    hdf5storage.savemat('Smatrix.mat', smatrix_dict)
+    savemat('Smatrix.mat', smatrix_dict)
     
 
 if __name__ == "__main__":
@@ -26,5 +29,4 @@ if __name__ == "__main__":
                                "Self_Decoupled_10r5t_16tx_64Rx_Duke_Fields_CST2020_3_1",
                                "Export", "3d","Self_Decoupled_10r5t_16tx_64Rx_Duke_Fields_CST2020_3_1.s16p")
     print(os.path.exists(tstone_file))
-    ntwk = skrf.Network(tstone_file)
-    convert_s_parameters(ntwk)
+    convert_s_parameters(tstone_file)
@@ -7,7 +7,7 @@ import re
 def files_sorted(input_glob: str) -> list:
     """ Return a list of sorted files that match input pattern.
     """
-    pass
+    return sorted(glob.glob(input_glob))
 
 def extract_mnq(input_name: str) -> (int, int, str):
     """ Given an input name, extract the (M, N) of the excitation and quadrature indicator
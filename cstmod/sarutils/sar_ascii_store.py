@@ -0,0 +1,211 @@
+"""
+Binary store of CST SAR ascii exports.
+
+SAR exports 'SAR (f=447) [ACm_nQ] (10g).txt' of all channel combinations
+(m, n, quadrature) hold one value per voxel after a header:
+
+            x [mm]           y [mm]           z [mm]       SAR [W/kg]
+    -----------------------------------------------------------------
+    ...
+
+Exports are parsed in large blocks (one numpy conversion per block instead
+of one per line) by a pool of worker processes and written to a single hdf5
+store:
+    sar: (nexports, nvoxels) SAR values, one row per export
+    mnq: (nexports, 3) channels m, n and quadrature (1 for 'Q') of each row
+    xyz: (nvoxels, 3) voxel coordinates of the first export
+The store is keyed by path, size and modification time of the exports, so
+converting unchanged exports again only opens the store.  Without
+compression the SAR values are stored contiguously and read as memory maps.
+"""
+import os
+from multiprocessing import Pool
+try:
+    import h5py
+except:
+    print("SAR ascii store requires HDF5 support.  Ensure h5py is installed.")
+try:
+    import numpy as np
+except:
+    print("SAR ascii store requires Numpy.  Ensure package numpy is installed.")
+from cstmod.cstutil.binary_cache import source_key
+from .sar_ascii_rename import files_sorted, extract_mnq
+
+# bytes read per parser block
+sar_block_bytes = 2**24
+
+def read_sar_ascii(file_name, block_bytes=sar_block_bytes):
+    """Read a CST 3d ascii export.
+    Args:
+        file_name: ascii export, e.g. 'SAR (f=447) [AC1_2Q] (10g).txt'
+        block_bytes: bytes parsed per block
+    Returns:
+        (nrows, ncolumns) float64 array, e.g. x, y, z, SAR
+    Raises:
+        ValueError if the export is truncated
+    """
+    blocks = []
+    with open(file_name, 'rb') as fh:
+        # header ends with a line of dashes
+        line = fh.readline()
+        while line and not line.strip().startswith(b'-'):
+            line = fh.readline()
+        first_line = fh.readline()
+        ncolumns = len(first_line.split())
+        remainder = first_line
+        while True:
+            block = fh.read(block_bytes)
+            if not block:
+                break
+            block = remainder + block
+            end = block.rfind(b'\n') + 1
+            (block, remainder) = (block[:end], block[end:])
+            if block.strip():
+                # (numpy parses whitespace only strings as [-1])
+                blocks.append(np.fromstring(block, dtype=np.float64, sep=' '))
+        if remainder.strip():
+            blocks.append(np.fromstring(remainder, dtype=np.float64, sep=' '))
+    values = np.concatenate(blocks) if blocks else np.zeros(0)
+    if ncolumns == 0 or 0 != len(values) % ncolumns:
+        raise ValueError("Incomplete ascii export: " + file_name)
+    return np.reshape(values, (-1, ncolumns))
+
+def _parse_sar_export(args):
+    """Worker: (SAR values, coordinates or None) of an export.
+    """
+    (file_name, with_coordinates, block_bytes) = args
+    data = read_sar_ascii(file_name, block_bytes)
+    return np.ascontiguousarray(data[:, -1]), (np.ascontiguousarray(data[:, 0:3]) if with_coordinates else None)
+
+def sar_ascii_exports(sar_dir, pattern='SAR*.txt'):
+    """SAR ascii exports of a directory sorted by (m, n, quadrature).
+    Returns:
+        list of (m, n, q, file_name)
+    Raises:
+        ValueError if two exports have the same (m, n, q)
+    """
+    exports = []
+    for file_name in files_sorted(os.path.join(sar_dir, pattern)):
+        mnq = extract_mnq(os.path.basename(file_name))
+        if mnq is None:
+            print("[sar_ascii_store] skipping: ", file_name)
+            continue
+        exports.append(mnq + (file_name,))
+    exports.sort()
+    for previous, current in zip(exports[:-1], exports[1:]):
+        if previous[0:3] == current[0:3]:
+            raise ValueError("Exports " + previous[3] + " and " + current[3] + " have the same (m, n, q).")
+    return exports
+
+class SARAsciiStore(object):
+    """SAR values of a store written by convert_sar_ascii, indexed by
+    (m, n, q) with q '' or 'Q'.
+    """
+    def __init__(self, store_file):
+        self._store_file = store_file
+        with h5py.File(store_file, 'r') as storef:
+            self._key = storef.attrs.get('key')
+            self._mnq = [(int(m), int(n), 'Q' if q else '') for m, n, q in storef['mnq'][()]]
+            self._xyz = storef['xyz'][()]
+            sar = storef['sar']
+            offset = sar.id.get_offset()
+            if offset is None or sar.chunks is not None:
+                self._sar = sar[()]
+            else:
+                self._sar = None
+                self._layout = (sar.dtype, sar.shape, offset)
+        if self._sar is None:
+            (dtype, shape, offset) = self._layout
+            self._sar = np.memmap(store_file, dtype=dtype, mode='r', offset=offset, shape=shape)
+        self._rows = dict((mnq, row) for row, mnq in enumerate(self._mnq))
+
+    def __getitem__(self, mnq):
+        """(nvoxels,) SAR values of export (m, n, q).
+        """
+        (m, n, q) = mnq
+        return self._sar[self._rows[(int(m), int(n), q)]]
+
+    def __contains__(self, mnq):
+        return tuple(mnq) in self._rows
+
+    def __len__(self):
+        return len(self._mnq)
+
+    def keys(self):
+        """(m, n, q) of the exports in store order.
+        """
+        return list(self._mnq)
+
+    @property
+    def key(self):
+        """Source key of the exports (see cstutil.source_key).
+        """
+        return self._key
+
+    @property
+    def sar(self):
+        """(nexports, nvoxels) SAR values.
+        """
+        return self._sar
+
+    @property
+    def xyz(self):
+        """(nvoxels, 3) voxel coordinates.
+        """
+        return self._xyz
+
+def convert_sar_ascii(sar_dir, store_file=None, pattern='SAR*.txt', nworkers=None, dtype=np.float64,
+                      compression=None, block_bytes=sar_block_bytes, overwrite=False):
+    """Convert the SAR ascii exports of a directory to a binary store.
+    Args:
+        sar_dir: directory of SAR ascii exports
+        store_file: hdf5 store, default: 'sar_ascii.h5' in sar_dir
+        pattern: glob pattern of the exports
+        nworkers: number of worker processes (default: number of cpus)
+        dtype: data type of stored SAR values
+        compression: hdf5 compression of SAR values (chunked per export;
+                     disables memory mapping)
+        block_bytes: bytes parsed per block
+        overwrite: convert even if the store of unchanged exports exists
+    Returns:
+        SARAsciiStore
+    Raises:
+        ValueError if no exports are found or exports differ in size
+    """
+    if store_file is None:
+        store_file = os.path.join(sar_dir, 'sar_ascii.h5')
+    exports = sar_ascii_exports(sar_dir, pattern)
+    if not exports:
+        raise ValueError("No SAR ascii exports found in " + sar_dir)
+    file_list = [export[3] for export in exports]
+    key = source_key(file_list)
+    if not overwrite and os.path.exists(store_file):
+        store = SARAsciiStore(store_file)
+        if store.key == key:
+            return store
+
+    temp_file = store_file + '.tmp' + str(os.getpid())
+    jobs = [(file_name, 0 == index, block_bytes) for index, file_name in enumerate(file_list)]
+    try:
+        with Pool(nworkers) as pool, h5py.File(temp_file, 'w') as storef:
+            storef.attrs['key'] = key
+            storef.create_dataset('mnq', data=np.asarray([(m, n, 1 if q else 0) for m, n, q, _ in exports],
+                                                         dtype=np.int64))
+            sar = None
+            for row, (values, coordinates) in enumerate(pool.imap(_parse_sar_export, jobs)):
+                if sar is None:
+                    storef.create_dataset('xyz', data=coordinates)
+                    sar = storef.create_dataset('sar', (len(exports), len(values)), dtype=dtype,
+                                                chunks=(1, len(values)) if compression else None,
+                                                compression=compression)
+                if len(values) != sar.shape[1]:
+                    raise ValueError("Export " + file_list[row] + " has " + str(len(values)) + " voxels, expected "
+                                     + str(sar.shape[1]))
+                sar[row, :] = values
+                print("[sar_ascii_store] ", file_list[row])
+    except:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    os.replace(temp_file, store_file)
+    return SARAsciiStore(store_file)
@@ -0,0 +1,184 @@
+"""
+Q-matrices reconstructed from exported SAR maps (polarization identity).
+
+CST exports the (point) SAR of single channels 'SAR (f=447) [ACm] ...' and of
+channel combinations 'SAR (f=447) [ACm_n] ...' and 'SAR (f=447) [ACm_nQ] ...'
+(see extract_mnq).  With the local SAR x^H Q x of channel weights x and unit
+channel amplitudes
+    S_mm  = SAR(e_m)          = Q_mm
+    S_mn  = SAR(e_m + e_n)    = Q_mm + Q_nn + 2 Re Q_mn
+    S_mnQ = SAR(e_m + j e_n)  = Q_mm + Q_nn - 2 Im Q_mn
+so per voxel
+    Re Q_mn =  (S_mn  - S_mm - S_nn)/2
+    Im Q_mn = -(S_mnQ - S_mm - S_nn)/2.
+The sign of Im Q_mn follows from the quadrature combination exciting channel
+n with +90 degrees relative to channel m; exports made with -90 degrees (e_m
+- j e_n) give the conjugate Q-matrices and are reconstructed with
+quadrature_sign=-1.  With this convention Q_mn matches q_matrices (the
+conjugate of channel m times channel n).
+
+All N + N(N-1) maps of N channels are read from ascii exports (through the
+binary store of convert_sar_ascii) or from hdf5 exports (through
+ResultReader3D 'sar'), restricted to the voxels of an optional mask.  The
+identity is evaluated for chunks of voxels by a pool of threads and written
+as packed upper triangles (see vopgen.triu_indices).
+"""
+import os
+import collections
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy as np
+except:
+    print("SAR Q-matrices require Numpy.  Ensure package numpy is installed.")
+from cstmod.field_reader.field_reader3d import ResultReader3D
+from cstmod.field_writer.mat_writer import MatWriter
+from cstmod.vopgen.q_matrices import triu_indices, default_chunk_voxels
+from .sar_ascii_rename import files_sorted, extract_mnq
+from .sar_ascii_store import convert_sar_ascii
+
+def sar_export_channels(mnq_list):
+    """Number of channels of a set of SAR exports.
+    Args:
+        mnq_list: (m, n, q) of the exports
+    Returns:
+        number of channels N
+    Raises:
+        ValueError if an export of the N + N(N-1) exports is missing
+    """
+    available = set((m, n, q) for m, n, q in mnq_list)
+    available.update((n, m, q) for m, n, q in mnq_list)
+    nchannels = max(max(m, n) for m, n, _ in available) if available else 0
+    required = [(m, m, '') for m in range(1, nchannels + 1)] \
+               + [(m, n, q) for m in range(1, nchannels + 1) for n in range(m + 1, nchannels + 1)
+                  for q in ('', 'Q')]
+    missing = [mnq for mnq in required if mnq not in available]
+    if nchannels == 0 or missing:
+        raise ValueError("Missing SAR exports (m, n, q): " + str(missing))
+    return nchannels
+
+def load_sar_maps(sar_dir, pattern='SAR*', mask=None, store_file=None, nworkers=None):
+    """SAR maps of the exports of a directory.  Ascii exports are converted to
+    a binary store first (see convert_sar_ascii); hdf5 exports are read by
+    ResultReader3D.
+    Args:
+        sar_dir: directory of SAR exports
+        pattern: glob pattern of the exports (.txt or .h5)
+        mask: bool (nx, ny, nz) voxels to keep (default: all voxels)
+        store_file: binary store of ascii exports (see convert_sar_ascii)
+        nworkers: number of ascii parser processes
+    Returns:
+        dict (m, n, q) -> (nvoxels,) or (n_masked,) SAR in column-major
+        (x, y, z) voxel order
+    """
+    indices = None if mask is None else np.flatnonzero(np.ravel(mask, order='F'))
+    sar_maps = dict()
+    h5_exports = [(extract_mnq(os.path.splitext(os.path.basename(file_name))[0] + '.txt'), file_name)
+                  for file_name in files_sorted(os.path.join(sar_dir, pattern)) if file_name.endswith('.h5')]
+    h5_exports = [(mnq, file_name) for mnq, file_name in h5_exports if mnq is not None]
+    if h5_exports:
+        for mnq, file_name in h5_exports:
+            sar = np.ravel(ResultReader3D(file_name, 'sar').fields3d, order='F')
+            sar_maps[mnq] = sar if indices is None else sar[indices]
+        return sar_maps
+    store = convert_sar_ascii(sar_dir, store_file, os.path.splitext(pattern)[0] + '.txt', nworkers)
+    for mnq in store.keys():
+        sar_maps[mnq] = store[mnq] if indices is None else store[mnq][indices]
+    return sar_maps
+
+def _sar_map(sar_maps, m, n, q):
+    """Map of export (m, n, q) and the sign of its imaginary part relative to
+    (min(m,n), max(m,n), q).
+    """
+    if (m, n, q) in sar_maps:
+        return sar_maps[(m, n, q)], 1.0
+    return sar_maps[(n, m, q)], -1.0
+
+def sar_q_matrices_chunk(sar_maps, nchannels, start, stop, quadrature_sign=1):
+    """Packed Q-matrices of voxels start:stop.
+    Returns:
+        (stop - start, nchannels*(nchannels+1)/2) packed upper triangles
+    """
+    diagonal = [np.asarray(sar_maps[(m, m, '')][start:stop], dtype=np.float64)
+                for m in range(1, nchannels + 1)]
+    (rows, cols) = triu_indices(nchannels)
+    packed = np.empty((stop - start, len(rows)), dtype=np.complex128)
+    for k, (row, col) in enumerate(zip(rows, cols)):
+        if row == col:
+            packed[:, k] = diagonal[row]
+            continue
+        diagonal_sum = diagonal[row] + diagonal[col]
+        (sar_mn, _) = _sar_map(sar_maps, row + 1, col + 1, '')
+        (sar_mnq, sign) = _sar_map(sar_maps, row + 1, col + 1, 'Q')
+        packed[:, k].real = 0.5*(sar_mn[start:stop] - diagonal_sum)
+        packed[:, k].imag = -0.5*quadrature_sign*sign*(sar_mnq[start:stop] - diagonal_sum)
+    return packed
+
+def iter_sar_q_matrices(sar_maps, chunk_voxels=default_chunk_voxels, nworkers=None, quadrature_sign=1):
+    """Iterate over packed Q-matrices of consecutive voxel chunks.
+    Args:
+        sar_maps: dict (m, n, q) -> SAR map (see load_sar_maps)
+        chunk_voxels: number of voxels per chunk
+        nworkers: number of threads (default: number of cpus)
+        quadrature_sign: +1 for quadrature exports e_m + j e_n, -1 for e_m - j e_n
+    Yields:
+        (start, stop, packed) with packed Q-matrices of voxels start:stop
+    """
+    nchannels = sar_export_channels(sar_maps.keys())
+    nvoxels = len(sar_maps[(1, 1, '')])
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max(1, nworkers)) as executor:
+        pending = collections.deque()
+        for start in range(0, nvoxels, chunk_voxels):
+            stop = min(start + chunk_voxels, nvoxels)
+            pending.append((start, stop, executor.submit(sar_q_matrices_chunk, sar_maps, nchannels, start,
+                                                         stop, quadrature_sign)))
+            if len(pending) > 2*nworkers:
+                (chunk_start, chunk_stop, future) = pending.popleft()
+                yield chunk_start, chunk_stop, future.result()
+        while pending:
+            (chunk_start, chunk_stop, future) = pending.popleft()
+            yield chunk_start, chunk_stop, future.result()
+
+def sar_q_matrices(sar_maps, chunk_voxels=default_chunk_voxels, nworkers=None, quadrature_sign=1):
+    """Packed Q-matrices of SAR maps.
+    Args:
+        sar_maps, chunk_voxels, nworkers, quadrature_sign: see iter_sar_q_matrices
+    Returns:
+        (nvoxels, nchannels*(nchannels+1)/2) complex128 packed upper triangles
+    """
+    nchannels = sar_export_channels(sar_maps.keys())
+    packed = np.empty((len(sar_maps[(1, 1, '')]), nchannels*(nchannels + 1)//2), dtype=np.complex128)
+    for start, stop, chunk in iter_sar_q_matrices(sar_maps, chunk_voxels, nworkers, quadrature_sign):
+        packed[start:stop] = chunk
+    return packed
+
+def write_sar_q_matrices(file_name, sar_dir, pattern='SAR*', mask=None, chunk_voxels=default_chunk_voxels,
+                         nworkers=None, quadrature_sign=1, dtype=np.complex128, compression=None):
+    """Stream Q-matrices reconstructed from the SAR exports of a directory to
+    a MAT (v7.3) file with the variables of vopgen.write_q_matrices:
+        Q_triu: (nvoxels, nchannels*(nchannels+1)/2) packed upper triangles
+        Q_rows, Q_cols: 1-based (row, column) of the packed entries
+        Q_ind, Q_grid: 1-based linear voxel indices and grid shape (only if
+                       a mask is given)
+    Args:
+        file_name: output MAT file
+        sar_dir, pattern, mask: see load_sar_maps
+        chunk_voxels, nworkers, quadrature_sign: see iter_sar_q_matrices
+        dtype: complex data type of stored Q-matrices
+        compression: hdf5 compression of Q_triu
+    """
+    sar_maps = load_sar_maps(sar_dir, pattern, mask, nworkers=nworkers)
+    nchannels = sar_export_channels(sar_maps.keys())
+    nvoxels = len(sar_maps[(1, 1, '')])
+    (rows, cols) = triu_indices(nchannels)
+    with MatWriter(file_name, compression=compression) as matf:
+        if mask is not None:
+            matf.write_variable(u'Q_ind', np.flatnonzero(np.ravel(mask, order='F')) + 1)
+            matf.write_variable(u'Q_grid', np.asarray([np.shape(mask)], dtype=np.float64))
+        matf.write_variable(u'Q_rows', rows + 1)
+        matf.write_variable(u'Q_cols', cols + 1)
+        q_triu = matf.create_variable(u'Q_triu', (nvoxels, len(rows)), dtype,
+                                      chunks=(min(chunk_voxels, max(1, nvoxels)), len(rows)))
+        for start, stop, chunk in iter_sar_q_matrices(sar_maps, chunk_voxels, nworkers, quadrature_sign):
+            q_triu[start:stop, :] = chunk
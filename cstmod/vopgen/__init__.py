@@ -1,2 +1,7 @@
 # Load vopgen writer modules
-from .sar_mask import SARMaskCST2019
\ No newline at end of file
+from .sar_mask import SARMaskCST2019
+from .masked_voxels import MaskedVoxelArray, read_masked_fields
+from .q_matrices import q_matrices, write_q_matrices, unpack_q_matrices, triu_indices
+from .mass_averaged_sar import mass_averaged_sar, mass_averaged_sar_from_fields, power_density
+from .vop_compression import vop_compression, vopgen_vop_compression, write_vops
+from .peak_sar import batch_peak_sar, peak_sar_from_fields, peak_sar_from_vops, load_vops
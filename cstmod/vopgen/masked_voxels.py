@@ -0,0 +1,184 @@
+"""
+Masked-voxel storage of vopgen arrays.
+
+Only voxels inside the SAR mask (sarmask_new) are used by vopgen processing.
+A MaskedVoxelArray keeps the linear indices of the masked voxels and a
+(n_masked, ...) data array, e.g. (n_masked, component, channel) for
+efMapArrayN or (n_masked, component) for condMap, instead of the dense
+(x, y, z, ...) array over the full box.
+
+Linear indices follow MATLAB (column-major) order over (x, y, z),
+    index = x + nx*(y + ny*z),
+which is also the C-order voxel index of CST's native (z, y, x) arrays, so
+gathering from native fields needs no transpose.  On disk, indices are
+stored 1-based, so in MATLAB
+    dense = zeros([grid, size(data, 2), size(data, 3)]);
+    dense(ind) = data  % per component and channel
+"""
+try:
+    import numpy as np
+except:
+    print("Masked voxels require Numpy.  Ensure package numpy is installed.")
+from cstmod.field_writer.mat_writer import MatWriter, read_mat_variable
+from cstmod.field_reader.axis_order import xyz_view
+
+class MaskedVoxelArray(object):
+    """Data of the voxels inside a mask.
+    """
+    def __init__(self, grid_shape, indices, data):
+        """
+        Args:
+            grid_shape: (nx, ny, nz) of the dense grid
+            indices: linear (column-major) indices of the masked voxels
+            data: ndarray (n_masked, ...) of the masked voxels
+        Raises:
+            ValueError if data does not match the indices
+        """
+        self._grid_shape = tuple(int(dim) for dim in grid_shape)
+        self._indices = np.asarray(indices, dtype=np.int64)
+        self._data = data
+        if len(self._data) != len(self._indices):
+            raise ValueError("Data of " + str(len(self._data)) + " voxels for "
+                             + str(len(self._indices)) + " masked voxels")
+
+    @classmethod
+    def from_mask(cls, mask, trailing_shape=(), dtype=np.complex128):
+        """Empty masked array to be filled by a reader (see fill).
+        Args:
+            mask: bool (nx, ny, nz) mask, e.g. sarmask_new
+            trailing_shape: per voxel shape, e.g. (3, nchannels)
+            dtype: data type
+        Returns:
+            MaskedVoxelArray
+        """
+        mask = np.asarray(mask)
+        indices = np.flatnonzero(np.ravel(mask, order='F'))
+        data = np.zeros((len(indices),) + tuple(trailing_shape), dtype=dtype)
+        return cls(np.shape(mask), indices, data)
+
+    @classmethod
+    def from_dense(cls, dense, mask):
+        """Masked array of the masked voxels of a dense (x, y, z, ...) array,
+        e.g. condMap or mdenMap.
+        """
+        masked = cls.from_mask(mask, np.shape(dense)[3:], np.asarray(dense).dtype)
+        masked.fill(dense)
+        return masked
+
+    def _voxel_view(self, dense):
+        """(nvoxels, ...) view of a dense (x, y, z, ...) array.  No copy for
+        arrays in column-major or CST native (transposed) layout.
+        """
+        return np.reshape(dense, (int(np.prod(self._grid_shape)),) + np.shape(dense)[3:], order='F')
+
+    def fill(self, dense, key=Ellipsis):
+        """Gather the masked voxels of a dense array into the data.
+        Args:
+            dense: (x, y, z, ...) array
+            key: index of the per voxel data, e.g. (Ellipsis, channel) to
+                 fill one channel of (n_masked, component, channel) data
+        """
+        if np.shape(dense)[0:3] != self._grid_shape:
+            raise ValueError("Grid " + str(np.shape(dense)[0:3]) + " differs from mask grid "
+                             + str(self._grid_shape))
+        if not isinstance(key, tuple):
+            key = (key,)
+        self._data[(slice(None),) + key] = self._voxel_view(dense)[self._indices]
+
+    def to_dense(self, fill_value=0):
+        """Scatter the data to a dense (x, y, z, ...) array.
+        Args:
+            fill_value: value of voxels outside of the mask
+        Returns:
+            ndarray (x, y, z, ...) in column-major layout
+        """
+        dense = np.full(self._grid_shape + np.shape(self._data)[1:], fill_value,
+                        dtype=self._data.dtype, order='F')
+        self._voxel_view(dense)[self._indices] = self._data
+        return dense
+
+    def save(self, file_name, variable_name, compression=None):
+        """Save to a MAT (v7.3) file as variables <variable_name> (data),
+        <variable_name>_ind (1-based linear indices) and <variable_name>_grid.
+        """
+        with MatWriter(file_name, compression=compression) as matf:
+            matf.write_variable(variable_name + u'_grid', np.asarray([self._grid_shape], dtype=np.float64))
+            matf.write_variable(variable_name + u'_ind', self._indices + 1)
+            data = np.asarray(self._data)
+            variable = matf.create_variable(variable_name, np.shape(data) if data.ndim > 1
+                                            else (len(data), 1), data.dtype)
+            variable.write(data)
+
+    @classmethod
+    def load(cls, file_name, variable_name):
+        """Load a masked array saved by save.
+        Returns:
+            MaskedVoxelArray
+        """
+        grid_shape = np.ravel(read_mat_variable(file_name, variable_name + u'_grid')).astype(np.int64)
+        indices = np.ravel(read_mat_variable(file_name, variable_name + u'_ind')) - 1
+        data = read_mat_variable(file_name, variable_name)
+        if 2 == data.ndim and 1 == data.shape[1]:
+            data = data[:, 0]
+        return cls(grid_shape, indices, data)
+
+    @property
+    def mask(self):
+        """Bool (nx, ny, nz) mask.
+        """
+        mask = np.zeros(self._grid_shape, dtype=np.bool_, order='F')
+        self._voxel_view(mask)[self._indices] = True
+        return mask
+
+    @property
+    def grid_shape(self):
+        """(nx, ny, nz) of the dense grid.
+        """
+        return self._grid_shape
+
+    @property
+    def indices(self):
+        """Linear (column-major, 0-based) indices of the masked voxels.
+        """
+        return self._indices
+
+    @property
+    def data(self):
+        """(n_masked, ...) data of the masked voxels.
+        """
+        return self._data
+
+    @property
+    def n_masked(self):
+        """Number of masked voxels.
+        """
+        return len(self._indices)
+
+    @property
+    def mask_fraction(self):
+        """Fraction of the grid inside the mask.
+        """
+        return self.n_masked / float(np.prod(self._grid_shape))
+
+def read_masked_fields(field_reader, mask, field_dir, field_type, freq, excitation_type='',
+                       rotating_frame=False, field_direction=+1, postfix="", version='2020'):
+    """Read multi-channel fields of the masked voxels.  Channels are gathered
+    one at a time, so the dense multi-channel array is never built.
+    Args:
+        field_reader: FieldReaderCST2019
+        mask: bool (nx, ny, nz) mask of the field grid, e.g. sarmask_new
+        field_dir, field_type, freq, ...: see FieldReaderCST2019.iter_channels
+    Returns:
+        MaskedVoxelArray with (n_masked, component, channel) data
+    """
+    channel_axes = tuple(axis for axis in field_reader.axes if axis != 'channel')
+    masked = None
+    for channel, channel_fields in field_reader.iter_channels(field_dir, field_type, freq, excitation_type,
+                                                              rotating_frame, field_direction, postfix,
+                                                              version):
+        channel_fields = xyz_view(channel_fields, channel_axes)
+        if masked is None:
+            masked = MaskedVoxelArray.from_mask(mask, (np.shape(channel_fields)[3], field_reader.nchannels),
+                                                field_reader.dtype)
+        masked.fill(channel_fields, (Ellipsis, channel))
+    return masked
@@ -0,0 +1,200 @@
+"""
+Mass-averaged (e.g. 1 g / 10 g) local SAR on nonuniform CST meshes.
+
+Each field sample (x, y, z mesh line crossing) is the center of a voxel whose
+faces lie halfway between neighbouring mesh lines.  Voxel mass (rho V) and
+absorbed power (sigma/2 |E|^2 V) are accumulated in 3D summed-volume tables
+(prefix sums), so the mass and power of any axis-aligned box of voxels are
+evaluated from 8 table entries, independent of the box size.
+
+For every masked voxel a cube centered on the voxel is grown to the target
+mass.  The cube half-size is searched (binary search over half-size steps)
+for the smallest cube holding at least the target mass; mass and power are
+linearly interpolated between this cube and the next smaller one (shell
+interpolation), and the averaged SAR is the interpolated power over the
+target mass.  Voxels whose largest cube does not reach the target mass (e.g.
+at the edge of the body) are reported invalid and averaged over the largest
+cube.  Masked voxels are processed in chunks by a pool of threads.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy as np
+except:
+    print("Mass averaged SAR requires Numpy.  Ensure package numpy is installed.")
+
+# default number of voxels per chunk
+default_chunk_voxels = 2**15
+
+def cell_widths(mesh_lines):
+    """Widths of the voxels centered on the mesh lines.  Voxel faces are
+    halfway between mesh lines; the outer voxels are symmetric about the
+    first and last mesh line.
+    Args:
+        mesh_lines: ascending mesh line coordinates in m
+    Returns:
+        ndarray of voxel widths
+    """
+    mesh_lines = np.asarray(mesh_lines, dtype=np.float64)
+    if len(mesh_lines) < 2:
+        raise ValueError("At least two mesh lines are required per axis.")
+    faces = np.empty(len(mesh_lines) + 1)
+    faces[1:-1] = 0.5*(mesh_lines[1:] + mesh_lines[:-1])
+    faces[0] = mesh_lines[0] - 0.5*(mesh_lines[1] - mesh_lines[0])
+    faces[-1] = mesh_lines[-1] + 0.5*(mesh_lines[-1] - mesh_lines[-2])
+    return np.diff(faces)
+
+def voxel_volumes(xdim, ydim, zdim):
+    """(nx, ny, nz) voxel volumes in m^3 of a nonuniform mesh.
+    """
+    return cell_widths(xdim)[:, np.newaxis, np.newaxis] \
+           * cell_widths(ydim)[np.newaxis, :, np.newaxis] \
+           * cell_widths(zdim)[np.newaxis, np.newaxis, :]
+
+def summed_volume_table(values):
+    """3D prefix sums with a leading zero plane per axis:
+    table[i, j, k] = sum(values[:i, :j, :k]).
+    """
+    table = np.zeros(tuple(dim + 1 for dim in np.shape(values)), dtype=np.float64)
+    np.cumsum(values, axis=0, out=table[1:, 1:, 1:])
+    np.cumsum(table[1:, 1:, 1:], axis=1, out=table[1:, 1:, 1:])
+    np.cumsum(table[1:, 1:, 1:], axis=2, out=table[1:, 1:, 1:])
+    return table
+
+def box_sums(table, lower, upper):
+    """Sums of boxes of values from a summed volume table.
+    Args:
+        table: summed volume table (see summed_volume_table)
+        lower: (n, 3) first voxel indices of boxes
+        upper: (n, 3) voxel indices past the boxes
+    Returns:
+        (n,) box sums
+    """
+    (x0, y0, z0) = (lower[:, 0], lower[:, 1], lower[:, 2])
+    (x1, y1, z1) = (upper[:, 0], upper[:, 1], upper[:, 2])
+    return table[x1, y1, z1] - table[x0, y1, z1] - table[x1, y0, z1] - table[x1, y1, z0] \
+           + table[x0, y0, z1] + table[x0, y1, z0] + table[x1, y0, z0] - table[x0, y0, z0]
+
+def power_density(efields, conductivity):
+    """Absorbed power density sigma/2 |E|^2 in W/m^3.
+    Args:
+        efields: (nx, ny, nz, 3) complex peak fields in V/m
+        conductivity: (nx, ny, nz) or per component (nx, ny, nz, 3) in S/m
+    Returns:
+        (nx, ny, nz) power density
+    """
+    intensity = np.real(efields * np.conj(efields))
+    conductivity = np.asarray(conductivity)
+    if conductivity.ndim == intensity.ndim:
+        return 0.5*np.sum(conductivity * intensity, axis=-1)
+    return 0.5*conductivity*np.sum(intensity, axis=-1)
+
+class _CubeGrowth(object):
+    """Cube box sums of voxel chunks on one mesh.
+    """
+    def __init__(self, mesh_lines, mass_table, power_table, target_mass):
+        self._mesh_lines = [np.asarray(dim, dtype=np.float64) for dim in mesh_lines]
+        self._mass_table = mass_table
+        self._power_table = power_table
+        self._target_mass = target_mass
+        # half-size steps: at most one mesh line is passed per axis and step
+        step = 0.5*min(np.min(np.diff(dim)) for dim in self._mesh_lines)
+        max_half_size = max(dim[-1] - dim[0] for dim in self._mesh_lines)
+        self._half_sizes = step*np.arange(int(np.ceil(max_half_size/step)) + 1)
+        # mesh lines on the cube faces are inside the cube
+        self._tolerance = 1e-6*step
+
+    def _cube_sums(self, centers, steps):
+        """Mass and power of cubes of given half-size steps.
+        """
+        half_size = self._half_sizes[steps] + self._tolerance
+        lower = np.stack([np.searchsorted(dim, center - half_size, 'left')
+                          for dim, center in zip(self._mesh_lines, centers)], axis=-1)
+        upper = np.stack([np.searchsorted(dim, center + half_size, 'right')
+                          for dim, center in zip(self._mesh_lines, centers)], axis=-1)
+        return box_sums(self._mass_table, lower, upper), box_sums(self._power_table, lower, upper)
+
+    def average(self, voxels):
+        """Mass averaged SAR of voxels.
+        Args:
+            voxels: (n, 3) voxel indices
+        Returns:
+            (sar, valid) with averaged SAR in W/kg and bool validity
+        """
+        centers = [dim[voxels[:, axis]] for axis, dim in enumerate(self._mesh_lines)]
+        nsteps = len(self._half_sizes) - 1
+        lower_step = np.zeros(len(voxels), dtype=np.int_)
+        upper_step = np.full(len(voxels), nsteps, dtype=np.int_)
+        (max_mass, max_power) = self._cube_sums(centers, upper_step)
+        valid = max_mass >= self._target_mass
+        # smallest half-size step with mass >= target mass
+        while np.any(lower_step < upper_step):
+            mid_step = (lower_step + upper_step)//2
+            (mass, power) = self._cube_sums(centers, mid_step)
+            enough = mass >= self._target_mass
+            upper_step = np.where(enough, mid_step, upper_step)
+            lower_step = np.where(enough, lower_step, mid_step + 1)
+        (mass_hi, power_hi) = self._cube_sums(centers, lower_step)
+        (mass_lo, power_lo) = self._cube_sums(centers, np.maximum(lower_step - 1, 0))
+        # interpolate between the shells enclosing the target mass
+        shell_mass = mass_hi - mass_lo
+        fraction = np.divide(self._target_mass - mass_lo, shell_mass, out=np.ones_like(shell_mass),
+                             where=shell_mass > 0)
+        fraction = np.clip(fraction, 0.0, 1.0)
+        mass = mass_lo + fraction*shell_mass
+        power = power_lo + fraction*(power_hi - power_lo)
+        sar = np.divide(power, mass, out=np.zeros_like(power), where=mass > 0)
+        return sar, valid
+
+def mass_averaged_sar(xdim, ydim, zdim, power, density, averaging_mass=0.01, mask=None,
+                      chunk_voxels=default_chunk_voxels, nworkers=None):
+    """Mass averaged SAR map.
+    Args:
+        xdim, ydim, zdim: mesh lines in m
+        power: (nx, ny, nz) absorbed power density in W/m^3 (see power_density)
+        density: (nx, ny, nz) mass density in kg/m^3 (e.g. mden3D)
+        averaging_mass: averaging mass in kg (0.001 for 1 g, 0.01 for 10 g)
+        mask: bool (nx, ny, nz) voxels to evaluate (default: density > 0)
+        chunk_voxels: number of voxels per chunk
+        nworkers: number of threads (default: number of cpus)
+    Returns:
+        (sar, valid) with (nx, ny, nz) averaged SAR in W/kg (0 outside of
+        mask) and bool map of voxels whose cube reached the averaging mass
+    """
+    volumes = voxel_volumes(xdim, ydim, zdim)
+    density = np.asarray(density, dtype=np.float64)
+    if mask is None:
+        mask = density > 0
+    cube_growth = _CubeGrowth((xdim, ydim, zdim), summed_volume_table(density*volumes),
+                              summed_volume_table(np.asarray(power)*volumes), averaging_mass)
+    voxels = np.argwhere(mask)
+    chunks = [voxels[start:start + chunk_voxels] for start in range(0, len(voxels), chunk_voxels)]
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max(1, nworkers)) as executor:
+        results = list(executor.map(cube_growth.average, chunks))
+
+    sar = np.zeros(np.shape(density), dtype=np.float64)
+    valid = np.zeros(np.shape(density), dtype=np.bool_)
+    for chunk, (chunk_sar, chunk_valid) in zip(chunks, results):
+        sar[chunk[:, 0], chunk[:, 1], chunk[:, 2]] = chunk_sar
+        valid[chunk[:, 0], chunk[:, 1], chunk[:, 2]] = chunk_valid
+    return sar, valid
+
+def mass_averaged_sar_from_fields(xdim, ydim, zdim, efields, shim, conductivity, density,
+                                  averaging_mass=0.01, mask=None, chunk_voxels=default_chunk_voxels,
+                                  nworkers=None):
+    """Mass averaged SAR of a shim of multi-channel fields.
+    Args:
+        xdim, ydim, zdim: mesh lines in m
+        efields: (nx, ny, nz, 3, nchannels) complex fields (efMapArrayN)
+        shim: (nchannels,) complex channel weights
+        conductivity: (nx, ny, nz) or (nx, ny, nz, 3) conductivity (condMap)
+        density: (nx, ny, nz) mass density (mden3D)
+        averaging_mass, mask, chunk_voxels, nworkers: see mass_averaged_sar
+    Returns:
+        (sar, valid), see mass_averaged_sar
+    """
+    shim_fields = np.matmul(efields, np.asarray(shim, dtype=np.complex128))
+    return mass_averaged_sar(xdim, ydim, zdim, power_density(shim_fields, conductivity), density,
+                             averaging_mass, mask, chunk_voxels, nworkers)
@@ -0,0 +1,135 @@
+"""
+Batch peak local SAR of many shim (channel weight) vectors.
+
+For a (nshims x nchannels) matrix of complex channel weights X, the local
+SAR of shim s in voxel v is
+    SAR_vs = x_s^H Q_v x_s = sum_c sigma_c/(2 rho_c) |E_vc x_s|^2
+and the peak SAR of a shim is the maximum over voxels.  It is evaluated
+either directly from the fields (efMapArrayN with condMap/mdenMap), with one
+(nvoxels x ncomp x nchannels) @ (nchannels x nshims) product per voxel chunk,
+or from VOPs (e.g. VOP.mat written by vopgen_vop_compression) with batched
+quadratic forms.  Voxel chunks are evaluated by a pool of threads and
+reduced to per shim maxima, so only one chunk of (voxels x shims) values is
+held per thread.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy as np
+except:
+    print("Peak SAR requires Numpy.  Ensure package numpy is installed.")
+from cstmod.vopgen.q_matrices import q_matrix_weights, _masked_data
+from cstmod.field_writer.mat_writer import read_mat_variable
+
+# default size in bytes of the (voxels x component x shims) block of a chunk
+default_chunk_bytes = 2**26
+
+def _chunk_ranges(n, chunk_size):
+    """(start, stop) of consecutive chunks.
+    """
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+def _reduce_peaks(chunk_peaks, ranges):
+    """Per shim maximum and its voxel (or VOP) index over chunks.
+    """
+    peak_sar = None
+    peak_index = None
+    for (start, stop), (chunk_sar, chunk_index) in zip(ranges, chunk_peaks):
+        if peak_sar is None:
+            (peak_sar, peak_index) = (chunk_sar, chunk_index + start)
+        else:
+            larger = chunk_sar > peak_sar
+            peak_sar = np.where(larger, chunk_sar, peak_sar)
+            peak_index = np.where(larger, chunk_index + start, peak_index)
+    return peak_sar, peak_index
+
+def _map_chunks(chunk_fn, ranges, nworkers):
+    """Evaluate chunk_fn for all chunk ranges with a pool of threads.
+    """
+    with ThreadPoolExecutor(max(1, nworkers or os.cpu_count() or 1)) as executor:
+        return list(executor.map(chunk_fn, ranges))
+
+def peak_sar_from_fields(shims, efields, conductivity, density, chunk_bytes=default_chunk_bytes,
+                         nworkers=None):
+    """Peak local SAR of each shim from fields and material maps.
+    Args:
+        shims: (nshims, nchannels) complex channel weights
+        efields: (n_masked, ncomp, nchannels) fields or MaskedVoxelArray
+        conductivity: (n_masked, ncomp) or (n_masked,) conductivity or MaskedVoxelArray
+        density: (n_masked, ncomp) or (n_masked,) mass density or MaskedVoxelArray
+        chunk_bytes: size of the per chunk (voxels x component x shims) block
+        nworkers: number of threads (default: number of cpus)
+    Returns:
+        (peak_sar, peak_voxel) with (nshims,) peak SAR in W/kg and index of
+        the peak voxel in the masked voxels
+    """
+    efields = _masked_data(efields)
+    weights = q_matrix_weights(_masked_data(conductivity), _masked_data(density))
+    shims = np.atleast_2d(np.asarray(shims, dtype=np.complex128))
+    # (nchannels, nshims)
+    shims_t = np.ascontiguousarray(shims.T)
+    chunk_voxels = max(1, int(chunk_bytes // (16*np.shape(efields)[1]*len(shims))))
+
+    def chunk_peaks(chunk):
+        shim_fields = np.matmul(efields[chunk[0]:chunk[1]], shims_t)
+        sar = np.einsum('vc,vcs->vs', weights[chunk[0]:chunk[1]], np.real(shim_fields*np.conj(shim_fields)))
+        peak_voxel = np.argmax(sar, axis=0)
+        return sar[peak_voxel, np.arange(len(shims))], peak_voxel
+
+    ranges = _chunk_ranges(len(efields), chunk_voxels)
+    return _reduce_peaks(_map_chunks(chunk_peaks, ranges, nworkers), ranges)
+
+def peak_sar_from_vops(shims, vops, chunk_bytes=default_chunk_bytes, nworkers=None):
+    """Peak local SAR of each shim from VOPs.
+    Args:
+        shims: (nshims, nchannels) complex channel weights
+        vops: (nvops, nchannels, nchannels) VOPs
+        chunk_bytes: size of the per chunk (vops x channels x shims) block
+        nworkers: number of threads (default: number of cpus)
+    Returns:
+        (peak_sar, peak_vop) with (nshims,) peak SAR in W/kg and index of
+        the VOP of the peak
+    """
+    vops = np.asarray(vops)
+    shims = np.atleast_2d(np.asarray(shims, dtype=np.complex128))
+    shims_t = np.ascontiguousarray(shims.T)
+    chunk_vops = max(1, int(chunk_bytes // (16*np.shape(vops)[1]*len(shims))))
+
+    def chunk_peaks(chunk):
+        # (vops, nchannels, nshims)
+        q_shims = np.matmul(vops[chunk[0]:chunk[1]], shims_t)
+        sar = np.real(np.einsum('ms,vms->vs', np.conj(shims_t), q_shims))
+        peak_vop = np.argmax(sar, axis=0)
+        return sar[peak_vop, np.arange(len(shims))], peak_vop
+
+    ranges = _chunk_ranges(len(vops), chunk_vops)
+    return _reduce_peaks(_map_chunks(chunk_peaks, ranges, nworkers), ranges)
+
+def load_vops(vop_file):
+    """VOPs of a VOP file (see write_vops).
+    Returns:
+        (nvops, nchannels, nchannels) VOPs
+    """
+    vops = read_mat_variable(vop_file, u'VOPm')
+    if 2 == np.ndim(vops):
+        vops = vops[:, :, np.newaxis]
+    return np.transpose(vops, (2, 0, 1))
+
+def batch_peak_sar(shims, vop_file=None, efields=None, conductivity=None, density=None,
+                   chunk_bytes=default_chunk_bytes, nworkers=None):
+    """Peak local SAR of each shim, from a VOP file or from fields.
+    Args:
+        shims: (nshims, nchannels) complex channel weights
+        vop_file: VOP file (VOP.mat).  If None, the fields are used.
+        efields, conductivity, density: see peak_sar_from_fields
+        chunk_bytes, nworkers: see peak_sar_from_fields
+    Returns:
+        (nshims,) peak SAR in W/kg
+    Raises:
+        ValueError if neither a VOP file nor fields and material maps are given
+    """
+    if vop_file is not None:
+        return peak_sar_from_vops(shims, load_vops(vop_file), chunk_bytes, nworkers)[0]
+    if efields is None or conductivity is None or density is None:
+        raise ValueError("Peak SAR requires a VOP file or fields, conductivity and density.")
+    return peak_sar_from_fields(shims, efields, conductivity, density, chunk_bytes, nworkers)[0]
@@ -0,0 +1,164 @@
+"""
+Per-voxel SAR Q-matrices.
+
+The local SAR of voxel v for channel weights x is x^H Q_v x with the
+Hermitian (nchannels x nchannels) Q-matrix
+    Q_v = sum_c sigma_c/(2 rho_c) conj(E_c)^T E_c
+where E_c is the (1 x nchannels) row of field component c of the voxel
+(peak field amplitudes), sigma_c the conductivity and rho_c the mass density
+of the component (condMap and mdenMap are given per component).
+
+Q-matrices are computed for chunks of masked voxels with batched matrix
+products, chunks in parallel by a pool of threads (numpy releases the GIL
+in matmul).  Only the upper triangle (row-major, see triu_indices) of each
+Q-matrix is stored, as (n_masked, nchannels*(nchannels+1)/2) complex array
+in memory or streamed chunk by chunk to a MAT (v7.3) file.
+"""
+import os
+import collections
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy as np
+except:
+    print("Q-matrices require Numpy.  Ensure package numpy is installed.")
+from cstmod.field_writer.mat_writer import MatWriter
+from cstmod.vopgen.masked_voxels import MaskedVoxelArray
+
+# default number of voxels per chunk
+default_chunk_voxels = 2**14
+
+def triu_indices(nchannels):
+    """(rows, columns) of the packed upper triangle in row-major order.
+    """
+    return np.triu_indices(nchannels)
+
+def unpack_q_matrices(packed, nchannels):
+    """Full Hermitian Q-matrices from packed upper triangles.
+    Args:
+        packed: (..., nchannels*(nchannels+1)/2) upper triangles
+        nchannels: number of channels
+    Returns:
+        (..., nchannels, nchannels) Q-matrices
+    """
+    packed = np.asarray(packed)
+    (rows, cols) = triu_indices(nchannels)
+    q = np.zeros(np.shape(packed)[:-1] + (nchannels, nchannels), dtype=packed.dtype)
+    q[..., cols, rows] = np.conj(packed)
+    q[..., rows, cols] = packed
+    return q
+
+def q_matrix_weights(conductivity, density):
+    """Per voxel and component weights sigma/(2 rho).  Voxels without mass
+    (rho = 0) get zero weight.
+    Args:
+        conductivity: (n_masked,) or (n_masked, ncomp) conductivity in S/m
+        density: (n_masked,) or (n_masked, ncomp) mass density in kg/m^3
+    Returns:
+        (n_masked, ncomp) or (n_masked, 1) weights
+    """
+    conductivity = np.asarray(conductivity, dtype=np.float64)
+    density = np.asarray(density, dtype=np.float64)
+    if 1 == conductivity.ndim:
+        conductivity = conductivity[:, np.newaxis]
+    if 1 == density.ndim:
+        density = density[:, np.newaxis]
+    return np.divide(conductivity, 2.0*density, out=np.zeros(np.broadcast(conductivity, density).shape),
+                     where=density > 0)
+
+def q_matrices_chunk(efields, weights):
+    """Packed Q-matrices of a chunk of voxels.
+    Args:
+        efields: (nvoxels, ncomp, nchannels) complex fields
+        weights: (nvoxels, ncomp) or (nvoxels, 1) weights (see q_matrix_weights)
+    Returns:
+        (nvoxels, nchannels*(nchannels+1)/2) packed upper triangles
+    """
+    efields = np.asarray(efields)
+    scaled = efields * np.sqrt(weights)[:, :, np.newaxis]
+    # (nvoxels, nchannels, ncomp) @ (nvoxels, ncomp, nchannels)
+    q = np.matmul(np.conj(np.swapaxes(scaled, 1, 2)), scaled)
+    (rows, cols) = triu_indices(np.shape(efields)[2])
+    return q[:, rows, cols]
+
+def iter_q_matrices(efields, weights, chunk_voxels=default_chunk_voxels, nworkers=None):
+    """Iterate over packed Q-matrices of consecutive voxel chunks.  Chunks
+    are computed by nworkers threads with a bounded number of chunks ahead.
+    Args:
+        efields: (n_masked, ncomp, nchannels) complex fields
+        weights: (n_masked, ncomp) weights (see q_matrix_weights)
+        chunk_voxels: number of voxels per chunk
+        nworkers: number of threads (default: number of cpus)
+    Yields:
+        (start, stop, packed) with packed Q-matrices of voxels start:stop
+    """
+    nvoxels = len(efields)
+    if nworkers is None:
+        nworkers = os.cpu_count() or 1
+    chunks = [(start, min(start + chunk_voxels, nvoxels)) for start in range(0, nvoxels, chunk_voxels)]
+    with ThreadPoolExecutor(max(1, nworkers)) as executor:
+        pending = collections.deque()
+        for start, stop in chunks:
+            pending.append((start, stop, executor.submit(q_matrices_chunk, efields[start:stop],
+                                                         weights[start:stop])))
+            if len(pending) > 2*nworkers:
+                (chunk_start, chunk_stop, future) = pending.popleft()
+                yield chunk_start, chunk_stop, future.result()
+        while pending:
+            (chunk_start, chunk_stop, future) = pending.popleft()
+            yield chunk_start, chunk_stop, future.result()
+
+def _masked_data(values):
+    """Data of a MaskedVoxelArray or array of masked voxels.
+    """
+    return values.data if isinstance(values, MaskedVoxelArray) else np.asarray(values)
+
+def q_matrices(efields, conductivity, density, chunk_voxels=default_chunk_voxels, nworkers=None):
+    """Packed Q-matrices of all masked voxels.
+    Args:
+        efields: (n_masked, ncomp, nchannels) fields or MaskedVoxelArray
+        conductivity: (n_masked, ncomp) or (n_masked,) conductivity or MaskedVoxelArray
+        density: (n_masked, ncomp) or (n_masked,) mass density or MaskedVoxelArray
+        chunk_voxels: number of voxels per chunk
+        nworkers: number of threads
+    Returns:
+        (n_masked, nchannels*(nchannels+1)/2) complex128 packed upper triangles
+    """
+    efields = _masked_data(efields)
+    weights = q_matrix_weights(_masked_data(conductivity), _masked_data(density))
+    nchannels = np.shape(efields)[2]
+    packed = np.empty((len(efields), nchannels*(nchannels + 1)//2), dtype=np.complex128)
+    for start, stop, chunk in iter_q_matrices(efields, weights, chunk_voxels, nworkers):
+        packed[start:stop] = chunk
+    return packed
+
+def write_q_matrices(file_name, efields, conductivity, density, chunk_voxels=default_chunk_voxels,
+                     nworkers=None, dtype=np.complex128, compression=None):
+    """Stream packed Q-matrices of all masked voxels to a MAT (v7.3) file.
+    Variables:
+        Q_triu: (n_masked, nchannels*(nchannels+1)/2) packed upper triangles
+        Q_rows, Q_cols: 1-based (row, column) of the packed entries
+        Q_ind, Q_grid: 1-based linear voxel indices and grid shape (only if
+                       efields is a MaskedVoxelArray)
+    Args:
+        file_name: output MAT file
+        efields, conductivity, density: see q_matrices
+        chunk_voxels: number of voxels per chunk
+        nworkers: number of threads
+        dtype: complex data type of stored Q-matrices
+        compression: hdf5 compression of Q_triu
+    """
+    masked = efields if isinstance(efields, MaskedVoxelArray) else None
+    efields = _masked_data(efields)
+    weights = q_matrix_weights(_masked_data(conductivity), _masked_data(density))
+    nchannels = np.shape(efields)[2]
+    (rows, cols) = triu_indices(nchannels)
+    with MatWriter(file_name, compression=compression) as matf:
+        if masked is not None:
+            matf.write_variable(u'Q_ind', masked.indices + 1)
+            matf.write_variable(u'Q_grid', np.asarray([masked.grid_shape], dtype=np.float64))
+        matf.write_variable(u'Q_rows', rows + 1)
+        matf.write_variable(u'Q_cols', cols + 1)
+        q_triu = matf.create_variable(u'Q_triu', (len(efields), len(rows)), dtype,
+                                      chunks=(min(chunk_voxels, max(1, len(efields))), len(rows)))
+        for start, stop, chunk in iter_q_matrices(efields, weights, chunk_voxels, nworkers):
+            q_triu[start:stop, :] = chunk
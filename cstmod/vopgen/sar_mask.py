@@ -5,17 +5,56 @@ export to file: sarmask_aligned.mat
     XDim: XDim x 1
     YDim: YDim x 1
     ZDim: ZDim x 1
-    sarmask_new  (XDim, YDim, ZDim)
+    sarmask_new  (XDim, YDim, ZDim) logical
 
 
 """
 import numpy as np
-import hdf5storage
-import scipy.io as spio
+from cstmod.field_writer.mat_writer import MatWriter
 #from rfutils import xmat
 #from cstmod.field_reader import FieldReaderCST2019
 
 
+# number of voxels compared per slab in _range_mask
+mask_slab_size = 2**22
+
+def _range_mask(values, value_min, value_max, out=None):
+    """Boolean mask of value_min < values < value_max.  Both comparisons are
+    evaluated slab by slab along the first axis, so temporaries are limited
+    to one slab instead of the full volume.
+    Args:
+        values: ndarray of material values
+        value_min: lower limit (exclusive)
+        value_max: upper limit (exclusive)
+        out: optional bool array of the shape of values
+    Returns:
+        bool ndarray
+    """
+    values = np.asarray(values)
+    if out is None:
+        out = np.empty(np.shape(values), dtype=np.bool_)
+    if 0 == values.ndim:
+        out[...] = (value_min < values) & (value_max > values)
+        return out
+    plane_size = max(1, values[0:1].size)
+    step = max(1, mask_slab_size // plane_size)
+    for start in range(0, len(values), step):
+        slab = values[start:start+step]
+        np.greater(slab, value_min, out=out[start:start+step])
+        out[start:start+step] &= (value_max > slab)
+    return out
+
+def pack_mask(mask):
+    """Bit-packed (8 voxels per byte) form of a bool mask in C order.
+    """
+    return np.packbits(mask, axis=None)
+
+def unpack_mask(packed_mask, shape):
+    """Bool mask of given shape from its bit-packed form (see pack_mask).
+    """
+    count = int(np.prod(shape))
+    return np.unpackbits(packed_mask, count=count).astype(np.bool_).reshape(shape)
+
 class SARMaskCST2019(object):
     """Calculate the SAR mask based on dielectric material properties.
     """
@@ -30,7 +69,8 @@ class SARMaskCST2019(object):
         self._sigma_max = 3.0 # S/m
         self._epsr_min = 2.0
         self._epsr_max = 100.0 # Epsr
-        self._sarmask = None
+        self._sigma_mask = None
+        self._epsr_mask = None
 
     @property
     def sigma_min(self):
@@ -43,7 +83,9 @@ class SARMaskCST2019(object):
         """Update minimum conductivity for SAR mask.
         """
         if new_sigma_min < self._sigma_max:
-            self._sigma_min = new_sigma_min
+            if new_sigma_min != self._sigma_min:
+                self._sigma_min = new_sigma_min
+                self._sigma_mask = None
         else:
             print("sigma_min must be less than sigma_max (", self._sigma_max, ")")
 
@@ -58,7 +100,9 @@ class SARMaskCST2019(object):
         """Update maximum conductivity for SAR mask.
         """
         if new_sigma_max > self._sigma_min:
-            self._sigma_max = new_sigma_max
+            if new_sigma_max != self._sigma_max:
+                self._sigma_max = new_sigma_max
+                self._sigma_mask = None
         else:
             print("sigma_max must be greater than sigma_min (", self._sigma_min,")")
 
@@ -73,7 +117,9 @@ class SARMaskCST2019(object):
         """Update minimum epsr for SAR mask.
         """
         if new_epsr_min < self._epsr_max:
-            self._epsr_min = new_epsr_min
+            if new_epsr_min != self._epsr_min:
+                self._epsr_min = new_epsr_min
+                self._epsr_mask = None
         else:
             print("epsr_min must be less than epsr_max (", self._epsr_max,")")
     
@@ -88,50 +134,57 @@ class SARMaskCST2019(object):
         """Update maximum epsr for SAR mask.
         """
         if new_epsr_max > self._epsr_min:
-            self._epsr_max = new_epsr_max
+            if new_epsr_max != self._epsr_max:
+                self._epsr_max = new_epsr_max
+                self._epsr_mask = None
         else:
             print("epsr_max must be greater than epsr_min(", self._epsr_min,")")
 
-    def _generate_mask(self):
-        """Generate mask from desired range of conductivity and permittivity
+    @property
+    def sigma_mask(self):
+        """Bool mask of voxels with sigma_min < sigma < sigma_max.  Computed
+        once and cached until a conductivity limit changes.
         """
-        sigma_mask_ind = np.where((self._sigma_min < self._sigma) & 
-                                  (self._sigma_max > self._sigma))
-        sigma_mask = np.zeros((len(self._xdim),
-                               len(self._ydim),
-                               len(self._zdim)),
-                              dtype = np.int)
-        print("sar_mask_ind: ", sigma_mask_ind)
-        sigma_mask[sigma_mask_ind] = 1
-        epsr_mask_ind = np.where((self._epsr_min < self._epsr) &
-                                 (self._epsr_max > self._epsr))
-        epsr_mask = np.zeros((len(self._xdim),
-                              len(self._ydim),
-                              len(self._zdim)),
-                                 dtype = np.int)
-        print("epsr_mask_ind: ", epsr_mask_ind)
-        epsr_mask[epsr_mask_ind] = 1
-        #self._sarmask = np.multiply(epsr_mask, sigma_mask)
-        self._sarmask = sigma_mask
-
-        
+        if self._sigma_mask is None:
+            self._sigma_mask = _range_mask(self._sigma, self._sigma_min, self._sigma_max)
+            print("sigma_mask voxels: ", np.count_nonzero(self._sigma_mask))
+        return self._sigma_mask
+
+    @property
+    def epsr_mask(self):
+        """Bool mask of voxels with epsr_min < epsr < epsr_max.  Computed
+        once and cached until a permittivity limit changes.
+        """
+        if self._epsr_mask is None:
+            self._epsr_mask = _range_mask(self._epsr, self._epsr_min, self._epsr_max)
+            print("epsr_mask voxels: ", np.count_nonzero(self._epsr_mask))
+        return self._epsr_mask
+
     @property
     def sarmask(self):
-        """Updates and returns sarmask with given permitivitty 
-        and conductivity limits.
+        """Returns the bool sarmask with given conductivity limits.  The mask
+        is only recomputed after a limit changed.
+        """
+        #return np.logical_and(self.epsr_mask, self.sigma_mask)
+        return self.sigma_mask
+
+    @property
+    def packed_sarmask(self):
+        """Returns the bit-packed sarmask (see unpack_mask).
         """
-        self._generate_mask()
-        return self._sarmask
+        return pack_mask(self.sarmask)
 
-    def write_sarmask(self, filename):
-        """Save sarmask info to file.
+    def write_sarmask(self, filename, compression='gzip'):
+        """Save sarmask info to MAT (v7.3) file.
+        Args:
+            filename: output MAT file
+            compression: hdf5 compression of the mask (None, 'gzip')
         """
         print('write_sarmask filename: ', filename)
-        self._generate_mask()
-        export_dict = dict()
-        export_dict[u'XDim'] = self._xdim
-        export_dict[u'YDim'] = self._ydim
-        export_dict[u'ZDim'] = self._zdim
-        export_dict[u'sarmask_new'] = self._sarmask
-        spio.savemat(filename, export_dict, oned_as = 'column')
+        with MatWriter(filename) as matf:
+            matf.write_variable(u'XDim', self._xdim)
+            matf.write_variable(u'YDim', self._ydim)
+            matf.write_variable(u'ZDim', self._zdim)
+            # bool mask is stored as MATLAB logical (uint8)
+            matf.write_variable(u'sarmask_new', self.sarmask, compression=compression)
 
@@ -5,15 +5,29 @@ touchstone file.
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-import hdf5storage
+from cstmod.field_writer.mat_writer import MatWriter
+from cstmod.cstutil.touchstone import read_touchstone
 
 try:
     import skrf as rf
 except(ModuleNotFoundError) as err:
-    print("This module uses Scikit-RF.  Please install scikit-rf with pip or otherwise.")
-    raise(err)
+    print("Networks require Scikit-RF.  Please install scikit-rf with pip or otherwise.")
 
-def network_at_frequency(freq0 :float , network: rf.Network) -> rf.Network:
+def smatrix_at_frequency(freq0: float, ts_file: str, use_cache: bool = True) -> np.ndarray:
+    """ N-by-N S-matrix of a touchstone file at the frequency nearest to freq0.
+        The file is streamed (see cstutil.read_touchstone), no network is built.
+    Args:
+        freq0: frequency (Hz).
+        ts_file: touchstone file, e.g. .s16p
+        use_cache: read from the binary cache of the touchstone file
+    Returns:
+        N-by-N complex S-matrix
+    """
+    (freqs, s, _) = read_touchstone(ts_file, frequencies=[freq0], use_cache=use_cache)
+    print(freqs[0])
+    return s[0]
+
+def network_at_frequency(freq0 :float , network: 'rf.Network') -> 'rf.Network':
     """ Reduce network to single frequency.
     Args:
         freq0: single frequency of output network (Hz).
@@ -31,7 +45,7 @@ def network_at_frequency(freq0 :float , network: rf.Network) -> rf.Network:
     return rf.Network(frequency=freq0, s=network.s[f0_ind,:,:])
     return None
 
-def write_mat(filename: str, network: rf.Network)-> None: 
+def write_mat(filename: str, network: 'rf.Network')-> None: 
     """ Save rf network as rf file.
     Args: 
         network: rf network for single frequency.
@@ -41,9 +55,8 @@ def write_mat(filename: str, network: rf.Network)-> None:
     Raises:
         None
     """
-    network_dict = dict()
-    network_dict['Smatrix'] = network.s[0,:,:]
-    hdf5storage.savemat(filename, network_dict)
+    with MatWriter(filename) as matf:
+        matf.write_variable('Smatrix', network.s[0,:,:])
 
 def plot_mat(smat: np.ndarray) -> plt.axes:
     """
@@ -61,9 +74,8 @@ def plot_mat(smat: np.ndarray) -> plt.axes:
 if __name__ == "__main__":
     ts_file = os.path.join(r'E:', os.path.sep, r'CST_Field_Post', r'KU_Ten_32_FDA_21Jul2021_4_6.s16p')
     smat_file = os.path.join(r'E:', os.path.sep, r'CST_Field_Post', r'Smatrix.mat')
-    netwk1 = rf.Network(ts_file)
-    netwk2 = network_at_frequency(447.0e6, netwk1)
-    write_mat(smat_file, netwk2)
+    with MatWriter(smat_file) as matf:
+        matf.write_variable('Smatrix', smatrix_at_frequency(447.0e6, ts_file))
     #plot_mat(netwk2.s[0,:,:])
     #plt.show()
     print("Done.")
@@ -0,0 +1,229 @@
+"""
+Virtual observation point (VOP) compression of SAR Q-matrices.
+
+Q-matrices of all masked voxels are clustered into a small set of VOPs such
+that for every channel weight vector x and voxel v
+    x^H Q_v x <= max_j x^H VOP_j x <= x^H Q_v x + x^H Z x  (for the worst voxel)
+with the overestimation matrix Z = epsilon * max_v ||Q_v|| * I.
+
+Greedy clustering (Eichfelder and Gebhardt, MRM 2011, with fixed cluster
+matrices): voxels are visited in order of decreasing spectral norm; the
+largest unassigned Q-matrix Q_c becomes the core of a new VOP
+    VOP_j = Q_c + Z
+and every unassigned voxel with VOP_j - Q_v positive semidefinite is
+assigned to the cluster.  Domination tests are evaluated in chunks by a pool
+of threads; cheap necessary (diagonal) and sufficient (Frobenius norm)
+conditions avoid most eigenvalue evaluations.
+
+The clustering state is written to a checkpoint file, so an interrupted
+compression of a large model resumes with the VOPs found so far.
+"""
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import h5py
+except:
+    print("VOP compression requires HDF5 support.  Ensure h5py is installed.")
+try:
+    import numpy as np
+except:
+    print("VOP compression requires Numpy.  Ensure package numpy is installed.")
+from cstmod.field_writer.mat_writer import MatWriter, read_mat_variable
+from cstmod.vopgen.masked_voxels import MaskedVoxelArray
+from cstmod.vopgen.q_matrices import q_matrices, unpack_q_matrices, default_chunk_voxels
+
+vop_file_name = 'VOP.mat'
+vop_checkpoint_name = 'vop_checkpoint.npz'
+
+# tolerance of the positive semidefinite test relative to the overestimation
+psd_tolerance = 1e-9
+
+def _chunk_ranges(n, chunk_size):
+    """(start, stop) of consecutive chunks.
+    """
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+def q_matrix_norms(q_packed, nchannels, chunk_voxels=default_chunk_voxels, nworkers=None):
+    """Spectral norms (largest eigenvalues) of packed Q-matrices.
+    """
+    def chunk_norms(chunk):
+        return np.linalg.eigvalsh(unpack_q_matrices(q_packed[chunk[0]:chunk[1]], nchannels))[:, -1]
+    with ThreadPoolExecutor(max(1, nworkers or os.cpu_count() or 1)) as executor:
+        norms = list(executor.map(chunk_norms, _chunk_ranges(len(q_packed), chunk_voxels)))
+    return np.concatenate(norms) if norms else np.zeros(0)
+
+def _dominated(vop, q_packed, candidates, nchannels, overestimation):
+    """Candidates whose Q-matrix is dominated by vop (vop - Q_v psd).
+    Args:
+        vop: (nchannels, nchannels) VOP
+        q_packed: packed Q-matrices
+        candidates: voxel indices to test
+        overestimation: scalar z of Z = z I
+    Returns:
+        bool array over candidates
+    """
+    q = unpack_q_matrices(q_packed[candidates], nchannels)
+    difference = vop[np.newaxis] - q
+    dominated = np.zeros(len(candidates), dtype=np.bool_)
+    # necessary: non-negative diagonal
+    diagonal_ok = np.all(np.real(np.diagonal(difference, axis1=1, axis2=2)) >= -psd_tolerance*overestimation,
+                         axis=-1)
+    # sufficient: ||Q_c - Q_v||_F <= z
+    core_difference = np.linalg.norm(difference - overestimation*np.eye(nchannels), axis=(1, 2))
+    sure = diagonal_ok & (core_difference <= overestimation)
+    dominated[sure] = True
+    test = diagonal_ok & ~sure
+    if np.any(test):
+        min_eig = np.linalg.eigvalsh(difference[test])[:, 0]
+        dominated[test] = min_eig >= -psd_tolerance*overestimation
+    return dominated
+
+def _checkpoint_key(q_packed, nchannels, epsilon):
+    """Key of the compression input of a checkpoint.
+    """
+    sample = np.ascontiguousarray(q_packed[::max(1, len(q_packed)//1024)])
+    key = hashlib.sha1(sample.tobytes())
+    key.update(str((np.shape(q_packed), nchannels, float(epsilon))).encode('utf-8'))
+    return key.hexdigest()
+
+def _save_checkpoint(checkpoint_file, key, cores, cluster):
+    """Save the clustering state (atomic replace).
+    """
+    temp_file = checkpoint_file + '.tmp.npz'
+    np.savez(temp_file, key=np.array(key), cores=np.asarray(cores, dtype=np.int64), cluster=cluster)
+    os.replace(temp_file, checkpoint_file)
+
+def _load_checkpoint(checkpoint_file, key):
+    """Clustering state of a checkpoint of the same input, or None.
+    """
+    if checkpoint_file is None or not os.path.exists(checkpoint_file):
+        return None
+    with np.load(checkpoint_file) as checkpoint:
+        if str(checkpoint['key']) != key:
+            print("[vop_compression] ignoring checkpoint of different input: ", checkpoint_file)
+            return None
+        print("[vop_compression] resuming from checkpoint: ", checkpoint_file)
+        return list(checkpoint['cores']), checkpoint['cluster'].copy()
+
+def vop_compression(q_packed, nchannels, epsilon=0.05, chunk_voxels=default_chunk_voxels, nworkers=None,
+                    checkpoint_file=None, checkpoint_interval=10):
+    """Compress packed Q-matrices to VOPs.
+    Args:
+        q_packed: (n_masked, nchannels*(nchannels+1)/2) packed Q-matrices (see q_matrices)
+        nchannels: number of channels
+        epsilon: overestimation relative to the largest Q-matrix norm
+        chunk_voxels: number of voxels per domination test chunk
+        nworkers: number of threads (default: number of cpus)
+        checkpoint_file: clustering state file to resume from and update
+        checkpoint_interval: number of VOPs between checkpoints
+    Returns:
+        (vops, overestimation, cores, cluster) with
+            vops: (nvops, nchannels, nchannels) VOPs
+            overestimation: (nchannels, nchannels) overestimation matrix Z
+            cores: voxel index of the core Q-matrix of each VOP
+            cluster: VOP index of each voxel
+    """
+    nworkers = max(1, nworkers or os.cpu_count() or 1)
+    norms = q_matrix_norms(q_packed, nchannels, chunk_voxels, nworkers)
+    overestimation = epsilon*(np.max(norms) if len(norms) else 0.0)
+    order = np.argsort(-norms, kind='stable')
+
+    key = _checkpoint_key(q_packed, nchannels, epsilon)
+    state = _load_checkpoint(checkpoint_file, key)
+    if state is None:
+        (cores, cluster) = ([], np.full(len(q_packed), -1, dtype=np.int64))
+    else:
+        (cores, cluster) = state
+
+    position = 0
+    with ThreadPoolExecutor(nworkers) as executor:
+        while True:
+            while position < len(order) and cluster[order[position]] >= 0:
+                position += 1
+            if position == len(order):
+                break
+            core = order[position]
+            vop_index = len(cores)
+            cores.append(core)
+            cluster[core] = vop_index
+            vop = unpack_q_matrices(q_packed[core], nchannels) + overestimation*np.eye(nchannels)
+            remaining = np.flatnonzero(cluster < 0)
+            chunks = [remaining[start:stop] for start, stop in _chunk_ranges(len(remaining), chunk_voxels)]
+            results = executor.map(lambda candidates: _dominated(vop, q_packed, candidates, nchannels,
+                                                                 overestimation), chunks)
+            for candidates, dominated in zip(chunks, results):
+                cluster[candidates[dominated]] = vop_index
+            if checkpoint_file is not None and 0 == len(cores) % checkpoint_interval:
+                _save_checkpoint(checkpoint_file, key, cores, cluster)
+    if checkpoint_file is not None:
+        _save_checkpoint(checkpoint_file, key, cores, cluster)
+
+    cores = np.asarray(cores, dtype=np.int64)
+    vops = unpack_q_matrices(q_packed[cores], nchannels) + overestimation*np.eye(nchannels)
+    print("[vop_compression] ", len(q_packed), " Q-matrices compressed to ", len(cores), " VOPs")
+    return vops, overestimation*np.eye(nchannels), cores, cluster
+
+def write_vops(file_name, vops, overestimation, cores, cluster, indices=None, epsilon=None):
+    """Write VOPs to a MAT (v7.3) file.
+    Variables:
+        VOPm: (nchannels, nchannels, nvops) VOPs
+        Zm: (nchannels, nchannels) overestimation matrix
+        vop_cluster: (n_masked, 1) 1-based VOP of each masked voxel
+        vop_ind: 1-based linear (column-major) voxel index of each VOP core
+                 (if indices of the masked voxels are given)
+        epsilon: relative overestimation
+    """
+    with MatWriter(file_name) as matf:
+        matf.write_variable(u'VOPm', np.transpose(vops, (1, 2, 0)))
+        matf.write_variable(u'Zm', overestimation)
+        matf.write_variable(u'vop_cluster', np.asarray(cluster) + 1)
+        if indices is not None:
+            matf.write_variable(u'vop_ind', np.asarray(indices)[cores] + 1)
+        if epsilon is not None:
+            matf.write_variable(u'epsilon', float(epsilon))
+
+def _load_mat_variable(file_name, name):
+    """Variable of a MAT file (v7.3 or earlier).
+    """
+    if h5py.is_hdf5(file_name):
+        return read_mat_variable(file_name, name)
+    import scipy.io as spio
+    return spio.loadmat(file_name, variable_names=[name])[name]
+
+def vopgen_vop_compression(vopgen_dir, epsilon=0.05, chunk_voxels=default_chunk_voxels, nworkers=None,
+                           restart=True, efields_file='efMapArrayN.mat', propmap_file='propmap.mat',
+                           massdensity_file='massdensityMap3D.mat', sarmask_file='sarmask_aligned.mat'):
+    """VOP compression of the vopgen files of a vopgen directory.  Q-matrices
+    are formed from efMapArrayN, condMap and mdenMap (propmap) of the voxels
+    in sarmask_new; voxels without component densities use mden3D.
+    Args:
+        vopgen_dir: vopgen directory with input files; VOP.mat is written here
+        epsilon: overestimation relative to the largest Q-matrix norm
+        chunk_voxels, nworkers: see vop_compression
+        restart: resume from (and keep) the checkpoint in vopgen_dir
+    Returns:
+        (vops, overestimation, cores, cluster), see vop_compression
+    """
+    sarmask = _load_mat_variable(os.path.join(vopgen_dir, sarmask_file), 'sarmask_new').astype(np.bool_)
+    efields = MaskedVoxelArray.from_dense(_load_mat_variable(os.path.join(vopgen_dir, efields_file),
+                                                             'efMapArrayN'), sarmask)
+    conductivity = MaskedVoxelArray.from_dense(_load_mat_variable(os.path.join(vopgen_dir, propmap_file),
+                                                                  'condMap'), sarmask).data
+    density = MaskedVoxelArray.from_dense(_load_mat_variable(os.path.join(vopgen_dir, propmap_file),
+                                                             'mdenMap'), sarmask).data
+    mden3d = MaskedVoxelArray.from_dense(_load_mat_variable(os.path.join(vopgen_dir, massdensity_file),
+                                                            'mden3D'), sarmask).data
+    if 1 == density.ndim:
+        # 3-D mdenMap: one density per voxel
+        density = density[:, np.newaxis]
+    density = np.where(density > 0, density, mden3d[:, np.newaxis])
+
+    nchannels = np.shape(efields.data)[2]
+    q_packed = q_matrices(efields, conductivity, density, chunk_voxels, nworkers)
+    checkpoint_file = os.path.join(vopgen_dir, vop_checkpoint_name) if restart else None
+    (vops, overestimation, cores, cluster) = vop_compression(q_packed, nchannels, epsilon, chunk_voxels,
+                                                             nworkers, checkpoint_file)
+    write_vops(os.path.join(vopgen_dir, vop_file_name), vops, overestimation, cores, cluster,
+               efields.indices, epsilon)
+    return vops, overestimation, cores, cluster
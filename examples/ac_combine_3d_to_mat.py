@@ -6,7 +6,7 @@ import os
 import sys
 import re
 import h5py
-import hdf5storage
+from cstmod.field_writer import savemat
 import timeit
 import functools
 import numpy as np
@@ -80,7 +80,7 @@ def write_fields(output_file, xdim, ydim, zdim, b1_arrayn):
     save_dict['YDim'] = ydim
     save_dict['ZDim'] = zdim
     save_dict['bfMapArrayN'] = b1_arrayn
-    hdf5storage.savemat(file_name=output_file, mdict=save_dict, oned_as='column')
+    savemat(output_file, save_dict)
     if os.path.exists(output_file):
         print("Generated " + output_file)
         print("Done.")
@@ -6,6 +6,7 @@ import sys
 import os
 import numpy as np
 import hdf5storage
+from cstmod.field_writer import savemat
 
 def sarmask_cleanup(input_filename, output_filename):
     """Clean up sarmaksk and save to file.
@@ -62,7 +63,7 @@ def sarmask_cleanup(input_filename, output_filename):
     sarmask_dict_clean[u'YDim'] = ydim
     sarmask_dict_clean[u'ZDim'] = zdim
 
-    hdf5storage.savemat(output_filename, sarmask_dict_clean, oned_as='column')
+    savemat(output_filename, sarmask_dict_clean, compression='gzip')
 
 if "__main__" == __name__:
     print("Post-processing SAR mask.")
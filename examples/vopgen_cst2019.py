@@ -12,9 +12,10 @@ from cstmod.rfutils.rfutils import xmat
 from tkinter import Tk
 from tkinter.filedialog import askdirectory
 
-from cstmod.field_reader import FieldReaderCST2019, GenericDataNArray
+from cstmod.field_reader import FieldReaderCST2019, GenericDataNArray, read_complex_fields
 
 from cstmod.vopgen import SARMaskCST2019
+from cstmod.field_writer import savemat
 
 def export_vopgen_fields(project_dir, export_dir, normalization, freq0, B0_direction=1, postfix=""):
     export_3d_dir = os.path.join(project_dir, 'Export','3d')
@@ -60,7 +61,7 @@ def export_vopgen_mask(export_dir, f0, xdim, ydim, zdim, efield_data, hfield_dat
     mat_property_dict['XDim'] = xdim
     mat_property_dict['YDim'] = ydim
     mat_property_dict['ZDim'] = zdim
-    hdf5storage.savemat(os.path.join(export_dir, 'mat_properties_raw.mat'), mat_property_dict, oned_as='column')
+    savemat(os.path.join(export_dir, 'mat_properties_raw.mat'), mat_property_dict)
 
 def export_vopgen_mask_from_current_density(export_dir, f0, xdim, ydim, zdim, efield_data, hfield_data, current_density):
     """Calculate vopgen masks from electric fields and current density.
@@ -87,24 +88,15 @@ def export_vopgen_mask_from_current_density(export_dir, f0, xdim, ydim, zdim, ef
     mat_property_dict['XDim'] = xdim
     mat_property_dict['YDim'] = ydim
     mat_property_dict['ZDim'] = zdim
-    hdf5storage.savemat(os.path.join(export_dir, 'mat_properties_raw.mat'), mat_property_dict, oned_as='column')    
+    savemat(os.path.join(export_dir, 'mat_properties_raw.mat'), mat_property_dict)    
 
 def load_current_data(field_data_file):
     """Load current density data."""
     with h5py.File(field_data_file, 'r') as dataj:
-        jxre = np.transpose(dataj['Conduction Current Density']['x']['re'], (2, 1, 0))
-        jxim = np.transpose(dataj['Conduction Current Density']['x']['im'], (2, 1, 0))
-        jyre = np.transpose(dataj['Conduction Current Density']['y']['re'], (2, 1, 0))
-        jyim = np.transpose(dataj['Conduction Current Density']['y']['im'], (2, 1, 0))
-        jzre = np.transpose(dataj['Conduction Current Density']['z']['re'], (2, 1, 0))
-        jzim = np.transpose(dataj['Conduction Current Density']['z']['im'], (2, 1, 0))
-    jfield_data = np.zeros((np.shape(jxre)[0],
-                            np.shape(jxre)[1],
-                            np.shape(jxre)[2], 3),
-                            dtype = np.complex128)
-    jfield_data[:,:,:,0] = jxre + 1.0j*jxim
-    jfield_data[:,:,:,1] = jyre + 1.0j*jyim
-    jfield_data[:,:,:,2] = jzre + 1.0j*jzim
+        jfields = read_complex_fields(dataj['Conduction Current Density'])
+    # (z, y, x, component) -> (x, y, z, component)
+    jfield_data = np.ascontiguousarray(np.transpose(jfields, (2, 1, 0, 3)),
+                                       dtype=np.complex128)
 
     return jfield_data
 
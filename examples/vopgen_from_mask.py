@@ -4,6 +4,7 @@
 """
 import os
 import hdf5storage
+from cstmod.field_writer import savemat
 import numpy as np
 
 
@@ -36,9 +37,7 @@ def write_massdensitymap3d(vopgen_dir, mass_density):
     massdensity_dict['ZDim'] = zdim
     massdensity_dict['mden3D'] = mden3D
     massdensity_dict['mden3Dm'] = mden3Dm
-    hdf5storage.savemat(os.path.join(vopgen_dir, 'massdensityMap3D.mat'),
-                        massdensity_dict,
-                        oned_as='column')
+    savemat(os.path.join(vopgen_dir, 'massdensityMap3D.mat'), massdensity_dict)
 
     
     print('Done.')
@@ -79,9 +78,7 @@ def write_propmat(vopgen_dir, mass_density, conductivity):
     propmap_dict['mdenMap'] = mdenmap
     propmap_dict['condMap'] = condmap
     propmap_dict['units'] = 'm'
-    hdf5storage.savemat(os.path.join(vopgen_dir, 'propmap.mat'),
-                        propmap_dict,
-                        oned_as = 'column')
+    savemat(os.path.join(vopgen_dir, 'propmap.mat'), propmap_dict)
 
     print('Done.')
 
@@ -0,0 +1,53 @@
+"""
+Helpers to create small synthetic CST hdf5 exports for unit tests.
+"""
+import os
+import numpy as np
+import h5py
+
+cst_compound_type = np.dtype([('x', np.dtype([('re', np.float32), ('im', np.float32)])),
+                              ('y', np.dtype([('re', np.float32), ('im', np.float32)])),
+                              ('z', np.dtype([('re', np.float32), ('im', np.float32)]))])
+
+def random_fields(nx, ny, nz, seed=0):
+    """Random complex fields in CST native (z, y, x, component) order.
+    """
+    rng = np.random.default_rng(seed)
+    fields = rng.standard_normal((nz, ny, nx, 3)) + 1.0j*rng.standard_normal((nz, ny, nx, 3))
+    return fields.astype(np.complex64)
+
+def write_cst_field_h5(file_name, field_key, xdim, ydim, zdim, fields):
+    """Write a CST-style 3d field export.
+    Args:
+        file_name: output hdf5 file
+        field_key: hdf5 dataset name (e.g. 'E-Field', 'H-Field')
+        xdim, ydim, zdim: mesh lines (mm)
+        fields: complex fields in (z, y, x, component) order
+    """
+    data = np.empty(np.shape(fields)[0:3], dtype=cst_compound_type)
+    for i, comp in enumerate(('x', 'y', 'z')):
+        data[comp]['re'] = fields[..., i].real
+        data[comp]['im'] = fields[..., i].imag
+    with h5py.File(file_name, 'w') as f:
+        f.create_dataset(field_key, data=data)
+        f.create_dataset('Mesh line x', data=np.asarray(xdim, dtype=np.float64))
+        f.create_dataset('Mesh line y', data=np.asarray(ydim, dtype=np.float64))
+        f.create_dataset('Mesh line z', data=np.asarray(zdim, dtype=np.float64))
+
+def write_cst_channel_exports(export_dir, field_type, freq, excitation_type, 
+                              nchannels, nx=5, ny=4, nz=3, seed=0):
+    """Write one synthetic field export per channel.
+    Returns:
+        (xdim, ydim, zdim, fields) with fields in (z, y, x, component, channel) order
+    """
+    field_key = {'e-field':'E-Field', 'h-field':'H-Field'}[field_type]
+    xdim = np.linspace(-10.0, 10.0, nx)
+    ydim = np.linspace(-5.0, 5.0, ny)
+    zdim = np.linspace(0.0, 20.0, nz)
+    fields = np.empty((nz, ny, nx, 3, nchannels), dtype=np.complex64)
+    for channel in range(nchannels):
+        fields[..., channel] = random_fields(nx, ny, nz, seed=seed+channel)
+        file_name = os.path.join(export_dir, field_type + ' (f=' + str(freq) + ') ['
+                                 + excitation_type + str(channel+1) + '].h5')
+        write_cst_field_h5(file_name, field_key, xdim, ydim, zdim, fields[..., channel])
+    return xdim, ydim, zdim, fields
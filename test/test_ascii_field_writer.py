@@ -1,8 +1,11 @@
 """Unit tests for ascii field writer.
 """
 import os
+import tempfile
 import unittest
+import numpy as np
 from cstmod.field_writer import ascii_field_writer
+from cstmod.field_writer.ascii_field_writer import write_ascii_fields, header
 
 class TestASCIIFieldWriter(unittest.TestCase):
     """Unit tests for ascii field writer.
@@ -36,5 +39,74 @@ class TestASCIIFieldWriter(unittest.TestCase):
     def tearDownClass(cls):
         pass
 
+class TestWriteASCIIFields(unittest.TestCase):
+    """Unit tests for the block formatted ascii field writer.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(25)
+        fields = rng.standard_normal((3, 4, 5, 3)) + 1.0j*rng.standard_normal((3, 4, 5, 3))
+        fields[0, 0, 0] = [0.0, -1.0e-120, 9.99999995]
+        self.fields_dict = {'XDim': np.linspace(-10.0, 10.0, 5), 'YDim': np.array([-1.5, 0.0, 2.25, 3.0]),
+                            'ZDim': np.array([0.0, 0.5, 1.0]), 'H-Field': fields.astype(np.complex64)}
+
+    def reference_lines(self, fields):
+        """Records formatted one voxel at a time.
+        """
+        lines = []
+        for k, z in enumerate(self.fields_dict['ZDim']):
+            for j, y in enumerate(self.fields_dict['YDim']):
+                for i, x in enumerate(self.fields_dict['XDim']):
+                    lines.append(f"{x:17}{y:17}{z:17}" + ''.join(f"{np.real(v):17.7e}{np.imag(v):17.7e}"
+                                                                for v in fields[k, j, i]) + "\n")
+        return lines
+
+    def test_write_ascii_fields(self):
+        """Block formatted records match per voxel formatting.
+        """
+        file_name = os.path.join(self.tempdir.name, 'h-field.txt')
+        write_ascii_fields(self.fields_dict, file_name)
+        with open(file_name) as fh:
+            lines = fh.readlines()
+        self.assertEqual(lines[0:2], header)
+        self.assertEqual(lines[2:], self.reference_lines(self.fields_dict['H-Field']))
+
+    def test_long_coordinates(self):
+        """float64 mesh lines with reprs wider than a column keep fixed width records.
+        """
+        file_name = os.path.join(self.tempdir.name, 'h-field.txt')
+        fields_dict = dict(self.fields_dict)
+        fields_dict['XDim'] = np.linspace(-100, 100, 5)*1.1
+        self.assertEqual(f"{fields_dict['XDim'][0]}", '-110.00000000000001')
+        write_ascii_fields(fields_dict, file_name)
+        with open(file_name) as fh:
+            lines = fh.readlines()[2:]
+        self.assertTrue(all(len(line) == 9*17 + 1 for line in lines))
+        data = np.loadtxt(file_name, skiprows=2)
+        self.assertTrue(np.allclose(data[0:5, 0], fields_dict['XDim'], rtol=1e-12))
+
+    def test_field_quantities(self):
+        """E-, B- and current density headers; unknown quantities are rejected.
+        """
+        file_name = os.path.join(self.tempdir.name, 'fields.txt')
+        fields_dict = dict(self.fields_dict)
+        fields_dict['B-Field'] = fields_dict.pop('H-Field')
+        write_ascii_fields(fields_dict, file_name)
+        with open(file_name) as fh:
+            self.assertEqual(fh.readline().split()[6:8], ['BxRe', '[Vs/m^2]'])
+        write_ascii_fields(fields_dict, file_name, 'B-Field', buffer_bytes=64)
+        data = np.loadtxt(file_name, skiprows=2)
+        self.assertTrue(np.allclose(data[:, 3], np.real(fields_dict['B-Field'][..., 0]).ravel(), rtol=1e-7))
+        fields_dict['Current Density'] = fields_dict.pop('B-Field')
+        write_ascii_fields(fields_dict, file_name)
+        with open(file_name) as fh:
+            self.assertIn('JzIm [A/m^2]', fh.readline())
+        del fields_dict['Current Density']
+        with self.assertRaises(KeyError):
+            write_ascii_fields(fields_dict, file_name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -10,6 +10,9 @@ import fnmatch
 import numpy as np
 from cstmod.cstutil import *
 from cstmod.cosimulation import *
+import hdf5storage
+from cstmod.cosimulation.combine_fields import ac_combine_fields, ac_combine_fields_multi
+from .synthetic_exports import write_cst_channel_exports
 
 class Test(unittest.TestCase):
     """
@@ -117,6 +120,121 @@ class Test(unittest.TestCase):
         self.assertEqual(np.shape(powers), (len(ac_results_path), nports))
         print('powers: ', powers, np.shape(powers))
 
+    def test_ac_combine_fields_parallel(self):
+        """Combining fields with worker processes matches serial combination.
+        """
+        weights = np.array([1.0, 0.5j, -0.25, 2.0-1.0j, 0.1])
+        with tempfile.TemporaryDirectory() as tempdir:
+            (xdim, ydim, zdim, fields) = write_cst_channel_exports(tempdir, 'h-field', 63.65,
+                                                                   'AC', len(weights))
+            field_files = sort_cst_results_export(find_cst_files(os.path.join(tempdir, 'h-field*.h5')), 'AC')
+            combined = ac_combine_fields(field_files, weights)
+            combined_parallel = ac_combine_fields(field_files, weights, nworkers=2)
+        expected = np.sum(fields * weights, axis=-1)
+        self.assertTrue(np.allclose(combined['h-field'], expected, atol=1e-5))
+        self.assertTrue(np.allclose(combined_parallel['h-field'], expected, atol=1e-5))
+        self.assertTrue(np.allclose(combined_parallel['xdim'], xdim))
+
+    def test_ac_combine_fields_complex64(self):
+        """Fields are read and returned as complex64.
+        """
+        weights = np.array([1.0, 0.5j, -0.25])
+        with tempfile.TemporaryDirectory() as tempdir:
+            (xdim, ydim, zdim, fields) = write_cst_channel_exports(tempdir, 'h-field', 63.65,
+                                                                   'AC', len(weights))
+            field_files = sort_cst_results_export(find_cst_files(os.path.join(tempdir, 'h-field*.h5')), 'AC')
+            combined = ac_combine_fields(field_files, weights, dtype=np.complex64)
+            combined_parallel = ac_combine_fields(field_files, weights, nworkers=2, dtype=np.complex64)
+        expected = np.sum(fields * weights, axis=-1)
+        self.assertEqual(combined['h-field'].dtype, np.complex64)
+        self.assertEqual(combined_parallel['h-field'].dtype, np.complex64)
+        self.assertTrue(np.allclose(combined['h-field'], expected, atol=1e-5))
+        self.assertTrue(np.allclose(combined_parallel['h-field'], expected, atol=1e-5))
+
+    def test_ac_combine_fields_multi(self):
+        """All combinations computed in one pass match single combinations.
+        """
+        weights = np.array([[1.0, 0.5j, 0.0],
+                            [0.5j, -1.0, 1.0],
+                            [-0.25, 2.0-1.0j, 1.0],
+                            [0.1, 0.0, 1.0]])
+        with tempfile.TemporaryDirectory() as tempdir:
+            (xdim, ydim, zdim, fields) = write_cst_channel_exports(tempdir, 'h-field', 63.65,
+                                                                   'AC', np.shape(weights)[0])
+            field_files = sort_cst_results_export(find_cst_files(os.path.join(tempdir, 'h-field*.h5')), 'AC')
+            # small slabs: one z-plane per slab
+            combined_list = ac_combine_fields_multi(field_files, weights, slab_bytes=1)
+            output_files = [os.path.join(tempdir, 'combined_fields_AC' + str(i+1) + '.mat')
+                            for i in range(np.shape(weights)[1])]
+            ac_combine_fields_multi(field_files, weights, output_files, dtype=np.complex64)
+            combined_files = [hdf5storage.loadmat(output_file) for output_file in output_files]
+            for combination in range(np.shape(weights)[1]):
+                expected = ac_combine_fields(field_files, weights[:, combination])
+                self.assertTrue(np.allclose(combined_list[combination]['h-field'],
+                                            expected['h-field']))
+                self.assertEqual(combined_files[combination]['h-field'].dtype, np.complex64)
+                self.assertTrue(np.allclose(combined_files[combination]['h-field'],
+                                            expected['h-field'], atol=1e-5))
+                self.assertTrue(np.allclose(np.ravel(combined_files[combination]['xdim']), xdim))
+            with self.assertRaises(ValueError):
+                ac_combine_fields_multi(field_files[1:], weights)
+
+    def test_port_data_store(self):
+        """Port files are parsed once and queried at many frequencies.
+        """
+        freqs = np.linspace(60.0, 70.0, 21)
+        with tempfile.TemporaryDirectory() as ac_dir:
+            for port_type, scale in (('FD Voltages', 1.0), ('FD Currents', 0.1)):
+                os.makedirs(os.path.join(ac_dir, port_type))
+                for port in range(1, 5):
+                    values = np.stack((freqs, scale*port*np.ones(21), scale*freqs), axis=-1)
+                    np.savetxt(os.path.join(ac_dir, port_type, 'P' + str(port) + '.txt'), values,
+                               delimiter='\t')
+            store = port_data_store(os.path.join(ac_dir, 'FD Voltages'))
+            self.assertEqual(np.shape(store.data), (4, 21))
+            self.assertFalse(store.refresh())
+            self.assertIs(port_data_store(os.path.join(ac_dir, 'FD Voltages')), store)
+            query = np.array([59.0, 63.65, 63.8, 71.0])
+            self.assertTrue(np.array_equal(store.frequencies[store.frequency_indices(query)],
+                                           [60.0, 63.5, 64.0, 70.0]))
+            powers = power_from_ports(ac_dir, query)
+            self.assertEqual(np.shape(powers), (4, 4))
+            for i, freq in enumerate(query):
+                self.assertTrue(np.allclose(powers[:, i], power_from_ports(ac_dir, freq)))
+            voltage = np.arange(1, 5) + 1.0j*63.5
+            self.assertTrue(np.allclose(powers[:, 1], np.multiply(voltage, np.conj(0.1*voltage))/np.sqrt(2.0)))
+            # modified port file is parsed again
+            port_file = os.path.join(ac_dir, 'FD Voltages', 'P2.txt')
+            np.savetxt(port_file, np.stack((freqs, np.zeros(21), np.zeros(21)), axis=-1), delimiter='\t')
+            os.utime(port_file, ns=(0, 0))
+            self.assertTrue(np.allclose(data_from_ports(os.path.join(ac_dir, 'FD Voltages'), 63.65)[1], 0.0))
+
+    def test_batch_power_from_ports(self):
+        """Port powers of many AC directories; incomplete directories are reported.
+        """
+        freqs = np.linspace(60.0, 70.0, 11)
+        with tempfile.TemporaryDirectory() as export_dir:
+            for ac in (1, 2, 3, 5, 6, 11):
+                nports = 3 if 6 == ac else 4
+                for port_type in ('FD Voltages', 'FD Currents'):
+                    if 5 == ac and 'FD Currents' == port_type:
+                        continue
+                    port_dir = os.path.join(export_dir, 'AC' + str(ac), port_type)
+                    os.makedirs(port_dir)
+                    for port in range(1, nports + 1):
+                        if 3 == ac and 2 == port:
+                            continue
+                        values = np.stack((freqs, ac*port*np.ones(11), np.zeros(11)), axis=-1)
+                        np.savetxt(os.path.join(port_dir, 'P' + str(port) + '.txt'), values, delimiter='\t')
+            (ac_dirs, powers, report) = batch_power_from_ports(export_dir, 64.0, nworkers=4)
+            self.assertEqual([os.path.basename(ac_dir) for ac_dir in ac_dirs], ['AC1', 'AC2', 'AC11'])
+            self.assertEqual(np.shape(powers), (3, 4))
+            self.assertTrue(np.allclose(powers[2], (11*np.arange(1, 5))**2/np.sqrt(2.0)))
+            self.assertEqual(sorted(os.path.basename(ac_dir) for ac_dir in report),
+                             ['AC10', 'AC3', 'AC4', 'AC5', 'AC6', 'AC7', 'AC8', 'AC9'])
+            self.assertIn('FileNotFoundError', report[os.path.join(export_dir, 'AC5')])
+            self.assertIn('number of ports', report[os.path.join(export_dir, 'AC6')])
+
     def tearDown(self):
         pass
 
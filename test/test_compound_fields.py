@@ -0,0 +1,56 @@
+"""Unit tests for single-pass decode of CST compound field datasets.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import h5py
+from cstmod.field_reader import read_complex_fields, complex_view
+from .synthetic_exports import cst_compound_type, random_fields, write_cst_field_h5
+
+class TestCompoundFields(unittest.TestCase):
+    """Unit tests for compound field decode.
+    """
+    def setUp(self):
+        self.fields = random_fields(4, 3, 2)
+
+    def test_complex_view_is_view(self):
+        """Packed compound buffers are viewed as complex without a copy.
+        """
+        buffer = np.empty((2, 3, 4), dtype=cst_compound_type)
+        for i, comp in enumerate(('x', 'y', 'z')):
+            buffer[comp]['re'] = self.fields[..., i].real
+            buffer[comp]['im'] = self.fields[..., i].imag
+        fields = complex_view(buffer)
+        self.assertEqual(fields.dtype, np.complex64)
+        self.assertEqual(np.shape(fields), (2, 3, 4, 3))
+        self.assertTrue(np.shares_memory(fields, buffer))
+        self.assertTrue(np.array_equal(fields, self.fields))
+
+    def test_complex_view_reordered_members(self):
+        """Compound types with a different member order are assembled.
+        """
+        reordered_type = np.dtype([('z', [('re', np.float64), ('im', np.float64)]),
+                                   ('x', [('re', np.float64), ('im', np.float64)]),
+                                   ('y', [('re', np.float64), ('im', np.float64)])])
+        buffer = np.empty((2, 3, 4), dtype=reordered_type)
+        for i, comp in enumerate(('x', 'y', 'z')):
+            buffer[comp]['re'] = self.fields[..., i].real
+            buffer[comp]['im'] = self.fields[..., i].imag
+        fields = complex_view(buffer)
+        self.assertEqual(fields.dtype, np.complex128)
+        self.assertTrue(np.array_equal(fields, self.fields))
+
+    def test_read_complex_fields(self):
+        """Read a compound dataset from file.
+        """
+        with tempfile.TemporaryDirectory() as tempdir:
+            file_name = os.path.join(tempdir, 'current (f=447) [AC1].h5')
+            write_cst_field_h5(file_name, 'Conduction Current Density',
+                               np.arange(4), np.arange(3), np.arange(2), self.fields)
+            with h5py.File(file_name, 'r') as dataf:
+                fields = read_complex_fields(dataf['Conduction Current Density'])
+        self.assertTrue(np.array_equal(fields, self.fields))
+
+if __name__ == "__main__":
+    unittest.main()
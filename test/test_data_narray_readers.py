@@ -1,7 +1,9 @@
 """Unit tests for handling arrays of CST exported data.
 """
 import os
+import tempfile
 import unittest
+import numpy as np
 from cstmod.field_reader import DataNArrayABC, GenericDataNArray
 
 class TestOneDimemensionalCSTData(unittest.TestCase):
@@ -49,6 +51,62 @@ class TestOneDimemensionalCSTData(unittest.TestCase):
         self.assertEqual(len(power_admitted), 16)
         print("f0: ", f0, ", power_admitted: ", power_admitted)
 
+    def test_load_data_one_d_cached(self):
+        """Channel exports are parsed in bulk and reloaded from the binary cache.
+        """
+        with tempfile.TemporaryDirectory() as export_dir:
+            freqs = np.linspace(400.0, 500.0, 101)
+            for channel in range(1, 12):
+                values = np.stack((freqs, channel*np.ones(101), -freqs/channel), axis=-1)
+                np.savetxt(os.path.join(export_dir, 'Power_Excitation (AC' + str(channel)
+                                        + ')_Power Accepted (DS).txt'), values, delimiter='\t')
+            file_name_pattern = os.path.join(export_dir, "Power_Excitation*_Power Accepted (DS).txt")
+            self.gdr.load_data_one_d(file_name_pattern)
+            self.assertEqual(self.gdr.data_shape, (101, 11))
+            self.assertTrue(np.allclose(self.gdr.xdim, freqs))
+            self.assertTrue(np.allclose(self.gdr.data[50], np.arange(1, 12) - 450.0j/np.arange(1, 12)))
+            self.assertTrue(os.path.isdir(os.path.join(export_dir, '.cstmod_cache')))
+            cached = GenericDataNArray()
+            cached.load_data_one_d(file_name_pattern)
+            self.assertIsInstance(cached.data, np.memmap)
+            self.assertTrue(np.array_equal(cached.data, self.gdr.data))
+            # re-written export invalidates the cache
+            values = np.stack((freqs, 2.0*np.ones(101), np.zeros(101)), axis=-1)
+            export_file = os.path.join(export_dir, 'Power_Excitation (AC1)_Power Accepted (DS).txt')
+            np.savetxt(export_file, values, delimiter='\t')
+            os.utime(export_file, ns=(0, 0))
+            cached.load_data_one_d(file_name_pattern)
+            self.assertTrue(np.allclose(cached.data[:, 0], 2.0))
+
+    def test_nchannel_data_at_values(self):
+        """Arrays of values are looked up by nearest neighbor, linear and
+        cubic interpolation.
+        """
+        with tempfile.TemporaryDirectory() as export_dir:
+            freqs = np.linspace(400.0, 500.0, 11)
+            for channel in range(1, 4):
+                values = np.stack((freqs, channel*freqs, -freqs**2), axis=-1)
+                np.savetxt(os.path.join(export_dir, 'Power_Excitation (AC' + str(channel)
+                                        + ')_Power Accepted (DS).txt'), values, delimiter='\t')
+            self.gdr.load_data_one_d(os.path.join(export_dir, "Power_Excitation*_Power Accepted (DS).txt"),
+                                     use_cache=False)
+        f0, data = self.gdr.nchannel_data_at_value(447.0)
+        self.assertEqual(f0, 450.0)
+        self.assertTrue(np.allclose(data, [450.0 - 450.0**2*1j, 900.0 - 450.0**2*1j, 1350.0 - 450.0**2*1j]))
+        query = np.array([399.0, 404.0, 446.0, 447.0, 501.0])
+        f, data = self.gdr.nchannel_data_at_value(query)
+        self.assertTrue(np.array_equal(f, [400.0, 400.0, 450.0, 450.0, 500.0]))
+        self.assertEqual(np.shape(data), (5, 3))
+        query = np.array([400.0, 447.0, 452.5, 500.0])
+        f, data = self.gdr.nchannel_data_at_value(query, 'linear')
+        self.assertTrue(np.allclose(data.real, np.outer(query, [1, 2, 3])))
+        f, data = self.gdr.nchannel_data_at_value(query, 'cubic')
+        self.assertTrue(np.allclose(data.imag, -np.outer(query**2, [1, 1, 1])))
+        with self.assertRaises(ValueError):
+            self.gdr.nchannel_data_at_value(501.0, 'linear')
+        with self.assertRaises(ValueError):
+            self.gdr.nchannel_data_at_value(447.0, 'spline')
+
     def tearDown(self):
         pass
 
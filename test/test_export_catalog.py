@@ -0,0 +1,131 @@
+"""Unit tests for the export catalog of CST export trees.
+"""
+import os
+import glob
+import tempfile
+import unittest
+import numpy as np
+from cstmod.cstutil import ExportCatalog, parse_export_name, find_cst_files, pad_square_bracket_string
+from cstmod.cosimulation import data_from_ports
+
+def touch(file_name, content=''):
+    """Create a file with given content.
+    """
+    with open(file_name, 'w') as f:
+        f.write(content)
+
+class TestExportCatalog(unittest.TestCase):
+    """Unit tests for ExportCatalog.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.project_dir = self.tempdir.name
+        self.export_3d = os.path.join(self.project_dir, 'Export', '3d')
+        self.export_1d = os.path.join(self.project_dir, 'Export', '1d')
+        os.makedirs(self.export_3d)
+        os.makedirs(self.export_1d)
+        for channel in (1, 2, 11, 12):
+            touch(os.path.join(self.export_3d, 'h-field (f=447) [AC' + str(channel) + '].h5'))
+            touch(os.path.join(self.export_3d, 'SAR (f=447) [AC' + str(channel) + '] (10g).h5'))
+            touch(os.path.join(self.export_1d, 'Power_Excitation (AC' + str(channel)
+                               + ')_Power Accepted (DS).txt'))
+        touch(os.path.join(self.export_3d, 'e-field (f=297.2) [pw].h5'))
+
+    def test_parse_export_name(self):
+        """Export file names are parsed into structured records.
+        """
+        fields = parse_export_name('SAR (f=447) [AC1_2Q] (10g).txt')
+        self.assertEqual(fields['quantity'], 'SAR')
+        self.assertEqual(fields['frequency'], 447.0)
+        self.assertEqual(fields['excitation_type'], 'AC')
+        self.assertEqual(fields['channel'], 1)
+        self.assertEqual(fields['postfix'], '_2Q')
+        self.assertEqual(fields['averaging_mass'], '10g')
+        fields = parse_export_name('e-field (f=297.2) [pw].h5')
+        self.assertEqual((fields['quantity'], fields['frequency'], fields['excitation_type'],
+                          fields['channel']), ('e-field', 297.2, 'pw', None))
+        fields = parse_export_name('Power_Excitation (AC3)_Power Accepted (DS).txt')
+        self.assertEqual((fields['quantity'], fields['channel']),
+                         ('Power_Excitation (AC*)_Power Accepted (DS)', 3))
+        fields = parse_export_name('P12.txt')
+        self.assertEqual((fields['quantity'], fields['channel']), ('P', 12))
+
+    def test_find_sorted_by_channel(self):
+        """Channel files are returned sorted by channel number.
+        """
+        catalog = ExportCatalog.for_project(self.project_dir)
+        h_files = catalog.files('h-field', 447, 'AC')
+        self.assertEqual([os.path.basename(f) for f in h_files],
+                         ['h-field (f=447) [AC' + str(i) + '].h5' for i in (1, 2, 11, 12)])
+        self.assertEqual(len(catalog.find('sar', 447.0, 'AC', averaging_mass='10g')), 4)
+        self.assertEqual(len(catalog.find('SAR', 447, 'AC')), 0)
+        self.assertEqual(len(catalog.find('Power_Excitation (AC*)_Power Accepted (DS)',
+                                          excitation_type='AC')), 4)
+        self.assertEqual(catalog.find('e-field', 297.2, 'pw')[0].size, 0)
+
+    def test_incremental_refresh_and_index(self):
+        """New and removed files are picked up by refresh; the sidecar index
+        is reused by a new catalog.
+        """
+        catalog = ExportCatalog.for_project(self.project_dir)
+        self.assertFalse(catalog.refresh())
+        touch(os.path.join(self.export_3d, 'h-field (f=447) [AC3].h5'), 'data')
+        os.remove(os.path.join(self.export_3d, 'h-field (f=447) [AC12].h5'))
+        self.assertTrue(catalog.refresh())
+        h_channels = [record.channel for record in catalog.find('h-field', 447, 'AC')]
+        self.assertEqual(h_channels, [1, 2, 3, 11])
+        index_file = os.path.join(self.project_dir, 'Export', '.cstmod_export_catalog.json')
+        self.assertTrue(os.path.exists(index_file))
+        indexed = ExportCatalog(os.path.join(self.project_dir, 'Export'), subdirs=('3d', '1d'),
+                                recursive=True, index_file=index_file)
+        self.assertEqual(sorted(indexed.records), sorted(catalog.records))
+        self.assertFalse(indexed.refresh())
+
+    def test_find_cst_files(self):
+        """Square brackets in file patterns are matched literally.
+        """
+        h_files = find_cst_files(os.path.join(self.export_3d, 'h-field (f=447) [AC1*].h5'))
+        self.assertEqual(sorted(os.path.basename(f) for f in h_files),
+                         ['h-field (f=447) [AC11].h5', 'h-field (f=447) [AC12].h5',
+                          'h-field (f=447) [AC1].h5'])
+        self.assertEqual(find_cst_files(os.path.join(self.project_dir, 'Expo*')),
+                         [os.path.join(self.project_dir, 'Export')])
+
+    def test_find_channel_pattern(self):
+        """Channel patterns are served by the catalog indexes, sorted by channel.
+        """
+        touch(os.path.join(self.export_3d, 'h-field (f=447) [AC3].txt'))
+        touch(os.path.join(self.export_3d, 'h-field (f=447.0) [AC4].h5'))
+        h_files = find_cst_files(os.path.join(self.export_3d, 'h-field (f=447) [AC*].h5'))
+        self.assertEqual([os.path.basename(f) for f in h_files],
+                         ['h-field (f=447) [AC' + str(channel) + '].h5' for channel in (1, 2, 11, 12)])
+        sar_files = find_cst_files(os.path.join(self.export_3d, 'SAR (f=447) [AC*] (10g).h5'))
+        self.assertEqual(len(sar_files), 4)
+        self.assertEqual(find_cst_files(os.path.join(self.export_3d, 'h-field (f=447) [AC*].txt')),
+                         [os.path.join(self.export_3d, 'h-field (f=447) [AC3].txt')])
+        # composite excitations are matched as with glob
+        for name in ('SAR (f=447) [AC1_2] (10g).h5', 'SAR (f=447) [AC1_2Q] (10g).h5',
+                     'h-field (f=447) [AC1_2].h5', 'h-field (f=447) [ACx].h5'):
+            touch(os.path.join(self.export_3d, name))
+        for pattern in ('SAR (f=447) [AC*] (10g).h5', 'h-field (f=447) [AC*].h5', 'h-field (f=447) [*].h5',
+                        'SAR (f=447) [AC*_2Q] (10g).h5', 'e-field (f=297.2) [*].h5'):
+            file_pattern = os.path.join(self.export_3d, pattern)
+            self.assertEqual(sorted(find_cst_files(file_pattern)),
+                             sorted(glob.glob(pad_square_bracket_string(file_pattern))))
+
+    def test_data_from_ports(self):
+        """Port data files are found through the catalog and sorted by port number.
+        """
+        voltages_dir = os.path.join(self.project_dir, 'FD Voltages')
+        os.makedirs(voltages_dir)
+        for port in range(1, 11):
+            touch(os.path.join(voltages_dir, 'P' + str(port) + '.txt'),
+                  '446.0\t0.0\t0.0\n447.0\t' + str(port) + '\t-1.0\n')
+        port_voltages = data_from_ports(voltages_dir, 447.0)
+        self.assertTrue(np.allclose(port_voltages, np.arange(1, 11) - 1.0j))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,15 @@ Unit tests for FieldReaderCST2019 classes.
 """
 import os
 import shutil
+import tempfile
 import unittest
 import numpy as np
+import h5py
 import hdf5storage
 import matplotlib.pyplot as plt
-from cstmod.field_reader import FieldReaderCST2019
+from scipy.constants import mu_0
+from cstmod.field_reader import FieldReaderCST2019, xyz_view
+from .synthetic_exports import write_cst_channel_exports
 
 class TestFieldReaderCST2019(unittest.TestCase):
     """Unit tests class for FieldReaderCST2019.
@@ -198,5 +202,179 @@ class TestFieldReaderCST2019(unittest.TestCase):
     def tearDownClass(cls):
         pass
 
+class TestFieldReaderCST2019Synthetic(unittest.TestCase):
+    """Unit tests for FieldReaderCST2019 with synthetic field exports.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.export_dir = self.tempdir.name
+        self.nchannels = 4
+        (self.xdim, self.ydim, self.zdim, self.efields) = \
+            write_cst_channel_exports(self.export_dir, 'e-field', 447, 'AC', self.nchannels)
+        (_, _, _, self.hfields) = \
+            write_cst_channel_exports(self.export_dir, 'h-field', 447, 'AC', self.nchannels)
+
+    def test_read_fields(self):
+        """Fields are returned in (x, y, z, component, channel) order.
+        """
+        fr = FieldReaderCST2019()
+        fr._read_fields(self.export_dir, 'e-field', 447, 'AC')
+        self.assertEqual(np.shape(fr.complex_fields), (5, 4, 3, 3, self.nchannels))
+        self.assertTrue(np.allclose(fr.complex_fields,
+                                    np.transpose(self.efields, (2, 1, 0, 3, 4))))
+        self.assertTrue(np.allclose(fr.xdim, 0.001*self.xdim))
+
+    def test_read_fields_parallel(self):
+        """Channels decoded by worker processes match serial decoding.
+        """
+        fr = FieldReaderCST2019()
+        fr.normalization = [1.0, 2.0, 3.0, 4.0]
+        fr._read_fields(self.export_dir, 'h-field', 447, 'AC', rotating_frame=True)
+        fr_parallel = FieldReaderCST2019()
+        fr_parallel.normalization = [1.0, 2.0, 3.0, 4.0]
+        fr_parallel._read_fields(self.export_dir, 'h-field', 447, 'AC', rotating_frame=True,
+                                 nworkers=2)
+        self.assertEqual(np.shape(fr_parallel.complex_fields), (5, 4, 3, 2, self.nchannels))
+        self.assertTrue(np.allclose(fr_parallel.complex_fields, fr.complex_fields))
+        self.assertTrue(np.allclose(fr_parallel.zdim, fr.zdim))
+
+    def test_out_of_core_efield_writer(self):
+        """Streamed vopgen output matches the in-memory output.
+        """
+        in_memory_file = os.path.join(self.export_dir, 'efMapArrayN_memory.mat')
+        streamed_file = os.path.join(self.export_dir, 'efMapArrayN.mat')
+        normalization = [0.5, 1.0, 2.0, 4.0]
+        fr = FieldReaderCST2019()
+        fr.normalization = normalization
+        fr.write_vopgen(447, self.export_dir, in_memory_file, export_type='e-field')
+        fr_streamed = FieldReaderCST2019()
+        fr_streamed.normalization = normalization
+        fr_streamed.write_vopgen(447, self.export_dir, streamed_file, 
+                                 export_type='e-field', out_of_core=True, nworkers=2)
+        self.assertIsNone(fr_streamed.complex_fields)
+        in_memory = hdf5storage.loadmat(in_memory_file)
+        streamed = hdf5storage.loadmat(streamed_file)
+        self.assertEqual(np.shape(streamed['efMapArrayN']), (5, 4, 3, 3, self.nchannels))
+        self.assertTrue(np.allclose(streamed['efMapArrayN'], in_memory['efMapArrayN']))
+        self.assertTrue(np.allclose(np.ravel(streamed['XDim']), np.ravel(in_memory['XDim'])))
+        with h5py.File(streamed_file, 'r') as f:
+            self.assertEqual(f['efMapArrayN'].chunks[0:2], (1, 1))
+
+    def test_compressed_vopgen_writer(self):
+        """gzip compressed vopgen output loads unchanged.
+        """
+        compressed_file = os.path.join(self.export_dir, 'efMapArrayN_gzip.mat')
+        for out_of_core in (False, True):
+            FieldReaderCST2019().write_vopgen(447, self.export_dir, compressed_file,
+                                              export_type='e-field', out_of_core=out_of_core,
+                                              compression='gzip')
+            with h5py.File(compressed_file, 'r') as f:
+                self.assertEqual(f['efMapArrayN'].compression, 'gzip')
+            efmaparrayn = hdf5storage.loadmat(compressed_file)['efMapArrayN']
+            self.assertTrue(np.allclose(efmaparrayn, np.transpose(self.efields, (2, 1, 0, 3, 4))))
+
+    def test_out_of_core_bfield_writer(self):
+        """Streamed rotating frame b-fields are scaled by mu_0.
+        """
+        streamed_file = os.path.join(self.export_dir, 'bfMapArrayN.mat')
+        fr = FieldReaderCST2019()
+        fr.write_vopgen(447, self.export_dir, streamed_file, export_type='h-field',
+                        rotating_frame=True, out_of_core=True)
+        bfields = hdf5storage.loadmat(streamed_file)['bfMapArrayN']
+        hx = np.transpose(self.hfields[:,:,:,0,:], (2, 1, 0, 3))
+        hy = np.transpose(self.hfields[:,:,:,1,:], (2, 1, 0, 3))
+        self.assertEqual(np.shape(bfields), (5, 4, 3, 2, self.nchannels))
+        self.assertTrue(np.allclose(bfields[:,:,:,0,:], mu_0*0.5*(hx + 1.0j*hy)))
+
+    def test_complex64_vopgen_writer(self):
+        """complex64 fields are kept in single precision through to the MAT file.
+        """
+        in_memory_file = os.path.join(self.export_dir, 'efMapArrayN_single.mat')
+        streamed_file = os.path.join(self.export_dir, 'efMapArrayN_single_streamed.mat')
+        fr = FieldReaderCST2019(dtype=np.complex64)
+        fr.write_vopgen(447, self.export_dir, in_memory_file, export_type='e-field')
+        self.assertEqual(fr.complex_fields.dtype, np.complex64)
+        fr_streamed = FieldReaderCST2019()
+        fr_streamed.write_vopgen(447, self.export_dir, streamed_file, export_type='e-field',
+                                 out_of_core=True, dtype=np.complex64)
+        # the data type of the reader is not changed
+        self.assertEqual(fr_streamed.dtype, np.complex128)
+        for file_name in (in_memory_file, streamed_file):
+            with h5py.File(file_name, 'r') as f:
+                self.assertEqual(f['efMapArrayN'].attrs['MATLAB_class'], b'single')
+            efmaparrayn = hdf5storage.loadmat(file_name)['efMapArrayN']
+            self.assertEqual(efmaparrayn.dtype, np.complex64)
+            self.assertTrue(np.array_equal(efmaparrayn, np.transpose(self.efields, (2, 1, 0, 3, 4))))
+
+    def test_iter_channels(self):
+        """Channels are yielded in order, read ahead or not.
+        """
+        fr = FieldReaderCST2019()
+        fr.normalization = [1.0, 2.0, 3.0, 4.0]
+        fr._read_fields(self.export_dir, 'e-field', 447, 'AC', prefetch=0)
+        for prefetch in (0, 2):
+            fr_iter = FieldReaderCST2019()
+            fr_iter.normalization = [1.0, 2.0, 3.0, 4.0]
+            channels = list(fr_iter.iter_channels(self.export_dir, 'e-field', 447, 'AC',
+                                                  prefetch=prefetch))
+            self.assertEqual([channel for channel, fields in channels], list(range(self.nchannels)))
+            for channel, fields in channels:
+                self.assertTrue(np.allclose(fields, fr.complex_fields[..., channel]))
+            self.assertTrue(np.allclose(fr_iter.xdim, fr.xdim))
+
+    def test_read_fields_native_order(self):
+        """Native order fields are (channel, z, y, x, component) with axis metadata.
+        """
+        fr = FieldReaderCST2019()
+        fr._read_fields(self.export_dir, 'e-field', 447, 'AC')
+        for nworkers in (None, 2):
+            fr_native = FieldReaderCST2019(axis_order='zyx')
+            fr_native._read_fields(self.export_dir, 'e-field', 447, 'AC', nworkers=nworkers)
+            self.assertEqual(fr_native.axes, ('channel', 'z', 'y', 'x', 'component'))
+            self.assertEqual(np.shape(fr_native.complex_fields), (self.nchannels, 3, 4, 5, 3))
+            self.assertTrue(np.allclose(fr_native.complex_fields, np.moveaxis(self.efields, -1, 0)))
+            self.assertTrue(np.allclose(xyz_view(fr_native.complex_fields, fr_native.axes),
+                                        fr.complex_fields))
+
+    def test_native_order_vopgen_writer(self):
+        """Native order MAT output matches the (x, y, z) ordered output.
+        """
+        for export_type, variable_name in (('e-field', 'efMapArrayN'), ('h-field', 'bfMapArrayN')):
+            xyz_file = os.path.join(self.export_dir, variable_name + '_xyz.mat')
+            zyx_file = os.path.join(self.export_dir, variable_name + '_zyx.mat')
+            FieldReaderCST2019().write_vopgen(447, self.export_dir, xyz_file,
+                                              export_type=export_type, rotating_frame=True)
+            FieldReaderCST2019(axis_order='zyx').write_vopgen(447, self.export_dir, zyx_file,
+                                                              export_type=export_type,
+                                                              rotating_frame=True)
+            xyz_fields = hdf5storage.loadmat(xyz_file)[variable_name]
+            zyx_fields = hdf5storage.loadmat(zyx_file)[variable_name]
+            self.assertEqual(np.shape(zyx_fields), np.shape(xyz_fields))
+            self.assertTrue(np.allclose(zyx_fields, xyz_fields))
+
+    def test_region_of_interest(self):
+        """Channel fields and mesh lines are cropped to the region of interest.
+        """
+        roi = (self.xdim[1]*0.001, self.xdim[3]*0.001, -1.0, 1.0, 
+               self.zdim[1]*0.001, self.zdim[2]*0.001)
+        fr = FieldReaderCST2019()
+        fr._read_fields(self.export_dir, 'e-field', 447, 'AC')
+        for axis_order, nworkers in (('xyz', None), ('zyx', None), ('xyz', 2)):
+            fr_roi = FieldReaderCST2019(axis_order=axis_order, roi=roi)
+            fr_roi._read_fields(self.export_dir, 'e-field', 447, 'AC', nworkers=nworkers)
+            self.assertTrue(np.allclose(xyz_view(fr_roi.complex_fields, fr_roi.axes),
+                                        fr.complex_fields[1:4, :, 1:3]))
+            self.assertTrue(np.allclose(fr_roi.xdim, fr.xdim[1:4]))
+            self.assertTrue(np.allclose(fr_roi.zdim, fr.zdim[1:3]))
+
+    def test_unknown_axis_order(self):
+        """Unknown axis orders are rejected.
+        """
+        with self.assertRaises(ValueError):
+            FieldReaderCST2019(axis_order='yxz')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
 if "__main__" == __name__:
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Unit tests for FieldReaderH5 and ResultReader3D with synthetic field exports.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from cstmod.field_reader import FieldReaderH5, ResultReader3D
+from .synthetic_exports import random_fields, write_cst_field_h5
+
+class TestFieldReaderH5(unittest.TestCase):
+    """Unit tests for single file field readers.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.xdim = np.linspace(-10.0, 10.0, 6)
+        self.ydim = np.linspace(-5.0, 5.0, 5)
+        self.zdim = np.linspace(0.0, 20.0, 4)
+        self.fields = random_fields(6, 5, 4)
+        self.file_name = os.path.join(self.tempdir.name, 'e-field (f=447) [AC1].h5')
+        write_cst_field_h5(self.file_name, 'E-Field', self.xdim, self.ydim, self.zdim, self.fields)
+
+    def test_field_reader_h5(self):
+        """Fields are read in CST (z, y, x) order.
+        """
+        fr = FieldReaderH5(self.file_name)
+        self.assertEqual(fr.field_type, 'e-field')
+        self.assertEqual(fr.fields.dtype, np.complex128)
+        self.assertTrue(np.array_equal(fr.fields, self.fields))
+        self.assertTrue(np.allclose(fr.xdim, self.xdim))
+
+    def test_field_reader_h5_complex64(self):
+        """Fields are read as complex64 without loss of precision.
+        """
+        fr = FieldReaderH5(self.file_name, dtype=np.complex64)
+        self.assertEqual(fr.fields.dtype, np.complex64)
+        self.assertTrue(np.array_equal(fr.fields, self.fields))
+
+    def test_result_reader_3d(self):
+        """ResultReader3D returns (x, y, z) ordered fields.
+        """
+        for dtype in (np.complex64, np.complex128):
+            rr3d = ResultReader3D(self.file_name, 'e-field', dtype=dtype)
+            self.assertEqual(rr3d.fields3d.dtype, dtype)
+            self.assertTrue(np.array_equal(rr3d.fields3d, np.transpose(self.fields, (2, 1, 0, 3))))
+            self.assertTrue(np.allclose(rr3d.xdim, 0.001*self.xdim))
+
+    def test_result_reader_3d_native_order(self):
+        """ResultReader3D keeps CST (z, y, x) order on request.
+        """
+        rr3d = ResultReader3D(self.file_name, 'e-field', axis_order='zyx')
+        self.assertEqual(rr3d.axes, ('z', 'y', 'x', 'component'))
+        self.assertTrue(np.array_equal(rr3d.fields3d, self.fields))
+        self.assertEqual(FieldReaderH5(self.file_name).axes, rr3d.axes)
+
+    def test_region_of_interest(self):
+        """Only fields within the region of interest (in metres) are read.
+        """
+        roi = (-0.005, 0.005, -0.005, 0.0, 0.005, 0.020)
+        # x: -2, 2 mm; y: -5, -2.5, 0 mm; z: 6.67, 13.3, 20 mm
+        expected = self.fields[1:4, 0:3, 2:4, :]
+        fr = FieldReaderH5(self.file_name, roi=roi)
+        self.assertTrue(np.array_equal(fr.fields, expected))
+        self.assertTrue(np.allclose(fr.xdim, self.xdim[2:4]))
+        self.assertTrue(np.allclose(fr.zdim, self.zdim[1:4]))
+        rr3d = ResultReader3D(self.file_name, 'e-field', roi=roi)
+        self.assertTrue(np.array_equal(rr3d.fields3d, np.transpose(expected, (2, 1, 0, 3))))
+        self.assertTrue(np.allclose(rr3d.ydim, 0.001*self.ydim[0:3]))
+        with self.assertRaises(ValueError):
+            FieldReaderH5(self.file_name, roi=(0.5, 0.6, -0.005, 0.0, 0.005, 0.020))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Unit tests for the frequency sweep reader.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import hdf5storage
+from cstmod.field_reader import FrequencySweepReaderCST2019
+from .synthetic_exports import write_cst_channel_exports
+
+class TestFrequencySweepReaderCST2019(unittest.TestCase):
+    """Unit tests for FrequencySweepReaderCST2019 with synthetic field exports.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.export_dir = self.tempdir.name
+        self.frequencies = [297, 298, 300]
+        self.fields = dict()
+        for f, freq in enumerate(self.frequencies):
+            (xdim, ydim, zdim, fields) = write_cst_channel_exports(self.export_dir, 'e-field', freq,
+                                                                   'AC', 3, seed=10*f)
+            # (z, y, x, comp, ch) -> (x, y, z, comp, ch)
+            self.fields[freq] = np.transpose(fields, (2, 1, 0, 3, 4))
+        self.xdim = 0.001*xdim
+
+    def test_read_in_memory(self):
+        """Fields of all frequencies are stored in one array; serial and
+        parallel decoding agree.
+        """
+        sweep = FrequencySweepReaderCST2019(self.frequencies, dtype=np.complex64)
+        sweep.read_fields(self.export_dir, 'e-field', 'AC')
+        self.assertEqual(np.shape(sweep.store), (5, 4, 3, 3, 3, 3))
+        self.assertTrue(np.allclose(sweep.xdim, self.xdim))
+        for freq, fields in sweep.iter_frequencies():
+            self.assertTrue(np.allclose(fields, self.fields[freq]))
+        parallel = FrequencySweepReaderCST2019(self.frequencies, dtype=np.complex64)
+        parallel.read_fields(self.export_dir, 'e-field', 'AC', nworkers=2)
+        self.assertTrue(np.array_equal(parallel.store, sweep.store))
+        with self.assertRaises(KeyError):
+            sweep.fields_at(299)
+
+    def test_read_to_mat_store(self):
+        """Store on disk loads as (x, y, z, comp, channel, freq) MATLAB array
+        and frequencies are read one at a time.
+        """
+        store_file = os.path.join(self.export_dir, 'efMapArrayNF.mat')
+        sweep = FrequencySweepReaderCST2019(self.frequencies, store_file=store_file)
+        sweep.normalization = [1.0, 2.0, 0.5]
+        sweep.read_fields(self.export_dir, 'e-field', 'AC')
+        self.assertEqual(sweep.store, store_file)
+        scale = np.asarray([1.0, 2.0, 0.5])
+        self.assertTrue(np.allclose(sweep.fields_at(298), scale*self.fields[298]))
+        mat_dict = hdf5storage.loadmat(store_file)
+        self.assertEqual(np.shape(mat_dict['fieldMapArrayNF']), (5, 4, 3, 3, 3, 3))
+        self.assertTrue(np.allclose(mat_dict['fieldMapArrayNF'][..., 2], scale*self.fields[300]))
+        self.assertTrue(np.allclose(np.ravel(mat_dict['frequencies']), self.frequencies))
+
+    def test_mesh_mismatch(self):
+        """Monitors on different meshes are rejected before decoding.
+        """
+        write_cst_channel_exports(self.export_dir, 'e-field', 301, 'AC', 3, nx=6)
+        sweep = FrequencySweepReaderCST2019([297, 301])
+        with self.assertRaises(ValueError):
+            sweep.read_fields(self.export_dir, 'e-field', 'AC')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Unit tests for the masked-voxel storage of vopgen arrays.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import hdf5storage
+from cstmod.field_reader import FieldReaderCST2019
+from cstmod.vopgen import MaskedVoxelArray, read_masked_fields
+from .synthetic_exports import write_cst_channel_exports
+
+class TestMaskedVoxelArray(unittest.TestCase):
+    """Unit tests for MaskedVoxelArray.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.export_dir = self.tempdir.name
+        rng = np.random.default_rng(3)
+        self.mask = rng.random((5, 4, 3)) > 0.7
+
+    def test_dense_round_trip(self):
+        """Masked voxels scatter back to the dense array; MATLAB linear indices.
+        """
+        cond_map = np.random.default_rng(4).random((5, 4, 3, 3))
+        masked = MaskedVoxelArray.from_dense(cond_map, self.mask)
+        self.assertEqual(masked.n_masked, np.count_nonzero(self.mask))
+        self.assertEqual(np.shape(masked.data), (masked.n_masked, 3))
+        self.assertTrue(np.array_equal(masked.mask, self.mask))
+        self.assertTrue(np.array_equal(masked.to_dense(), cond_map*self.mask[..., np.newaxis]))
+        (x, y, z) = np.unravel_index(masked.indices, (5, 4, 3), order='F')
+        self.assertTrue(np.array_equal(masked.data, cond_map[x, y, z]))
+
+    def test_read_masked_fields(self):
+        """Readers fill the masked channels directly in either axis order.
+        """
+        (xdim, ydim, zdim, fields) = write_cst_channel_exports(self.export_dir, 'e-field', 447, 'AC', 3)
+        xyz_fields = np.transpose(fields, (2, 1, 0, 3, 4))
+        for axis_order in ('xyz', 'zyx'):
+            field_reader = FieldReaderCST2019(dtype=np.complex64, axis_order=axis_order)
+            masked = read_masked_fields(field_reader, self.mask, self.export_dir, 'e-field', 447, 'AC')
+            self.assertEqual(np.shape(masked.data), (masked.n_masked, 3, 3))
+            (x, y, z) = np.unravel_index(masked.indices, (5, 4, 3), order='F')
+            self.assertTrue(np.allclose(masked.data, xyz_fields[x, y, z]))
+            self.assertTrue(np.allclose(masked.to_dense(),
+                                        xyz_fields*self.mask[..., np.newaxis, np.newaxis]))
+
+    def test_save_load(self):
+        """Masked arrays are stored in MAT (v7.3) files with 1-based indices.
+        """
+        efmap = (np.arange(5*4*3*3*2).reshape((5, 4, 3, 3, 2)) * (1.0 - 1.0j)).astype(np.complex64)
+        masked = MaskedVoxelArray.from_dense(efmap, self.mask)
+        mat_file = os.path.join(self.export_dir, 'efMapArrayN_masked.mat')
+        masked.save(mat_file, 'efMapArrayN')
+        loaded = MaskedVoxelArray.load(mat_file, 'efMapArrayN')
+        self.assertEqual(loaded.grid_shape, (5, 4, 3))
+        self.assertEqual(loaded.data.dtype, np.complex64)
+        self.assertTrue(np.array_equal(loaded.indices, masked.indices))
+        self.assertTrue(np.array_equal(loaded.data, masked.data))
+        mat_dict = hdf5storage.loadmat(mat_file)
+        self.assertEqual(np.ravel(mat_dict['efMapArrayN_ind'])[0], masked.indices[0] + 1)
+        mden = MaskedVoxelArray.from_dense(np.ones((5, 4, 3)), self.mask)
+        mden.save(mat_file, 'mden3D')
+        self.assertTrue(np.array_equal(MaskedVoxelArray.load(mat_file, 'mden3D').to_dense(), self.mask))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
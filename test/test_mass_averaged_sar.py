@@ -0,0 +1,71 @@
+"""Unit tests for mass-averaged SAR.
+"""
+import unittest
+import numpy as np
+from cstmod.vopgen import mass_averaged_sar, mass_averaged_sar_from_fields, power_density
+from cstmod.vopgen.mass_averaged_sar import voxel_volumes, summed_volume_table, box_sums
+
+class TestMassAveragedSAR(unittest.TestCase):
+    """Unit tests for mass-averaged SAR on (non)uniform meshes.
+    """
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        self.dim = 0.002*np.arange(12)
+        self.density = 1000.0*np.ones((12, 12, 12))
+        self.power = rng.random((12, 12, 12))
+        # mass of one 2 mm voxel
+        self.voxel_mass = 1000.0*0.002**3
+
+    def test_summed_volume_table(self):
+        """Box sums of prefix sums match direct sums.
+        """
+        table = summed_volume_table(self.power)
+        lower = np.array([[0, 0, 0], [2, 3, 4]])
+        upper = np.array([[12, 12, 12], [5, 7, 6]])
+        self.assertTrue(np.allclose(box_sums(table, lower, upper),
+                                    [np.sum(self.power), np.sum(self.power[2:5, 3:7, 4:6])]))
+        nonuniform = np.cumsum(np.linspace(0.001, 0.003, 12))
+        spacing = np.diff(nonuniform)
+        self.assertAlmostEqual(np.sum(voxel_volumes(nonuniform, self.dim, self.dim)),
+                               (nonuniform[-1] - nonuniform[0] + 0.5*(spacing[0] + spacing[-1]))
+                               * 0.024**2, places=12)
+
+    def test_cube_average(self):
+        """Averaging mass of 27 voxels averages 3x3x3 cubes; shells are interpolated.
+        """
+        (sar, valid) = mass_averaged_sar(self.dim, self.dim, self.dim, self.power, self.density,
+                                         27*self.voxel_mass, chunk_voxels=100, nworkers=3)
+        self.assertTrue(np.allclose(sar[5, 6, 7], np.mean(self.power[4:7, 5:8, 6:9])/1000.0))
+        self.assertTrue(valid[5, 6, 7])
+        # cubes of the corner voxel are truncated by the mesh boundary
+        self.assertTrue(np.allclose(sar[0, 0, 0], np.mean(self.power[0:3, 0:3, 0:3])/1000.0))
+        (sar, valid) = mass_averaged_sar(self.dim, self.dim, self.dim, self.power, self.density,
+                                         2000*self.voxel_mass)
+        self.assertFalse(np.any(valid))
+        self.assertTrue(np.allclose(sar, np.mean(self.power)/1000.0))
+        # half way between 1 and 27 voxels
+        (sar, valid) = mass_averaged_sar(self.dim, self.dim, self.dim, self.power, self.density,
+                                         14*self.voxel_mass)
+        expected = (self.power[5, 6, 7] + 0.5*(np.sum(self.power[4:7, 5:8, 6:9]) - self.power[5, 6, 7])) \
+                   / (1000.0*14)
+        self.assertAlmostEqual(sar[5, 6, 7], expected)
+
+    def test_uniform_sar_from_fields(self):
+        """Uniform power and density give the local SAR on a nonuniform mesh.
+        """
+        xdim = np.cumsum(np.linspace(0.001, 0.003, 12))
+        efields = np.ones((12, 12, 12, 3, 2), dtype=np.complex128)
+        conductivity = 0.5*np.ones((12, 12, 12, 3))
+        shim = np.array([1.0, 1.0j])/np.sqrt(2.0)
+        density = self.density.copy()
+        density[0:2] = 0.0
+        conductivity[0:2] = 0.0
+        (sar, valid) = mass_averaged_sar_from_fields(xdim, self.dim, self.dim, efields, shim,
+                                                     conductivity, density, 0.001)
+        local_sar = power_density(np.matmul(efields, shim), conductivity) / 1000.0
+        self.assertTrue(np.allclose(sar[valid], local_sar[valid]))
+        self.assertTrue(np.all(sar[0:2] == 0.0))
+        self.assertTrue(valid[6, 6, 6])
+
+if __name__ == "__main__":
+    unittest.main()
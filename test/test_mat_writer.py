@@ -0,0 +1,84 @@
+"""Unit tests for the incremental MAT (v7.3) writer.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import h5py
+import hdf5storage
+from cstmod.field_writer import MatWriter, savemat
+from cstmod.vopgen import SARMaskCST2019
+
+class TestMatWriter(unittest.TestCase):
+    """Unit tests for MatWriter.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.mat_file = os.path.join(self.tempdir.name, 'efMapArrayN.mat')
+        rng = np.random.default_rng(2)
+        shape = (6, 5, 4, 3, 2)
+        self.fields = (rng.standard_normal(shape) + 1.0j*rng.standard_normal(shape)).astype(np.complex64)
+
+    def test_write_channels(self):
+        """Channels written one at a time load as a single MATLAB array.
+        """
+        for compression in (None, 'gzip', 'lzf'):
+            with MatWriter(self.mat_file, compression=compression) as matf:
+                matf.write_variable('XDim', np.linspace(-0.1, 0.1, 6))
+                efmap = matf.create_variable('efMapArrayN', np.shape(self.fields), np.complex64,
+                                             chunks=(6, 5, 2, 1, 1))
+                for channel in range(2):
+                    efmap[..., channel] = self.fields[..., channel]
+                self.assertEqual(efmap.chunks, (6, 5, 2, 1, 1))
+            mat_dict = hdf5storage.loadmat(self.mat_file)
+            self.assertEqual(mat_dict['efMapArrayN'].dtype, np.complex64)
+            self.assertTrue(np.array_equal(mat_dict['efMapArrayN'], self.fields))
+            self.assertEqual(np.shape(mat_dict['XDim']), (6, 1))
+            with h5py.File(self.mat_file, 'r') as f:
+                self.assertEqual(f['efMapArrayN'].compression, compression)
+                self.assertEqual(f['efMapArrayN'].shuffle, compression is not None)
+                self.assertEqual(f['efMapArrayN'].attrs['MATLAB_class'], b'single')
+
+    def test_write_slabs(self):
+        """z-slabs and scalars are written in MATLAB dimension order.
+        """
+        with MatWriter(self.mat_file) as matf:
+            efmap = matf.create_variable('efMapArrayN', np.shape(self.fields), np.complex128)
+            efmap[:, :, 0:2] = self.fields[:, :, 0:2]
+            efmap[:, :, 2:4, :, :] = self.fields[:, :, 2:4]
+            matf.write_variable('f0', 447.0)
+        mat_dict = hdf5storage.loadmat(self.mat_file)
+        self.assertTrue(np.array_equal(mat_dict['efMapArrayN'], self.fields))
+        self.assertEqual(mat_dict['f0'], 447.0)
+        with open(self.mat_file, 'rb') as f:
+            header = f.read(128)
+        self.assertTrue(header.startswith(b'MATLAB 7.3 MAT-file'))
+        self.assertEqual(header[-4:], b'\x00\x02IM')
+
+    def test_savemat(self):
+        """Dictionaries of arrays, including logicals, are saved.
+        """
+        mask = np.real(self.fields[..., 0, 0]) > 0.0
+        savemat(self.mat_file, {'mask': mask, 'Smatrix': self.fields[0, 0, 0:3, :, 0]})
+        mat_dict = hdf5storage.loadmat(self.mat_file)
+        self.assertEqual(mat_dict['mask'].dtype, np.bool_)
+        self.assertTrue(np.array_equal(mat_dict['mask'], mask))
+        self.assertTrue(np.array_equal(mat_dict['Smatrix'], self.fields[0, 0, 0:3, :, 0]))
+
+    def test_write_sarmask(self):
+        """SAR mask is written as MAT (v7.3) file.
+        """
+        dim = np.arange(0, 10)
+        sigma = np.zeros((10, 10, 10))
+        sigma[3:6, 3:6, 3:6] = 0.5
+        sarmask = SARMaskCST2019(447.0, dim, dim, dim, 50.0*np.ones((10, 10, 10)), sigma)
+        sarmask.write_sarmask(self.mat_file)
+        mat_dict = hdf5storage.loadmat(self.mat_file)
+        self.assertTrue(np.array_equal(mat_dict['sarmask_new'], sarmask.sarmask))
+        self.assertEqual(np.shape(mat_dict['ZDim']), (10, 1))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
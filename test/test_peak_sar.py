@@ -0,0 +1,58 @@
+"""Unit tests for batch peak SAR evaluation.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from cstmod.vopgen import MaskedVoxelArray, q_matrices, unpack_q_matrices, vop_compression, write_vops, \
+                          batch_peak_sar, peak_sar_from_fields, peak_sar_from_vops
+
+class TestPeakSAR(unittest.TestCase):
+    """Unit tests for peak SAR of many shims.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(9)
+        self.nchannels = 4
+        shape = (7, 6, 5, 3, self.nchannels)
+        efmap = rng.standard_normal(shape) + 1.0j*rng.standard_normal(shape)
+        mask = rng.random((7, 6, 5)) > 0.4
+        self.efields = MaskedVoxelArray.from_dense(efmap, mask)
+        self.cond = MaskedVoxelArray.from_dense(rng.random((7, 6, 5, 3)), mask)
+        self.mden = MaskedVoxelArray.from_dense(1000.0*np.ones((7, 6, 5, 3)), mask)
+        self.shims = rng.standard_normal((50, self.nchannels)) + 1.0j*rng.standard_normal((50, self.nchannels))
+        q = unpack_q_matrices(q_matrices(self.efields, self.cond, self.mden), self.nchannels)
+        self.local_sar = np.real(np.einsum('sm,vmn,sn->sv', np.conj(self.shims), q, self.shims))
+
+    def test_peak_sar_from_fields(self):
+        """Chunked, threaded peak SAR matches the maximum of the quadratic forms.
+        """
+        (peak_sar, peak_voxel) = peak_sar_from_fields(self.shims, self.efields, self.cond, self.mden,
+                                                      chunk_bytes=4096, nworkers=3)
+        self.assertTrue(np.allclose(peak_sar, np.max(self.local_sar, axis=1)))
+        self.assertTrue(np.array_equal(peak_voxel, np.argmax(self.local_sar, axis=1)))
+        self.assertTrue(np.allclose(batch_peak_sar(self.shims[0], efields=self.efields,
+                                                   conductivity=self.cond, density=self.mden),
+                                    np.max(self.local_sar[0])))
+        with self.assertRaises(ValueError):
+            batch_peak_sar(self.shims)
+
+    def test_peak_sar_from_vop_file(self):
+        """Peak SAR of VOPs bounds the peak SAR within the overestimation.
+        """
+        q_packed = q_matrices(self.efields, self.cond, self.mden)
+        (vops, overestimation, cores, cluster) = vop_compression(q_packed, self.nchannels, 0.1)
+        vop_file = os.path.join(self.tempdir.name, 'VOP.mat')
+        write_vops(vop_file, vops, overestimation, cores, cluster)
+        peak_sar = batch_peak_sar(self.shims, vop_file, chunk_bytes=1024, nworkers=2)
+        self.assertTrue(np.allclose(peak_sar, peak_sar_from_vops(self.shims, vops)[0]))
+        exact = np.max(self.local_sar, axis=1)
+        self.assertTrue(np.all(peak_sar >= exact - 1e-12))
+        bound = exact + overestimation[0, 0]*np.sum(np.abs(self.shims)**2, axis=1)
+        self.assertTrue(np.all(peak_sar <= bound + 1e-12))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Unit tests for the bounded channel prefetch pipeline.
+"""
+import threading
+import unittest
+from cstmod.field_reader.prefetch import prefetch_channels
+
+class TestPrefetchChannels(unittest.TestCase):
+    """Unit tests for prefetch_channels.
+    """
+    def test_channel_order(self):
+        """Channels are yielded in order with their index.
+        """
+        for depth in (0, 1, 3):
+            channels = list(prefetch_channels(lambda x: x*x, [(i,) for i in range(10)], depth))
+            self.assertEqual(channels, [(i, i*i) for i in range(10)])
+
+    def test_bounded_read_ahead(self):
+        """The reader thread stays at most depth channels ahead (plus the one
+        being read).
+        """
+        depth = 2
+        read = []
+        lead = []
+        def read_fn(channel):
+            read.append(channel)
+            return channel
+        for channel, block in prefetch_channels(read_fn, [(i,) for i in range(20)], depth):
+            lead.append(len(read) - channel)
+        self.assertLessEqual(max(lead), depth + 2)
+
+    def test_reader_exception(self):
+        """Exceptions of the reader thread are raised by the iterator.
+        """
+        def read_fn(channel):
+            if 3 == channel:
+                raise FileNotFoundError("channel 3")
+            return channel
+        received = []
+        with self.assertRaises(FileNotFoundError):
+            for channel, block in prefetch_channels(read_fn, [(i,) for i in range(6)]):
+                received.append(channel)
+        self.assertEqual(received, [0, 1, 2])
+
+    def test_early_stop(self):
+        """Abandoning the iterator stops the reader thread.
+        """
+        nthreads = threading.active_count()
+        channels = prefetch_channels(lambda x: x, [(i,) for i in range(100)], 1)
+        self.assertEqual(next(channels), (0, 0))
+        channels.close()
+        self.assertEqual(threading.active_count(), nthreads)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Unit tests for the per-voxel SAR Q-matrix engine.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import hdf5storage
+from cstmod.vopgen import MaskedVoxelArray, q_matrices, write_q_matrices, unpack_q_matrices
+
+class TestQMatrices(unittest.TestCase):
+    """Unit tests for Q-matrices.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(5)
+        self.nchannels = 4
+        shape = (6, 5, 4, 3, self.nchannels)
+        self.efmap = rng.standard_normal(shape) + 1.0j*rng.standard_normal(shape)
+        self.cond_map = rng.random((6, 5, 4, 3))
+        self.mden_map = 1000.0 + 100.0*rng.random((6, 5, 4, 3))
+        self.mask = rng.random((6, 5, 4)) > 0.5
+        self.mden_map[~self.mask] = 0.0
+
+    def reference_q(self, voxel):
+        """Q-matrix of one voxel from the definition.
+        """
+        e = self.efmap[voxel]
+        q = np.zeros((self.nchannels, self.nchannels), dtype=np.complex128)
+        for comp in range(3):
+            q += self.cond_map[voxel][comp]/(2.0*self.mden_map[voxel][comp]) \
+                 * np.outer(np.conj(e[comp]), e[comp])
+        return q
+
+    def test_q_matrices(self):
+        """Packed Q-matrices are Hermitian and match the definition; chunked and
+        threaded evaluation agree.
+        """
+        efields = MaskedVoxelArray.from_dense(self.efmap, self.mask)
+        cond = MaskedVoxelArray.from_dense(self.cond_map, self.mask)
+        mden = MaskedVoxelArray.from_dense(self.mden_map, self.mask)
+        packed = q_matrices(efields, cond, mden)
+        self.assertEqual(np.shape(packed), (efields.n_masked, 10))
+        q = unpack_q_matrices(packed, self.nchannels)
+        self.assertTrue(np.allclose(q, np.conj(np.swapaxes(q, 1, 2))))
+        (x, y, z) = np.unravel_index(efields.indices, (6, 5, 4), order='F')
+        for v in (0, efields.n_masked - 1):
+            self.assertTrue(np.allclose(q[v], self.reference_q((x[v], y[v], z[v]))))
+        chunked = q_matrices(efields, cond, mden, chunk_voxels=7, nworkers=3)
+        self.assertTrue(np.allclose(chunked, packed))
+        # local SAR of a shim is real and non-negative
+        shim = np.exp(1.0j*np.arange(self.nchannels))
+        sar = np.einsum('m,vmn,n->v', np.conj(shim), q, shim)
+        self.assertTrue(np.allclose(sar.imag, 0.0))
+        self.assertTrue(np.all(sar.real >= 0.0))
+
+    def test_write_q_matrices(self):
+        """Q-matrices streamed to disk load as the in-memory result.
+        """
+        efields = MaskedVoxelArray.from_dense(self.efmap, self.mask)
+        cond = MaskedVoxelArray.from_dense(self.cond_map, self.mask)
+        mden = MaskedVoxelArray.from_dense(self.mden_map, self.mask)
+        q_file = os.path.join(self.tempdir.name, 'Q.mat')
+        write_q_matrices(q_file, efields, cond, mden, chunk_voxels=5, nworkers=2)
+        mat_dict = hdf5storage.loadmat(q_file)
+        self.assertTrue(np.allclose(mat_dict['Q_triu'], q_matrices(efields, cond, mden)))
+        self.assertTrue(np.array_equal(np.ravel(mat_dict['Q_ind']), efields.indices + 1))
+        self.assertEqual(np.ravel(mat_dict['Q_cols'])[-1], self.nchannels)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Unit tests for the binary store of SAR ascii exports.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from cstmod.sarutils import convert_sar_ascii, read_sar_ascii, SARAsciiStore
+
+def write_sar_export(file_name, xyz, sar):
+    """Write a CST style SAR ascii export.
+    """
+    with open(file_name, 'w') as fh:
+        fh.write('            x [mm]           y [mm]           z [mm]       SAR [W/kg]\n')
+        fh.write('-' * 68 + '\n')
+        for (x, y, z), value in zip(xyz, sar):
+            fh.write(f"{x:17}{y:17}{z:17}{value:17.7e}\n")
+
+class TestSARAsciiStore(unittest.TestCase):
+    """Unit tests for SAR ascii parsing and conversion.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(22)
+        grid = np.meshgrid(np.arange(4.0), np.arange(3.0), np.arange(5.0), indexing='ij')
+        self.xyz = np.stack([np.ravel(axis, order='F') for axis in grid], axis=-1)
+        self.exports = dict()
+        for mnq, name in [((1, 1, ''), 'SAR (f=447) [AC1] (10g).txt'),
+                          ((1, 2, ''), 'SAR (f=447) [AC1_2] (10g).txt'),
+                          ((1, 2, 'Q'), 'SAR (f=447) [AC1_2Q] (10g).txt'),
+                          ((2, 2, ''), 'SAR (f=447) [AC2] (10g).txt')]:
+            sar = rng.random(len(self.xyz))
+            write_sar_export(os.path.join(self.tempdir.name, name), self.xyz, sar)
+            self.exports[mnq] = sar
+
+    def test_read_sar_ascii(self):
+        """Block parsing matches the exported values for any block size.
+        """
+        file_name = os.path.join(self.tempdir.name, 'SAR (f=447) [AC1_2Q] (10g).txt')
+        for block_bytes in (50, 1000, 2**20):
+            data = read_sar_ascii(file_name, block_bytes)
+            self.assertEqual(data.shape, (len(self.xyz), 4))
+            self.assertTrue(np.array_equal(data[:, 0:3], self.xyz))
+            self.assertTrue(np.allclose(data[:, 3], self.exports[(1, 2, 'Q')], rtol=1e-7))
+        # trailing blank lines in a block of their own
+        with open(file_name, 'a') as fh:
+            fh.write('\n' + ' '*200 + '\n\n')
+        self.assertEqual(read_sar_ascii(file_name, 50).shape, (len(self.xyz), 4))
+
+    def test_convert_sar_ascii(self):
+        """Exports are stored by (m, n, q) and read back memory mapped.
+        """
+        store = convert_sar_ascii(self.tempdir.name, nworkers=2, block_bytes=100)
+        self.assertEqual(store.keys(), [(1, 1, ''), (1, 2, ''), (1, 2, 'Q'), (2, 2, '')])
+        self.assertIsInstance(store.sar, np.memmap)
+        self.assertTrue(np.array_equal(store.xyz, self.xyz))
+        for mnq, sar in self.exports.items():
+            self.assertTrue(np.allclose(store[mnq], sar, rtol=1e-7))
+        self.assertIn((1, 2, 'Q'), store)
+        # unchanged exports reuse the store
+        store_file = os.path.join(self.tempdir.name, 'sar_ascii.h5')
+        mtime = os.stat(store_file).st_mtime_ns
+        self.assertEqual(convert_sar_ascii(self.tempdir.name).key, store.key)
+        self.assertEqual(os.stat(store_file).st_mtime_ns, mtime)
+        compressed = convert_sar_ascii(self.tempdir.name, os.path.join(self.tempdir.name, 'compressed.h5'),
+                                       compression='gzip')
+        self.assertTrue(np.allclose(SARAsciiStore(os.path.join(self.tempdir.name, 'compressed.h5'))[(2, 2, '')],
+                                    self.exports[(2, 2, '')], rtol=1e-7))
+        self.assertEqual(len(compressed), 4)
+
+    def test_mismatched_exports(self):
+        """Exports with different voxel counts are rejected.
+        """
+        write_sar_export(os.path.join(self.tempdir.name, 'SAR (f=447) [AC3] (10g).txt'),
+                         self.xyz[:-1], np.zeros(len(self.xyz) - 1))
+        with self.assertRaises(ValueError):
+            convert_sar_ascii(self.tempdir.name, nworkers=1)
+        self.assertFalse(any(name.startswith('sar_ascii.h5') for name in os.listdir(self.tempdir.name)))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
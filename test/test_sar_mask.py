@@ -7,6 +7,8 @@ import unittest
 import hdf5storage
 from cstmod.field_reader import FieldReaderCST2019
 from cstmod.vopgen import SARMaskCST2019
+from cstmod.vopgen.sar_mask import unpack_mask
+import cstmod.vopgen.sar_mask as sar_mask
 
 class TestSARMaskCST2019(unittest.TestCase):
     """Unit tests class for SAR mask.
@@ -94,6 +96,46 @@ class TestSARMaskCST2019(unittest.TestCase):
     def tearDownClass(cls):
         pass
 
+class TestSARMaskCache(unittest.TestCase):
+    """Unit tests for cached and bit-packed SAR masks.
+    """
+    def setUp(self):
+        dim = np.arange(0, 20)
+        self.sigma = np.zeros((20, 20, 20))
+        self.sigma[5:15, 5:15, 5:15] = 0.5
+        self.sigma[8:10, 8:10, 8:10] = 5.0
+        self.sarmask = SARMaskCST2019(447.0, dim, dim, dim, 50.0*np.ones((20, 20, 20)), self.sigma)
+
+    def test_cached_mask(self):
+        """Mask is computed once and recomputed only if a limit changes.
+        """
+        testmask = self.sarmask.sarmask
+        self.assertEqual(testmask.dtype, np.bool_)
+        self.assertTrue(np.array_equal(testmask, (self.sigma > 0.01) & (self.sigma < 3.0)))
+        self.assertIs(self.sarmask.sarmask, testmask)
+        self.sarmask.sigma_max = 3.0
+        self.assertIs(self.sarmask.sarmask, testmask)
+        self.sarmask.epsr_min = 60.0
+        self.assertIs(self.sarmask.sarmask, testmask)
+        self.assertEqual(np.count_nonzero(self.sarmask.epsr_mask), 0)
+        self.sarmask.sigma_max = 10.0
+        self.assertIsNot(self.sarmask.sarmask, testmask)
+        self.assertEqual(np.count_nonzero(self.sarmask.sarmask), 1000)
+
+    def test_slabbed_and_packed_mask(self):
+        """Slab-wise comparisons and bit-packed masks match the full mask.
+        """
+        slab_size = sar_mask.mask_slab_size
+        try:
+            sar_mask.mask_slab_size = 50
+            slabbed = sar_mask._range_mask(self.sigma, 0.01, 3.0)
+        finally:
+            sar_mask.mask_slab_size = slab_size
+        self.assertTrue(np.array_equal(slabbed, self.sarmask.sarmask))
+        packed = self.sarmask.packed_sarmask
+        self.assertEqual(packed.nbytes, 1000)
+        self.assertTrue(np.array_equal(unpack_mask(packed, (20, 20, 20)), self.sarmask.sarmask))
+
 if "__main__" == __name__:
     unittest.main()
  
\ No newline at end of file
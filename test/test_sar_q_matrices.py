@@ -0,0 +1,96 @@
+"""Unit tests for Q-matrices reconstructed from SAR exports.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import h5py
+import hdf5storage
+from cstmod.sarutils import sar_q_matrices, write_sar_q_matrices, load_sar_maps
+from cstmod.sarutils.sar_q_matrices import sar_export_channels
+from cstmod.vopgen import MaskedVoxelArray, q_matrices, unpack_q_matrices
+from test.test_sar_ascii_store import write_sar_export
+
+class TestSARQMatrices(unittest.TestCase):
+    """Unit tests for the polarization identity reconstruction.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(23)
+        self.nchannels = 3
+        self.grid = (4, 3, 5)
+        shape = self.grid + (3, self.nchannels)
+        efmap = rng.standard_normal(shape) + 1.0j*rng.standard_normal(shape)
+        everywhere = np.ones(self.grid, dtype=np.bool_)
+        self.q_packed = q_matrices(MaskedVoxelArray.from_dense(efmap, everywhere),
+                                   rng.random(np.prod(self.grid)), 1000.0*np.ones(np.prod(self.grid)))
+        q = unpack_q_matrices(self.q_packed, self.nchannels)
+        self.sar_maps = dict()
+        for m in range(1, self.nchannels + 1):
+            for n in range(m, self.nchannels + 1):
+                for q_type, phase in (('', 1.0), ('Q', 1.0j)):
+                    if m == n and q_type:
+                        continue
+                    x = np.zeros(self.nchannels, dtype=np.complex128)
+                    x[m - 1] += 1.0
+                    if m != n:
+                        x[n - 1] += phase
+                    self.sar_maps[(m, n, q_type)] = np.real(np.einsum('m,vmn,n->v', np.conj(x), q, x))
+
+    @staticmethod
+    def export_name(m, n, q_type, ext):
+        return "SAR (f=447) [AC" + str(m) + ("" if m == n else "_" + str(n) + q_type) + "] (10g)" + ext
+
+    def test_sar_q_matrices(self):
+        """The polarization identity recovers the Q-matrices; swapped exports
+        give the same result.
+        """
+        packed = sar_q_matrices(self.sar_maps, chunk_voxels=7, nworkers=3)
+        self.assertTrue(np.allclose(packed, self.q_packed))
+        # exports 'AC3_1' and 'AC3_1Q' excite e_3 + e_1 and e_3 + j e_1
+        swapped = dict(self.sar_maps)
+        diagonal_sum = self.sar_maps[(1, 1, '')] + self.sar_maps[(3, 3, '')]
+        swapped[(3, 1, '')] = swapped.pop((1, 3, ''))
+        swapped[(3, 1, 'Q')] = 2.0*diagonal_sum - swapped.pop((1, 3, 'Q'))
+        self.assertNotIn((1, 3, 'Q'), swapped)
+        self.assertTrue(np.allclose(sar_q_matrices(swapped), self.q_packed))
+        conjugate = sar_q_matrices(self.sar_maps, quadrature_sign=-1)
+        self.assertTrue(np.allclose(conjugate, np.conj(self.q_packed)))
+        del swapped[(2, 3, 'Q')]
+        with self.assertRaises(ValueError):
+            sar_export_channels(swapped.keys())
+
+    def test_write_sar_q_matrices_h5(self):
+        """Q-matrices from hdf5 SAR exports of the masked voxels.
+        """
+        for (m, n, q_type), sar in self.sar_maps.items():
+            with h5py.File(os.path.join(self.tempdir.name, self.export_name(m, n, q_type, '.h5')), 'w') as f:
+                f.create_dataset('SAR', data=np.transpose(np.reshape(sar, self.grid, order='F'), (2, 1, 0)))
+                for axis, dim in zip(('x', 'y', 'z'), self.grid):
+                    f.create_dataset('Mesh line ' + axis, data=np.arange(float(dim)))
+        mask = np.zeros(self.grid, dtype=np.bool_)
+        mask[1:3, :, 2:] = True
+        q_file = os.path.join(self.tempdir.name, 'Q.mat')
+        write_sar_q_matrices(q_file, self.tempdir.name, mask=mask, chunk_voxels=5, nworkers=2)
+        mat_dict = hdf5storage.loadmat(q_file)
+        indices = np.flatnonzero(np.ravel(mask, order='F'))
+        self.assertTrue(np.allclose(mat_dict['Q_triu'], self.q_packed[indices]))
+        self.assertTrue(np.array_equal(np.ravel(mat_dict['Q_ind']), indices + 1))
+
+    def test_load_sar_maps_ascii(self):
+        """Ascii SAR exports are loaded through the binary store.
+        """
+        grid = np.meshgrid(*[np.arange(float(dim)) for dim in self.grid], indexing='ij')
+        xyz = np.stack([np.ravel(axis, order='F') for axis in grid], axis=-1)
+        for (m, n, q_type), sar in self.sar_maps.items():
+            write_sar_export(os.path.join(self.tempdir.name, self.export_name(m, n, q_type, '.txt')), xyz, sar)
+        sar_maps = load_sar_maps(self.tempdir.name, nworkers=1)
+        self.assertEqual(set(sar_maps.keys()), set(self.sar_maps.keys()))
+        packed = sar_q_matrices(sar_maps)
+        self.assertTrue(np.allclose(packed, self.q_packed, atol=1e-5*np.max(np.abs(self.q_packed))))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
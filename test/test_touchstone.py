@@ -0,0 +1,109 @@
+"""Unit tests for the streaming Touchstone reader.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+from cstmod.cstutil import read_touchstone, touchstone_ports
+from cstmod.cstutil.binary_cache import cache_dir_name
+from cstmod.cstutil.touchstone import touchstone_block_bytes
+
+def write_touchstone(file_name, freqs, s, option_line, data_format='ri', two_port_order=True):
+    """Write a Touchstone 1 file with at most 4 value pairs per line.
+    """
+    nports = np.shape(s)[1]
+    with open(file_name, 'w') as fh:
+        fh.write('! synthetic network\n')
+        fh.write(option_line + '\n')
+        for freq, s_freq in zip(freqs, s):
+            if 2 == nports and two_port_order:
+                s_freq = s_freq.T
+            values = np.ravel(s_freq)
+            if 'ri' == data_format:
+                pairs = np.stack([values.real, values.imag], axis=-1)
+            elif 'ma' == data_format:
+                pairs = np.stack([np.abs(values), np.angle(values, deg=True)], axis=-1)
+            else:
+                pairs = np.stack([20.0*np.log10(np.abs(values)), np.angle(values, deg=True)], axis=-1)
+            fh.write(repr(float(freq)))
+            for start in range(0, len(pairs), 4):
+                fh.write(' ' + ' '.join(repr(float(v)) for v in np.ravel(pairs[start:start + 4])) + '\n')
+            fh.write('! end of record\n')
+
+class TestTouchstone(unittest.TestCase):
+    """Unit tests for Touchstone parsing.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(24)
+        self.freqs = np.linspace(400.0, 500.0, 21)
+        self.s3 = 0.5*(rng.standard_normal((21, 3, 3)) + 1.0j*rng.standard_normal((21, 3, 3)))
+        self.s2 = 0.5*(rng.standard_normal((21, 2, 2)) + 1.0j*rng.standard_normal((21, 2, 2)))
+        self.file3 = os.path.join(self.tempdir.name, 'network.s3p')
+        write_touchstone(self.file3, self.freqs, self.s3, '# MHz S RI R 50')
+
+    def test_read_touchstone(self):
+        """Streamed and cached reads select the nearest frequencies and ranges.
+        """
+        self.assertEqual(touchstone_ports(self.file3), 3)
+        for use_cache in (False, True):
+            (freqs, s, z0) = read_touchstone(self.file3, frequencies=[447.0e6, 400.0e6, 520.0e6],
+                                             use_cache=use_cache, block_bytes=200)
+            self.assertTrue(np.allclose(freqs, [445.0e6, 400.0e6, 500.0e6]))
+            self.assertTrue(np.allclose(s, self.s3[[9, 0, 20]]))
+            self.assertEqual(z0, 50.0)
+            (freqs, s, _) = read_touchstone(self.file3, frequency_range=(420.0e6, 440.0e6), use_cache=use_cache)
+            self.assertTrue(np.allclose(freqs, self.freqs[4:9]*1.0e6))
+            self.assertTrue(np.allclose(s, self.s3[4:9]))
+        self.assertTrue(os.path.isdir(os.path.join(self.tempdir.name, cache_dir_name)))
+        self.assertTrue(np.allclose(read_touchstone(self.file3)[1], self.s3))
+
+    def test_two_port_formats(self):
+        """2-port column order and MA/DB formats.
+        """
+        for data_format in ('ma', 'db'):
+            file_name = os.path.join(self.tempdir.name, data_format + '.s2p')
+            write_touchstone(file_name, self.freqs, self.s2, '# MHz S ' + data_format.upper() + ' R 50',
+                             data_format)
+            (freqs, s, _) = read_touchstone(file_name, use_cache=False, block_bytes=64)
+            self.assertTrue(np.allclose(freqs, self.freqs*1.0e6))
+            self.assertTrue(np.allclose(s, self.s2))
+        # Touchstone 2 row order
+        file_name = os.path.join(self.tempdir.name, 'v2.s2p')
+        write_touchstone(file_name, self.freqs, self.s2, '[Version] 2.0\n# MHz S RI R 50\n'
+                         + '[Number of Ports] 2\n[Two-Port Data Order] 12_21\n[Network Data]', 'ri', False)
+        with open(file_name, 'a') as fh:
+            fh.write('[End]\n')
+        self.assertTrue(np.allclose(read_touchstone(file_name, use_cache=False)[1], self.s2))
+
+    def test_bracket_comments(self):
+        """Brackets in comments of data lines do not end the data.
+        """
+        with open(self.file3) as fh:
+            lines = fh.readlines()
+        file_name = os.path.join(self.tempdir.name, 'comments.s3p')
+        with open(file_name, 'w') as fh:
+            for line in lines:
+                fh.write(line if line.startswith(('!', '#')) else line.rstrip('\n') + ' ! port [2]\n')
+        for block_bytes in (64, touchstone_block_bytes):
+            (freqs, s, _) = read_touchstone(file_name, use_cache=False, block_bytes=block_bytes)
+            self.assertTrue(np.allclose(freqs, self.freqs*1.0e6))
+            self.assertTrue(np.allclose(s, self.s3))
+
+    def test_truncated(self):
+        """Truncated files and non S-parameter files are rejected.
+        """
+        with open(self.file3, 'a') as fh:
+            fh.write('600.0 0.1 0.2\n')
+        with self.assertRaises(ValueError):
+            read_touchstone(self.file3, use_cache=False)
+        file_name = os.path.join(self.tempdir.name, 'z.s3p')
+        write_touchstone(file_name, self.freqs, self.s3, '# MHz Z RI R 50')
+        with self.assertRaises(ValueError):
+            read_touchstone(file_name, use_cache=False)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()
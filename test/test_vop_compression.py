@@ -0,0 +1,106 @@
+"""Unit tests for VOP compression.
+"""
+import os
+import tempfile
+import unittest
+import numpy as np
+import hdf5storage
+from cstmod.field_writer import savemat
+from cstmod.vopgen import vop_compression, vopgen_vop_compression, q_matrices, unpack_q_matrices
+
+class TestVOPCompression(unittest.TestCase):
+    """Unit tests for VOP compression.
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(7)
+        self.nchannels = 4
+        shape = (8, 6, 5, 3, self.nchannels)
+        self.efmap = rng.standard_normal(shape) + 1.0j*rng.standard_normal(shape)
+        self.cond_map = 0.5*np.ones((8, 6, 5, 3))
+        self.mden_map = 1000.0*np.ones((8, 6, 5, 3))
+        self.sarmask = rng.random((8, 6, 5)) > 0.3
+        efields = self.efmap[self.sarmask]
+        self.q_packed = q_matrices(efields, self.cond_map[self.sarmask], self.mden_map[self.sarmask])
+
+    def assert_dominated(self, vops, cluster, overestimation):
+        """Every Q-matrix is dominated by its VOP and the VOPs overestimate by at most Z.
+        """
+        q = unpack_q_matrices(self.q_packed, self.nchannels)
+        min_eig = np.linalg.eigvalsh(vops[cluster] - q)[:, 0]
+        self.assertTrue(np.all(min_eig >= -1e-9*overestimation[0, 0]))
+        rng = np.random.default_rng(8)
+        for x in rng.standard_normal((20, self.nchannels)) + 1.0j*rng.standard_normal((20, self.nchannels)):
+            sar = np.real(np.einsum('m,vmn,n->v', np.conj(x), q, x))
+            vop_sar = np.real(np.einsum('m,vmn,n->v', np.conj(x), vops, x))
+            self.assertLessEqual(np.max(sar), np.max(vop_sar) + 1e-12)
+            self.assertLessEqual(np.max(vop_sar), np.max(sar) + np.real(np.vdot(x, overestimation @ x)) + 1e-12)
+
+    def test_vop_compression(self):
+        """Q-matrices are compressed to fewer dominating VOPs.
+        """
+        (vops, overestimation, cores, cluster) = vop_compression(self.q_packed, self.nchannels, 0.2,
+                                                                 chunk_voxels=16, nworkers=3)
+        self.assertLess(len(vops), len(self.q_packed))
+        self.assertTrue(np.all(cluster >= 0))
+        self.assertTrue(np.array_equal(cluster[cores], np.arange(len(cores))))
+        self.assert_dominated(vops, cluster, overestimation)
+
+    def test_restart_from_checkpoint(self):
+        """Compression resumes from a checkpoint of the same input only.
+        """
+        checkpoint_file = os.path.join(self.tempdir.name, 'vop_checkpoint.npz')
+        first = vop_compression(self.q_packed, self.nchannels, 0.2, checkpoint_file=checkpoint_file,
+                                checkpoint_interval=2)
+        self.assertTrue(os.path.exists(checkpoint_file))
+        # partial state: keep the first 3 VOPs
+        with np.load(checkpoint_file) as checkpoint:
+            (key, cores, cluster) = (checkpoint['key'], checkpoint['cores'], checkpoint['cluster'])
+        cluster[cluster >= 3] = -1
+        np.savez(checkpoint_file, key=key, cores=cores[0:3], cluster=cluster)
+        resumed = vop_compression(self.q_packed, self.nchannels, 0.2, checkpoint_file=checkpoint_file)
+        self.assertTrue(np.array_equal(resumed[2], first[2]))
+        self.assertTrue(np.array_equal(resumed[3], first[3]))
+        other = vop_compression(self.q_packed, self.nchannels, 0.1, checkpoint_file=checkpoint_file)
+        self.assert_dominated(other[0], other[3], other[1])
+        self.assertGreaterEqual(len(other[2]), len(first[2]))
+
+    def test_vopgen_vop_compression(self):
+        """VOPs of vopgen files are written to the vopgen directory.
+        """
+        vopgen_dir = self.tempdir.name
+        savemat(os.path.join(vopgen_dir, 'efMapArrayN.mat'), {'efMapArrayN': self.efmap})
+        savemat(os.path.join(vopgen_dir, 'propmap.mat'), {'condMap': self.cond_map,
+                                                          'mdenMap': self.mden_map})
+        savemat(os.path.join(vopgen_dir, 'massdensityMap3D.mat'), {'mden3D': self.mden_map[..., 0]})
+        savemat(os.path.join(vopgen_dir, 'sarmask_aligned.mat'), {'sarmask_new': self.sarmask})
+        (vops, overestimation, cores, cluster) = vopgen_vop_compression(vopgen_dir, 0.2, nworkers=2)
+        vop_dict = hdf5storage.loadmat(os.path.join(vopgen_dir, 'VOP.mat'))
+        self.assertEqual(np.shape(vop_dict['VOPm']), (self.nchannels, self.nchannels, len(cores)))
+        self.assertTrue(np.allclose(vop_dict['VOPm'][..., 0], vops[0]))
+        self.assertTrue(np.allclose(vop_dict['Zm'], overestimation))
+        self.assertTrue(np.all(self.sarmask.ravel(order='F')[np.ravel(vop_dict['vop_ind']) - 1]))
+
+    def test_vopgen_3d_density_map(self):
+        """A 3-D mdenMap (one density per voxel) gives the VOPs of the
+        per-component mdenMap.
+        """
+        mden3d = self.mden_map[..., 0]
+        results = []
+        for name, mden_map in (('4d', self.mden_map), ('3d', np.multiply(mden3d, self.sarmask))):
+            vopgen_dir = os.path.join(self.tempdir.name, name)
+            os.makedirs(vopgen_dir)
+            savemat(os.path.join(vopgen_dir, 'efMapArrayN.mat'), {'efMapArrayN': self.efmap})
+            savemat(os.path.join(vopgen_dir, 'propmap.mat'), {'condMap': self.cond_map, 'mdenMap': mden_map})
+            savemat(os.path.join(vopgen_dir, 'massdensityMap3D.mat'), {'mden3D': mden3d})
+            savemat(os.path.join(vopgen_dir, 'sarmask_aligned.mat'), {'sarmask_new': self.sarmask})
+            results.append(vopgen_vop_compression(vopgen_dir, 0.2, restart=False))
+        self.assertEqual(len(results[1][3]), len(self.q_packed))
+        self.assertTrue(np.allclose(results[1][0], results[0][0]))
+        self.assertTrue(np.array_equal(results[1][3], results[0][3]))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+if __name__ == "__main__":
+    unittest.main()